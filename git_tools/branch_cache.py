@@ -0,0 +1,135 @@
+import json
+import os
+from typing import List, Optional
+
+from git_paths import resolve_git_dirs, stat_key, tool_cache_dir, write_json_atomic
+from logger.logger import Logger, LogLevel
+
+logger = Logger("branch_cache", LogLevel.WARNING).logger_jl
+
+CACHE_VERSION = 1
+# ref namespaces listed by get_branch_info, and therefore part of the cache key
+REF_NAMESPACES = ["refs/heads", "refs/remotes", "refs/tags"]
+
+
+def _loose_ref_keys(common_dir: str) -> List[list]:
+    """Collect (relative path, mtime, size, inode) for every loose ref file in REF_NAMESPACES."""
+    keys = []
+    stack = [os.path.join(common_dir, namespace) for namespace in REF_NAMESPACES]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                # git rewrites a ref through a new file (ref.lock renamed over it), so
+                # the inode changes even when mtime granularity and size do not
+                keys.append(
+                    [
+                        os.path.relpath(entry.path, common_dir),
+                        stat.st_mtime_ns,
+                        stat.st_size,
+                        stat.st_ino,
+                    ]
+                )
+    keys.sort()
+    return keys
+
+
+def refs_fingerprint(common_dir: str) -> dict:
+    """
+    Describe the state of the ref store using only stat calls.
+
+    Parameters:
+        common_dir (str): The repository's common git dir.
+
+    Returns:
+        dict: A JSON-serializable value that changes whenever packed-refs, a loose ref
+        or the config (which holds upstream tracking) changes.
+    """
+    return {
+        "version": CACHE_VERSION,
+        "packed_refs": stat_key(os.path.join(common_dir, "packed-refs")),
+        "config": stat_key(os.path.join(common_dir, "config")),
+        "loose_refs": _loose_ref_keys(common_dir),
+    }
+
+
+def _cache_file(common_dir: str, merged_to_main: bool) -> str:
+    name = "branches-merged.json" if merged_to_main else "branches.json"
+    return os.path.join(tool_cache_dir(common_dir), name)
+
+
+def load_branch_records(
+    directory: str, merged_to_main: bool = False
+) -> Optional[List[List[str]]]:
+    """
+    Return the cached branch records for a repository if the refs are unchanged.
+
+    Parameters:
+        directory (str): A directory inside the repository.
+        merged_to_main (bool): Whether the records were listed with --merged=main.
+
+    Returns:
+        Optional[List[List[str]]]: [date_string, name, author, track] records, or None on a miss.
+    """
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None:
+        return None
+    cache_file = _cache_file(git_dirs.common_dir, merged_to_main)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("fingerprint") != refs_fingerprint(git_dirs.common_dir):
+        logger.debug(f"[branch_cache] stale cache {cache_file}")
+        return None
+    return cached.get("records")
+
+
+def current_fingerprint(directory: str) -> Optional[dict]:
+    """Fingerprint the refs of the repository containing directory (None outside a repo)."""
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None:
+        return None
+    return refs_fingerprint(git_dirs.common_dir)
+
+
+def save_branch_records(
+    directory: str,
+    records: List[List[str]],
+    fingerprint: Optional[dict],
+    merged_to_main: bool = False,
+):
+    """
+    Store parsed branch records keyed on the state of the refs they were read from.
+
+    Parameters:
+        directory (str): A directory inside the repository.
+        records (List[List[str]]): [date_string, name, author, track] records.
+        fingerprint (Optional[dict]): current_fingerprint() taken *before* the refs were listed,
+            so a ref that moves during the listing invalidates the entry on the next run.
+        merged_to_main (bool): Whether the records were listed with --merged=main.
+
+    Returns:
+        None
+    """
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None or fingerprint is None:
+        return
+    cache_file = _cache_file(git_dirs.common_dir, merged_to_main)
+    payload = {
+        "fingerprint": fingerprint,
+        "records": records,
+    }
+    try:
+        write_json_atomic(cache_file, payload)
+    except OSError as e:
+        logger.warning(f"[branch_cache] could not write {cache_file}: {e}")
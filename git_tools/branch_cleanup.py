@@ -1,116 +1,143 @@
 # /// script
 # requires-python = ">=3.13"
 # dependencies = [
-#     "alive-progress",
 #     "click",
 #     "loguru",
 #     "inquirerpy",
 # ]
 # ///
-import concurrent.futures
-import subprocess
 from datetime import datetime, timedelta
-from typing import List, Set
+from functools import cached_property
+from typing import Dict, List, Optional, Set
 
 import click
-from alive_progress import alive_bar
-from InquirerPy import inquirer
 
+from branch_delete import (DELETED, MISSING, delete_refs_transaction,
+                           summarize_branch_results)
 from branch_info_jl import BranchInfoJL, format_branch_info_names, get_branch_info
+from branch_search import search_select
+from fzf_picker import PICKER_INQUIRER, picker_option
+from prefetch import fetch_age_label
+from ref_store import RefStore
+from squash_detection import (PATCH_ID_STRATEGY, SQUASH_STRATEGIES,
+                              BranchGraph, find_squashed_branches)
 
 
-def run_git_command(
-    cmd: List[str], directory: str, swallow_output: bool = False
-) -> str:
-    """Run a git command in the specified directory.
+class MainBranchNotFound(click.ClickException):
+    """The main branch was named (e.g. by origin/HEAD) but has no local or origin/ ref."""
 
-    Args:
-        cmd (List[str]): The command to run as a list of strings.
-        directory (str): The directory where the command should be run.
-        swallow_output (bool, optional): Whether to suppress the command output. Defaults to False.
 
-    Returns:
-        str: The output of the command as a string, or an empty string if swallow_output is True.
+class RepoSnapshot:
     """
-    try:
-        if swallow_output:
-            result = subprocess.run(
-                cmd,
-                cwd=directory,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,  # Suppress stderr for expected failures
-                check=False,  # Don't raise exception on non-zero exit
-                text=True,
+    One analysis pass over the repository shared by every cleanup classifier.
+
+    Refs, tips and the main branch are read once from the ref files; the walk of
+    commits missing from main (merged status for local and remote branches) and the
+    branch ages are computed on first use and then reused.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ref_store = RefStore(directory)
+        self.local_tips: Dict[str, str] = self.ref_store.local_branches()
+        self.remote_tips: Dict[str, str] = self.ref_store.remote_branches("origin")
+        self.main_branch = _main_branch_from_refs(self.ref_store, self.local_tips)
+        self.main_ref = _main_ref(self.main_branch, self.local_tips, self.remote_tips)
+
+    @cached_property
+    def graph(self) -> Optional[BranchGraph]:
+        """
+        Commits reachable from any local or origin/ tip but not from main.
+
+        Raises:
+            MainBranchNotFound: If main has neither a local nor an origin/ ref.
+        """
+        tips = sorted(set(self.local_tips.values()) | set(self.remote_tips.values()))
+        if not self.main_branch or not tips:
+            return None
+        if self.main_ref is None:
+            raise MainBranchNotFound(
+                f"main branch {self.main_branch!r} has no local or origin/ ref to compare against"
             )
-            return ""
+        return BranchGraph(self.directory, tips, self.main_ref)
 
-        result = subprocess.check_output(cmd, text=True, cwd=directory)
-        return result.strip()
-    except subprocess.CalledProcessError as e:
-        import traceback
-        click.echo(f"Command failed with error code {e.returncode}")
-        click.echo(f"Stack trace: {traceback.format_exc()}")
-        return ""
+    @cached_property
+    def branch_infos(self) -> List[BranchInfoJL]:
+        """Dates, authors and ages of every branch (see get_branch_info)."""
+        return get_branch_info(self.directory, merged_to_main=False)
+
+    def is_merged(self, tip: str) -> bool:
+        return self.graph is not None and tip not in self.graph.parents
 
+    @property
+    def merged_local(self) -> List[str]:
+        return sorted(
+            branch for branch, tip in self.local_tips.items()
+            if branch != self.main_branch and self.is_merged(tip)
+        )
+
+    @property
+    def merged_remote(self) -> List[str]:
+        return sorted(
+            branch for branch, tip in self.remote_tips.items()
+            if branch != self.main_branch and self.is_merged(tip)
+        )
 
-def get_merged_branches(directory: str) -> List[str]:
+    @property
+    def branch_tips(self) -> Dict[str, str]:
+        """Local and origin/ branch names to tips, preferring the local branch."""
+        tips = dict(self.remote_tips)
+        tips.update(self.local_tips)
+        return tips
+
+
+def get_merged_branches(directory: str, snapshot: Optional[RepoSnapshot] = None) -> List[str]:
     """Get list of branches that have been merged into main/master."""
     try:
-        # Get the main branch name
-        main_branch = get_main_branch_name(directory)
-        if not main_branch:
+        snapshot = snapshot or RepoSnapshot(directory)
+        if not snapshot.main_branch:
             return []
         
-        # Get merged branches
-        result = run_git_command(
-            ["git", "branch", "--merged", main_branch], directory
-        )
-        if not result:
-            return []
-        
-        branches = []
-        for line in result.split('\n'):
-            branch = line.strip().replace('* ', '')
-            if branch and branch != main_branch:
-                branches.append(branch)
-        
-        return branches
+        return snapshot.merged_local
+    except MainBranchNotFound:
+        raise
     except Exception as e:
         click.echo(f"Error getting merged branches: {e}")
         return []
 
 
-def get_main_branch_name(directory: str) -> str:
-    """Get the main branch name (main, master, or develop)."""
+def _main_branch_from_refs(ref_store: RefStore, local_tips: Dict[str, str]) -> str:
     common_main_branches = ["main", "master", "develop"]
     
     for branch in common_main_branches:
-        try:
-            result = run_git_command(
-                ["git", "rev-parse", "--verify", branch], directory, swallow_output=True
-            )
-            if result is not None:  # Branch exists
-                return branch
-        except subprocess.CalledProcessError:
-            continue
+        if branch in local_tips:  # Branch exists
+            return branch
     
     # If none of the common names exist, try to get the default branch
-    try:
-        result = run_git_command(
-            ["git", "symbolic-ref", "refs/remotes/origin/HEAD"], directory
-        )
-        if result:
-            return result.replace('refs/remotes/origin/', '')
-    except subprocess.CalledProcessError:
-        pass
+    origin_head = ref_store.read_ref("refs/remotes/origin/HEAD", peel=False)
+    if origin_head and origin_head.startswith("ref: refs/remotes/origin/"):
+        return origin_head.replace('ref: refs/remotes/origin/', '')
     
     return ""
 
 
-def get_stale_branches(directory: str, threshold_days: int) -> List[BranchInfoJL]:
+def _main_ref(
+    main_branch: str, local_tips: Dict[str, str], remote_tips: Dict[str, str]
+) -> Optional[str]:
+    """Full ref name of main: the local branch, or origin/<main> when there is none."""
+    if main_branch in local_tips:
+        return f"refs/heads/{main_branch}"
+    if main_branch in remote_tips:
+        return f"refs/remotes/origin/{main_branch}"
+    return None
+
+
+def get_stale_branches(directory: str, threshold_days: int,
+                       snapshot: Optional[RepoSnapshot] = None) -> List[BranchInfoJL]:
     """Get branches that haven't been committed to in threshold_days."""
     try:
-        branch_info_list = get_branch_info(directory, merged_to_main=False)
+        snapshot = snapshot or RepoSnapshot(directory)
+        branch_info_list = snapshot.branch_infos
         
         # Ensure we have a list (handle case where get_branch_info might fail)
         if not isinstance(branch_info_list, list):
@@ -160,96 +187,51 @@ def filter_by_branch_name(branch_name: str) -> bool:
     return True
 
 
-def get_squashed_branches(directory: str) -> List[str]:
+def get_squashed_branches(directory: str, strategy: str = PATCH_ID_STRATEGY,
+                          snapshot: Optional[RepoSnapshot] = None) -> List[str]:
     """Get branches that have been squashed and merged."""
     try:
-        all_branches = _get_all_local_branches(directory)
-        main_branch = get_main_branch_name(directory)
+        snapshot = snapshot or RepoSnapshot(directory)
+        main_branch = snapshot.main_branch
         
         if not main_branch:
             return []
         
-        return _find_squashed_branches(directory, all_branches, main_branch)
-        
+        branch_tips = {
+            branch: tip for branch, tip in snapshot.branch_tips.items()
+            if _should_check_branch(branch, main_branch)
+        }
+        return find_squashed_branches(
+            directory, branch_tips, snapshot.main_ref, strategy, snapshot.graph
+        )
+
+    except MainBranchNotFound:
+        raise
     except Exception as e:
         click.echo(f"Error getting squashed branches: {e}")
         return []
 
 
-def _get_all_local_branches(directory: str) -> List[str]:
-    """Get list of all local branch names."""
-    result = run_git_command(["git", "branch", "-a"], directory)
-    if not result:
-        return []
-    
-    branches = []
-    for line in result.split('\n'):
-        branch = line.strip().replace('* ', '').replace('remotes/origin/', '')
-        if branch and 'HEAD' not in branch:
-            branches.append(branch)
-    
-    return branches
-
-
-def _find_squashed_branches(directory: str, all_branches: List[str], main_branch: str) -> List[str]:
-    """Identify branches that appear to be squashed and merged."""
-    squashed_branches = []
-    
-    for branch in all_branches:
-        if not _should_check_branch(branch, main_branch):
-            continue
-            
-        if _is_branch_squashed(directory, branch, main_branch):
-            squashed_branches.append(branch)
-    
-    return squashed_branches
-
-
 def _should_check_branch(branch: str, main_branch: str) -> bool:
     """Determine if a branch should be checked for squashing."""
     return branch != main_branch and filter_by_branch_name(branch)
 
 
-def _is_branch_squashed(directory: str, branch: str, main_branch: str) -> bool:
-    """Check if a branch appears to be squashed into main."""
-    try:
-        merge_base = run_git_command(
-            ["git", "merge-base", main_branch, branch], directory
-        )
-        
-        if not merge_base:
-            return False
-            
-        branch_commits = run_git_command(
-            ["git", "log", "--oneline", f"{merge_base}..{branch}"], directory
-        )
-        
-        if not branch_commits:
-            return False
-            
-        # Simple heuristic: if branch has commits but they're not individually in main,
-        # it might be squashed
-        main_commits = run_git_command(
-            ["git", "log", "--oneline", main_branch], directory
-        )
-        
-        return bool(main_commits and branch_commits)
-        
-    except subprocess.CalledProcessError:
-        return False
-
-
 def select_branches_interactive(branch_info_list: List[BranchInfoJL], 
-                               branch_names: List[str] = None) -> List[str]:
+                               branch_names: List[str] = None,
+                               directory: str = ".",
+                               picker: str = PICKER_INQUIRER) -> List[str]:
     """Interactively select branches to delete."""
     if branch_names:
         # Simple selection for string lists
-        selected = inquirer.fuzzy(
-            message="Select branches to delete:",
+        selected = search_select(
+            message=f"Select branches to delete ({fetch_age_label(directory)}):",
             choices=branch_names,
-            multiselect=True,
+            directory=directory,
             default="joe/rhl-2",
-        ).execute()
+            multiselect=True,
+            picker=picker,
+        )
         return selected
     else:
         # Selection for BranchInfoJL objects
@@ -259,61 +241,32 @@ def select_branches_interactive(branch_info_list: List[BranchInfoJL],
             for branch_info in branch_info_list
         ]
         
-        selected = inquirer.fuzzy(
-            message="Select branches to delete:",
+        selected = search_select(
+            message=f"Select branches to delete ({fetch_age_label(directory)}):",
             choices=branch_choices,
+            directory=directory,
             multiselect=True,
-        ).execute()
+            picker=picker,
+        )
         return selected
 
 
-def delete_branches_concurrently(directory: str, branches: List[str]) -> None:
-    """Delete multiple branches concurrently with progress bar."""
+def delete_branches_batch(directory: str, branches: List[str]) -> None:
+    """Delete branches and their origin/ tracking refs in a single ref transaction."""
     if not branches:
         click.echo("No branches to delete.")
         return
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(delete_single_branch, branch, directory) 
-            for branch in branches
-        ]
-        
-        with alive_bar(len(futures), title="Deleting branches") as progress_bar:
-            deleted_count = 0
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        deleted_count += 1
-                    progress_bar()
-                except Exception as e:
-                    click.echo(f"Error deleting branch: {e}")
-                    progress_bar()
-    
-    click.echo(f"Successfully deleted {deleted_count}/{len(branches)} branches.")
 
+    # every subcommand (merged, squashed, stale by age, custom by hand) deletes branches it
+    # picked on purpose, so delete like `git branch -D`, as cleanup always has
+    ref_results = delete_refs_transaction(directory, branches, force=True)
+    for refname, status in sorted(ref_results.items()):
+        if status != MISSING:
+            click.echo(f"  {status:<12} {refname}")
 
-def delete_single_branch(branch_name: str, directory: str) -> bool:
-    """Delete a single local branch."""
-    try:
-        # First, try to delete the local branch
-        run_git_command(
-            ["git", "branch", "-D", branch_name], directory, swallow_output=True
-        )
-        
-       
-        # Also try to delete the remote tracking branch if it exists
-        run_git_command(
-            ["git", "branch", "-dr", f"origin/{branch_name}"], 
-            directory, 
-            swallow_output=True
-        )
-        
-        return True
-    except subprocess.CalledProcessError as e:
-        click.echo(f"Failed to delete branch '{branch_name}': {e}")
-        return False
+    branch_results = summarize_branch_results(branches, ref_results)
+    deleted_count = sum(1 for status in branch_results.values() if status == DELETED)
+    click.echo(f"Successfully deleted {deleted_count}/{len(branches)} branches.")
 
 
 @click.group()
@@ -339,7 +292,8 @@ def cleanup():
     is_flag=True, 
     help="Automatically delete all stale branches without confirmation"
 )
-def stale(threshold_days, directory, auto):
+@picker_option
+def stale(threshold_days, directory, auto, picker):
     """Clean up stale branches based on last commit date."""
     click.echo(f"Finding stale branches older than {threshold_days} days...")
     
@@ -358,10 +312,12 @@ def stale(threshold_days, directory, auto):
     if auto:
         branches_to_delete = [branch.name for branch in stale_branches]
     else:
-        branches_to_delete = select_branches_interactive(stale_branches)
+        branches_to_delete = select_branches_interactive(
+            stale_branches, directory=directory, picker=picker
+        )
     
     if branches_to_delete:
-        delete_branches_concurrently(directory, branches_to_delete)
+        delete_branches_batch(directory, branches_to_delete)
 
 
 @cleanup.command()
@@ -375,7 +331,8 @@ def stale(threshold_days, directory, auto):
     is_flag=True, 
     help="Automatically delete all merged branches without confirmation"
 )
-def merged(directory, auto):
+@picker_option
+def merged(directory, auto, picker):
     """Clean up branches that have been merged to main."""
     click.echo("Finding merged branches...")
     
@@ -392,10 +349,10 @@ def merged(directory, auto):
     if auto:
         branches_to_delete = merged_branches
     else:
-        branches_to_delete = select_branches_interactive([], merged_branches)
+        branches_to_delete = select_branches_interactive([], merged_branches, directory, picker)
     
     if branches_to_delete:
-        delete_branches_concurrently(directory, branches_to_delete)
+        delete_branches_batch(directory, branches_to_delete)
 
 
 @cleanup.command()
@@ -409,11 +366,18 @@ def merged(directory, auto):
     is_flag=True, 
     help="Automatically delete all squashed branches without confirmation"
 )
-def squashed(directory, auto):
+@click.option(
+    "--strategy",
+    type=click.Choice(SQUASH_STRATEGIES),
+    default=PATCH_ID_STRATEGY,
+    help="Squash detection: match patch ids, or check that merging into main changes nothing.",
+)
+@picker_option
+def squashed(directory, auto, strategy, picker):
     """Clean up branches that have been squashed and merged."""
     click.echo("Finding squashed branches...")
     
-    squashed_branches = get_squashed_branches(directory)
+    squashed_branches = get_squashed_branches(directory, strategy)
     
     if not squashed_branches:
         click.echo("No squashed branches found.")
@@ -426,10 +390,10 @@ def squashed(directory, auto):
     if auto:
         branches_to_delete = squashed_branches
     else:
-        branches_to_delete = select_branches_interactive([], squashed_branches)
+        branches_to_delete = select_branches_interactive([], squashed_branches, directory, picker)
     
     if branches_to_delete:
-        delete_branches_concurrently(directory, branches_to_delete)
+        delete_branches_batch(directory, branches_to_delete)
 
 
 @cleanup.command()
@@ -449,14 +413,22 @@ def squashed(directory, auto):
     is_flag=True, 
     help="Automatically delete all cleanup candidates without confirmation"
 )
-def all(threshold_days, directory, auto):
+@click.option(
+    "--strategy",
+    type=click.Choice(SQUASH_STRATEGIES),
+    default=PATCH_ID_STRATEGY,
+    help="Squash detection: match patch ids, or check that merging into main changes nothing.",
+)
+@picker_option
+def all(threshold_days, directory, auto, strategy, picker):
     """Clean up all types of branches (stale, merged, and squashed)."""
     click.echo("Finding all branches that can be cleaned up...")
     
-    # Get all types of branches
-    stale_branches = get_stale_branches(directory, threshold_days)
-    merged_branches = get_merged_branches(directory)
-    squashed_branches = get_squashed_branches(directory)
+    # Get all types of branches from one shared analysis pass
+    snapshot = RepoSnapshot(directory)
+    stale_branches = get_stale_branches(directory, threshold_days, snapshot)
+    merged_branches = get_merged_branches(directory, snapshot)
+    squashed_branches = get_squashed_branches(directory, strategy, snapshot)
     
     # Combine and deduplicate
     all_branches = set()
@@ -475,10 +447,12 @@ def all(threshold_days, directory, auto):
     if auto:
         branches_to_delete = list(all_branches)
     else:
-        branches_to_delete = select_branches_interactive([], list(all_branches))
+        branches_to_delete = select_branches_interactive(
+            [], sorted(all_branches), directory, picker
+        )
     
     if branches_to_delete:
-        delete_branches_concurrently(directory, branches_to_delete)
+        delete_branches_batch(directory, branches_to_delete)
 
 
 @cleanup.command()
@@ -487,24 +461,23 @@ def all(threshold_days, directory, auto):
     default=".", 
     help="Directory to execute the git command in"
 )
-def custom(directory):
+@picker_option
+def custom(directory, picker):
     """Interactively select and delete any local branches."""
     click.echo("Getting all local branches...")
     
     try:
         # Get all local branches
-        result = run_git_command(["git", "branch"], directory)
-        if not result:
+        local_branches = RepoSnapshot(directory).local_tips
+        if not local_branches:
             click.echo("No local branches found.")
             return
         
-        # Parse branch names
         all_branches = []
-        for line in result.split('\n'):
-            branch = line.strip().replace('* ', '')
+        for branch in local_branches:
             click.echo(f"Branch: {branch}")
-            # Only add if branch is a non-empty string and passes filter
-            if isinstance(branch, str) and branch and filter_by_branch_name(branch):
+            # Only add if branch passes filter
+            if filter_by_branch_name(branch):
                 all_branches.append(branch)
         all_branches.sort()
         if not all_branches:
@@ -516,20 +489,22 @@ def custom(directory):
             click.echo(f"  - {branch}")
         
         # Interactive selection
-        branches_to_delete = select_branches_interactive([], all_branches)
+        branches_to_delete = select_branches_interactive([], all_branches, directory, picker)
         
         if branches_to_delete:
             click.echo(f"\nSelected {len(branches_to_delete)} branches for deletion:")
             for branch in branches_to_delete:
                 click.echo(f"  - {branch}")
             
+            from InquirerPy import inquirer
+
             confirm = inquirer.confirm(
                 "Are you sure you want to delete these branches?",
                 default=False
             ).execute()
             
             if confirm:
-                delete_branches_concurrently(directory, branches_to_delete)
+                delete_branches_batch(directory, branches_to_delete)
             else:
                 click.echo("Deletion cancelled.")
         else:
@@ -0,0 +1,284 @@
+import subprocess
+from typing import Dict, List, Optional, Set
+
+from logger.logger import Logger, LogLevel
+from porcelain import iter_refs, iter_worktrees
+
+logger = Logger("branch_delete", LogLevel.WARNING).logger_jl
+
+DELETED = "deleted"
+MISSING = "missing"
+CHECKED_OUT = "checked out"
+NOT_MERGED = "not merged"
+FAILED = "failed"
+
+
+def _checked_out_refs(directory: str) -> Set[str]:
+    """Branches checked out in any worktree; deleting those would orphan the worktree HEAD."""
+    return {
+        record["branch"] for record in iter_worktrees(directory) if "branch" in record
+    }
+
+
+def _existing_refs(directory: str, remote: str) -> Dict[str, str]:
+    return {
+        refname: sha
+        for sha, refname in iter_refs(
+            directory, ["objectname", "refname"], ["refs/heads", f"refs/remotes/{remote}"]
+        )
+    }
+
+
+def _unmerged_branches(directory: str, refnames: List[str]) -> Set[str]:
+    """
+    The local branches among refnames that `git branch --delete` would refuse.
+
+    Like git, a branch must be merged into its upstream, or into HEAD when it has no
+    upstream (or the upstream is gone). One for-each-ref --merged runs per reference.
+    """
+    wanted = set(refnames)
+    groups: Dict[str, List[str]] = {}
+    for refname, upstream, track in iter_refs(
+        directory, ["refname", "upstream", "upstream:track"], ["refs/heads"]
+    ):
+        if refname in wanted:
+            reference = upstream if upstream and track != "[gone]" else "HEAD"
+            groups.setdefault(reference, []).append(refname)
+    unmerged = set()
+    for reference, group in groups.items():
+        merged = {
+            refname for (refname,) in iter_refs(directory, ["refname"], group, merged=reference)
+        }
+        unmerged.update(refname for refname in group if refname not in merged)
+    return unmerged
+
+
+def delete_refs_transaction(
+    directory: str, branches: List[str], remote: str = "origin", force: bool = False
+) -> Dict[str, str]:
+    """
+    Delete local branches and their remote-tracking refs in one atomic ref transaction.
+
+    A local branch that is kept (CHECKED_OUT or NOT_MERGED) keeps its remote-tracking
+    ref too. Every ref is deleted with its expected old value through a single
+    `git update-ref --stdin` process, so there is no contention on packed-refs.lock
+    between parallel git processes. If the transaction aborts (a ref moved or vanished
+    in the meantime), the refs are retried one by one so each gets its own result.
+    The [branch "<name>"] config sections of deleted local branches are removed too.
+
+    Parameters:
+        directory (str): The repository directory.
+        branches (List[str]): Branch names (without refs/heads/ or <remote>/).
+        remote (str): Remote whose remote-tracking refs are deleted too.
+        force (bool): Also delete local branches that are not merged (`git branch -D`);
+            without it they are kept and reported as NOT_MERGED (`git branch --delete`).
+
+    Returns:
+        Dict[str, str]: Status per ref name: DELETED, MISSING, CHECKED_OUT, NOT_MERGED
+        or FAILED.
+    """
+    existing = _existing_refs(directory, remote)
+    checked_out = _checked_out_refs(directory)
+    unmerged = set() if force else _unmerged_branches(
+        directory, [f"refs/heads/{branch}" for branch in branches]
+    )
+
+    results: Dict[str, str] = {}
+    to_delete: List[str] = []
+    for branch in branches:
+        local = f"refs/heads/{branch}"
+        tracking = f"refs/remotes/{remote}/{branch}"
+        if local not in existing:
+            results[local] = MISSING
+        elif local in checked_out:
+            results[local] = CHECKED_OUT
+        elif local in unmerged:
+            results[local] = NOT_MERGED
+        else:
+            to_delete.append(local)
+        if results.get(local, MISSING) != MISSING:
+            # a kept branch keeps its tracking ref, or it would lose its upstream and ahead/behind
+            continue
+        if tracking in existing:
+            to_delete.append(tracking)
+        else:
+            results[tracking] = MISSING
+    if not to_delete:
+        return results
+
+    commands = "".join(f"delete {refname} {existing[refname]}\n" for refname in to_delete)
+    process = subprocess.run(
+        ["git", "update-ref", "--stdin"],
+        cwd=directory,
+        input=f"start\n{commands}prepare\ncommit\n",
+        text=True,
+        capture_output=True,
+    )
+    if process.returncode == 0:
+        for refname in to_delete:
+            results[refname] = DELETED
+    else:
+        # one stale or vanished ref aborts the whole transaction: give every ref its own result
+        logger.warning(
+            f"[branch_delete] ref transaction aborted, deleting one by one: {process.stderr.strip()}"
+        )
+        results.update(_delete_refs_one_by_one(directory, to_delete, existing, remote))
+
+    _remove_branch_config(
+        directory,
+        [
+            refname.removeprefix("refs/heads/")
+            for refname in to_delete
+            if refname.startswith("refs/heads/") and results[refname] == DELETED
+        ],
+    )
+    return results
+
+
+def _delete_refs_one_by_one(
+    directory: str, refnames: List[str], expected: Dict[str, str], remote: str
+) -> Dict[str, str]:
+    current = _existing_refs(directory, remote)
+    results = {}
+    for refname in refnames:
+        if refname not in current:
+            results[refname] = MISSING
+            continue
+        process = subprocess.run(
+            ["git", "update-ref", "-d", refname, expected[refname]],
+            cwd=directory,
+            text=True,
+            capture_output=True,
+        )
+        if process.returncode == 0:
+            results[refname] = DELETED
+        else:
+            results[refname] = FAILED
+            logger.error(f"[branch_delete] could not delete {refname}: {process.stderr.strip()}")
+    return results
+
+
+def _remove_branch_config(directory: str, branches: List[str]):
+    """
+    Drop the [branch "<name>"] sections of deleted branches, as `git branch -D` does.
+
+    (Deleting a ref through update-ref already removes its reflog.)
+    """
+    if not branches:
+        return
+    # one read to find which branches have a section at all; most deleted branches do not
+    process = subprocess.run(
+        ["git", "config", "--local", "--name-only", "--get-regexp", r"^branch\."],
+        cwd=directory,
+        text=True,
+        capture_output=True,
+    )
+    # keys look like branch.<name>.<variable>, and <name> may contain dots
+    configured = {
+        key.removeprefix("branch.").rsplit(".", 1)[0] for key in process.stdout.splitlines()
+    }
+    for branch in branches:
+        if branch not in configured:
+            continue
+        removed = subprocess.run(
+            ["git", "config", "--local", "--remove-section", f"branch.{branch}"],
+            cwd=directory,
+            text=True,
+            capture_output=True,
+        )
+        if removed.returncode != 0:
+            logger.warning(
+                f"[branch_delete] could not remove the config of {branch}: {removed.stderr.strip()}"
+            )
+
+
+def summarize_branch_results(
+    branches: List[str], results: Dict[str, str], remote: str = "origin"
+) -> Dict[str, str]:
+    """
+    Collapse per-ref results into one status per branch.
+
+    A branch counts as DELETED if its local branch or its remote-tracking ref was deleted.
+    """
+    summary = {}
+    for branch in branches:
+        local = results.get(f"refs/heads/{branch}", MISSING)
+        tracking = results.get(f"refs/remotes/{remote}/{branch}", MISSING)
+        if FAILED in (local, tracking):
+            summary[branch] = FAILED
+        elif DELETED in (local, tracking):
+            summary[branch] = DELETED
+        elif CHECKED_OUT in (local, tracking):
+            summary[branch] = CHECKED_OUT
+        elif NOT_MERGED in (local, tracking):
+            summary[branch] = NOT_MERGED
+        else:
+            summary[branch] = MISSING
+    return summary
+
+
+def _remote_heads(directory: str, remote: str) -> Optional[Set[str]]:
+    """Branch names on the remote, from a single ref advertisement; None if it is unreachable."""
+    try:
+        output = subprocess.check_output(
+            ["git", "ls-remote", "--heads", remote],
+            cwd=directory,
+            text=True,
+            stderr=subprocess.PIPE,
+        )
+    except subprocess.CalledProcessError as e:
+        logger.error(f"[branch_delete] could not list the branches on {remote}: {e.stderr.strip()}")
+        return None
+    return {
+        line.split("\t", 1)[1].removeprefix("refs/heads/")
+        for line in output.splitlines()
+        if "\t" in line
+    }
+
+
+def delete_remote_branches(
+    directory: str, branches: List[str], remote: str = "origin", atomic: bool = False
+) -> Dict[str, str]:
+    """
+    Delete branches on a remote with a single `git push` carrying one refspec per branch.
+
+    The targets are checked against one `git ls-remote` advertisement first so branches
+    that are already gone are reported as MISSING instead of failing the push.
+    If the remote cannot be reached, every branch is reported as FAILED.
+
+    Parameters:
+        directory (str): The repository directory.
+        branches (List[str]): Branch names on the remote (without refs/heads/).
+        remote (str): The remote to push to.
+        atomic (bool): Ask the remote to apply all deletions or none (`git push --atomic`).
+
+    Returns:
+        Dict[str, str]: Status per branch name: DELETED, MISSING or FAILED.
+    """
+    remote_heads = _remote_heads(directory, remote)
+    if remote_heads is None:
+        return {branch: FAILED for branch in branches}
+    results = {branch: MISSING for branch in branches if branch not in remote_heads}
+    targets = [branch for branch in branches if branch in remote_heads]
+    if not targets:
+        return results
+
+    cmd = ["git", "push", "--porcelain", "--no-verify"]
+    if atomic:
+        cmd.append("--atomic")
+    cmd.append(remote)
+    cmd.extend(f":refs/heads/{branch}" for branch in targets)
+    process = subprocess.run(cmd, cwd=directory, text=True, capture_output=True)
+
+    # porcelain lines look like "-\t:refs/heads/<branch>\t[deleted]"; "!" marks a rejection
+    pushed = {}
+    for line in process.stdout.splitlines():
+        parts = line.split("\t")
+        if len(parts) >= 2 and ":" in parts[1]:
+            branch = parts[1].split(":", 1)[1].removeprefix("refs/heads/")
+            pushed[branch] = DELETED if parts[0] == "-" else FAILED
+    if process.returncode != 0:
+        logger.error(f"[branch_delete] push to {remote} failed: {process.stderr.strip()}")
+    for branch in targets:
+        results[branch] = pushed.get(branch, FAILED)
+    return results
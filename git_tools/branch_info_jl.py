@@ -1,12 +1,18 @@
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
 
+from branch_cache import (REF_NAMESPACES, current_fingerprint,
+                          load_branch_records, save_branch_records)
+from daemon_client import query
 from git_tool_constants import IS_VERBOSE
-from utils import run_command
+from object_reader import ObjectReader, UnsupportedRepository
+from porcelain import iter_refs
+from prefetch import start_background_prefetch
+from ref_store import RefStore
 from logger.logger import Logger, LogLevel
 
-logger = Logger("branch_info_jl", LogLevel.DEBUG).logger_jl
+logger = Logger("branch_info_jl", LogLevel.WARNING).logger_jl
 
 @dataclass
 class BranchInfoJL:
@@ -79,48 +85,189 @@ class BranchInfoJL:
             return self.name
 
 
+def _branch_info_from_fields(fields: List[str]) -> Optional[BranchInfoJL]:
+    try:
+        return BranchInfoJL(
+            date_string=fields[0], name=fields[1], author=fields[2], track=fields[3]
+        )
+    except ValueError as e:
+        if IS_VERBOSE:
+            logger.warning(f"[branch_info_jl] {e} - fields: {fields}")
+        return None
+
+
 def get_branch_info(directory: str, merged_to_main: bool = False) -> List[BranchInfoJL]:
     """
     Get the branch information for a given directory using git command.
 
+    A running git_tools_daemon answers from its warm snapshot; otherwise the records
+    come from get_branch_records(), and remote refs are refreshed by a background
+    prefetch (see prefetch) instead of a blocking `git fetch`.
+
     Parameters:
         directory (str): The directory path to get the branch information from.
 
     Returns:
         List[BranchInfo]: List of BranchInfo objects containing branch name, last commit date, and author.
     """
-    # Get all local and remote branches with their last commit date, branch name, and author
-    cmd = [
-        f"cd {directory};",
-        "git fetch;",
-        "git",
-        "for-each-ref",
-        "--sort=committerdate",
-        "--format='%(committerdate:short) || %(refname:short) || %(authorname) || %(upstream:track)'",
-    ]
+    records = query("branches", directory, merged_to_main=merged_to_main)
+    if records is None:
+        # never block on the network: refresh in the background and use what is on disk
+        start_background_prefetch(directory)
+        records = get_branch_records(directory, merged_to_main)
 
-    if merged_to_main:
-        cmd.append("--merged=main")
+    branch_info_list: List[BranchInfoJL] = []
+    for fields in records:
+        branch_info = _branch_info_from_fields(fields)
+        if branch_info is not None:
+            branch_info_list.append(branch_info)
+    return branch_info_list
 
-    output = run_command(" ".join(cmd))
-    if output is None:
-        return []
 
-    # Parse the output and extract branch information
+def get_branch_records(directory: str, merged_to_main: bool = False) -> List[List[str]]:
+    """
+    Return [date_string, name, author, track] for every ref, oldest commit first.
 
-    branch_info_list: List[BranchInfoJL] = []
-    for line in output.splitlines():
-        if not line:
-            continue
+    Dates and authors are read directly from the object database (see object_reader);
+    parsed records are cached per repository (see branch_cache) and reused while
+    packed-refs and the loose refs are unchanged.
+    """
+    records = load_branch_records(directory, merged_to_main)
+    if records is None:
+        fingerprint = current_fingerprint(directory)
         try:
-            branch_info = BranchInfoJL(
-                name="", date_string="1970-01-01", author="", track=""
-            )
-            branch_info.parse(line)
-            branch_info_list.append(branch_info)
-        except IndexError:
-            continue
-    return branch_info_list
+            records = _native_branch_records(directory, merged_to_main)
+        except (UnsupportedRepository, LookupError, ValueError, OSError) as e:
+            logger.debug(f"[branch_info_jl] native ref read failed ({e}), using for-each-ref")
+            records = list(_iter_branch_records(directory, merged_to_main))
+        save_branch_records(directory, records, fingerprint, merged_to_main)
+    else:
+        logger.debug(f"[branch_info_jl] using cached branch records for {directory}")
+    return records
+
+
+def _short_refname(refname: str) -> str:
+    """Mimic %(refname:short) for the namespaces in REF_NAMESPACES."""
+    for prefix in ("refs/heads/", "refs/tags/", "refs/remotes/"):
+        if refname.startswith(prefix):
+            short = refname[len(prefix):]
+            # refs/remotes/origin/HEAD is shortened to just "origin"
+            if prefix == "refs/remotes/" and short.endswith("/HEAD"):
+                short = short[: -len("/HEAD")]
+            return short
+    return refname
+
+
+def _commit_date_string(timestamp: int, tz_offset: str) -> str:
+    """Format a commit time like %(committerdate:short), in the committer's timezone."""
+    sign = -1 if tz_offset.startswith("-") else 1
+    digits = tz_offset.lstrip("+-").rjust(4, "0")
+    offset = timedelta(hours=int(digits[:2]), minutes=int(digits[2:4]))
+    return datetime.fromtimestamp(timestamp, timezone(sign * offset)).strftime("%Y-%m-%d")
+
+
+def _upstream_tracks(directory: str, merged_to_main: bool):
+    """
+    Return (refname -> upstream:track, refs merged into main or None).
+
+    Only local branches have an upstream, so without merged_to_main git only has to
+    look at refs/heads.
+    """
+    tracks = {
+        refname: track.strip()
+        for refname, track in iter_refs(
+            directory,
+            ["refname", "upstream:track"],
+            REF_NAMESPACES if merged_to_main else ["refs/heads"],
+            merged="main" if merged_to_main else None,
+        )
+    }
+    return tracks, (set(tracks) if merged_to_main else None)
+
+
+def branch_row(reader: ObjectReader, refname: str, sha: str, track: str = "") -> Optional[tuple]:
+    """
+    Build the (committer_time, refname, record) row of one ref for sorting and caching.
+
+    Returns:
+        Optional[tuple]: None for annotated tags, which have no committer date in
+        for-each-ref either.
+
+    Raises:
+        LookupError: If the commit cannot be read.
+    """
+    commit = reader.read_commit(sha, peel_tags=False)
+    if commit is None:
+        if refname.startswith("refs/tags/"):
+            return None
+        raise LookupError(f"cannot read commit {sha} for {refname}")
+    return (
+        commit.committer_time,
+        refname,
+        [
+            _commit_date_string(commit.committer_time, commit.committer_tz),
+            _short_refname(refname),
+            commit.author,
+            track,
+        ],
+    )
+
+
+def native_branch_rows(
+    directory: str, merged_to_main: bool = False, ref_store: Optional[RefStore] = None,
+    reader: Optional[ObjectReader] = None,
+) -> List[tuple]:
+    """
+    Build the branch_row() of every ref, in --sort=committerdate order.
+
+    Refs come from RefStore and committer dates/authors from ObjectReader, all in this
+    process; git is only asked for upstream tracking (and --merged=main if requested).
+    """
+    ref_store = ref_store or RefStore(directory)
+    reader = reader or ObjectReader(directory)
+    tracks, merged_refs = _upstream_tracks(directory, merged_to_main)
+
+    rows = []
+    for namespace in REF_NAMESPACES:
+        for refname, sha in ref_store.refs(namespace).items():
+            if merged_refs is not None and refname not in merged_refs:
+                continue
+            row = branch_row(reader, refname, sha, tracks.get(refname, ""))
+            if row is not None:
+                rows.append(row)
+    # same order as --sort=committerdate (ties broken by refname)
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
+
+
+def upstream_tracks(directory: str, refnames: List[str]) -> dict:
+    """Return refname -> upstream:track for just the given local branches."""
+    if not refnames:
+        return {}
+    wanted = set(refnames)
+    # a pattern also matches the refs below it (refs/heads/x matches refs/heads/x/y)
+    return {
+        refname: track.strip()
+        for refname, track in iter_refs(directory, ["refname", "upstream:track"], refnames)
+        if refname in wanted
+    }
+
+
+def _native_branch_records(directory: str, merged_to_main: bool) -> List[List[str]]:
+    """Build [date_string, name, author, track] records without for-each-ref formatting."""
+    return [row[2] for row in native_branch_rows(directory, merged_to_main)]
+
+
+def _iter_branch_records(directory: str, merged_to_main: bool) -> Iterator[List[str]]:
+    """Stream [date_string, name, author, track] records from for-each-ref as git emits them."""
+    # Get all local and remote branches with their last commit date, branch name, and author
+    yield from iter_refs(
+        directory,
+        ["committerdate:short", "refname:short", "authorname", "upstream:track"],
+        REF_NAMESPACES,
+        sort="committerdate",
+        merged="main" if merged_to_main else None,
+    )
 
 
 def format_branch_info_names(branch_infos: List[BranchInfoJL]):
@@ -0,0 +1,350 @@
+import heapq
+import json
+import os
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fzf_picker import PICKER_FZF, PICKER_INQUIRER, fzf_available, fzf_select
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir, write_json_atomic
+from logger.logger import Logger, LogLevel
+
+if TYPE_CHECKING:
+    from InquirerPy.base.control import Choice
+
+logger = Logger("branch_search", LogLevel.WARNING).logger_jl
+
+# below this many choices InquirerPy's own fuzzy prompt is fast enough
+SEARCH_THRESHOLD = 2000
+# matches shown while typing, and offered for multi-selection after narrowing
+TOP_K = 30
+TOP_K_MULTISELECT = 200
+
+FRECENCY_VERSION = 1
+# (max age in days, weight) buckets, most recent first
+FRECENCY_BUCKETS = [(4, 100), (14, 70), (31, 50), (90, 30)]
+FRECENCY_OLD_WEIGHT = 10
+
+TOKEN_SPLIT = re.compile(r"[\s/_\-.|*]+")
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def choice_key(value: Any) -> str:
+    """The string a choice value is remembered by (BranchInfoJL values use their name)."""
+    return str(getattr(value, "name", value))
+
+
+def _choice_parts(choice) -> Tuple[Any, str]:
+    if isinstance(choice, dict):
+        return choice["value"], str(choice.get("name", choice["value"]))
+    # InquirerPy Choice, matched by shape so this module does not import InquirerPy
+    if hasattr(choice, "value") and hasattr(choice, "name"):
+        return choice.value, str(choice.name)
+    return choice, str(choice)
+
+
+class Frecency:
+    """
+    How often and how recently each branch/worktree was picked, persisted per repository.
+
+    The score of a key is the sum over its recorded uses of a weight that decays with
+    the age of the use (see FRECENCY_BUCKETS); only the last few use times are kept.
+    """
+
+    MAX_VISITS = 10
+
+    def __init__(self, directory: str):
+        git_dirs = resolve_git_dirs(directory)
+        cache_dir = tool_cache_dir(git_dirs.common_dir if git_dirs else directory)
+        self.frecency_file = os.path.join(cache_dir, "frecency.json")
+        self.lock_file = os.path.join(cache_dir, "frecency.lock")
+        self.visits: Dict[str, List[float]] = self._load()
+
+    def _load(self) -> Dict[str, List[float]]:
+        try:
+            with open(self.frecency_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get("version") != FRECENCY_VERSION:
+            return {}
+        return stored.get("visits", {})
+
+    def score(self, key: str, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        total = 0
+        for visit in self.visits.get(key, []):
+            age_days = (now - visit) / 86400
+            total += next(
+                (weight for max_age, weight in FRECENCY_BUCKETS if age_days <= max_age),
+                FRECENCY_OLD_WEIGHT,
+            )
+        return total
+
+    def record(self, keys: Iterable[str]):
+        """Remember that keys were just picked."""
+        keys = list(keys)
+        if not keys:
+            return
+        with file_lock(self.lock_file):
+            # merge with uses recorded by other processes since we loaded
+            self.visits = self._load()
+            now = time.time()
+            for key in keys:
+                self.visits[key] = (self.visits.get(key, []) + [now])[-self.MAX_VISITS :]
+            write_json_atomic(
+                self.frecency_file, {"version": FRECENCY_VERSION, "visits": self.visits}
+            )
+
+
+class BranchSearchIndex:
+    """
+    Precomputed search over choice labels (branch name, author, worktree path, ...).
+
+    Every whitespace-separated query term must occur in the label. Labels are split into
+    tokens (on spaces, "/", "-", "_", ...) with a posting list per distinct token, and
+    the distinct tokens get a trigram index. A keystroke looks up the tokens containing
+    each piece of the query (trigrams for three or more characters, a scan of the
+    vocabulary for shorter ones) and only scores labels holding all of them. When
+    nothing matches that way, a fuzzy (in-order subsequence) scan is the fallback.
+    Results are ranked by match quality plus frecency and cut to the top `limit`.
+    """
+
+    def __init__(self, choices: List[Any], frecency: Optional[Frecency] = None):
+        self.choices = choices
+        self.values: List[Any] = []
+        self.labels: List[str] = []
+        self.texts: List[str] = []
+        self.token_postings: Dict[str, List[int]] = {}
+        self.positions_by_key: Dict[str, int] = {}
+        for position, choice in enumerate(choices):
+            value, label = _choice_parts(choice)
+            self.positions_by_key.setdefault(choice_key(value), position)
+            text = f"{label} {choice_key(value)}".lower()
+            self.values.append(value)
+            self.labels.append(label)
+            self.texts.append(text)
+            for token in set(TOKEN_SPLIT.split(text)):
+                if token:
+                    self.token_postings.setdefault(token, []).append(position)
+
+        self.trigram_tokens: Dict[str, Set[str]] = {}
+        for token in self.token_postings:
+            for trigram in _trigrams(token):
+                self.trigram_tokens.setdefault(trigram, set()).add(token)
+
+        frecency_scores = {}
+        if frecency is not None:
+            now = time.time()
+            for position, value in enumerate(self.values):
+                score = frecency.score(choice_key(value), now)
+                if score:
+                    frecency_scores[position] = score
+        self.frecency_scores = frecency_scores
+        # empty query: most frecent first, then the caller's order
+        self.default_order = sorted(
+            range(len(choices)), key=lambda position: -frecency_scores.get(position, 0)
+        )
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def _tokens_containing(self, piece: str) -> Iterable[str]:
+        if len(piece) < 3:
+            return (token for token in self.token_postings if piece in token)
+        tokens: Optional[Set[str]] = None
+        for trigram in sorted(_trigrams(piece), key=lambda t: len(self.trigram_tokens.get(t, ()))):
+            matching = self.trigram_tokens.get(trigram, set())
+            tokens = set(matching) if tokens is None else tokens & matching
+            if not tokens:
+                return ()
+        return (token for token in tokens if piece in token)
+
+    def _candidates(self, terms: List[str]) -> Set[int]:
+        candidates: Optional[Set[int]] = None
+        for term in terms:
+            for piece in TOKEN_SPLIT.split(term):
+                if not piece:
+                    continue
+                positions: Set[int] = set()
+                for token in self._tokens_containing(piece):
+                    positions.update(self.token_postings[token])
+                candidates = positions if candidates is None else candidates & positions
+                if not candidates:
+                    return set()
+        return candidates if candidates is not None else set(range(len(self.texts)))
+
+    @staticmethod
+    def _subsequence_span(term: str, text: str) -> Optional[int]:
+        """Length of the text spanned by term's characters in order, or None."""
+        start = position = -1
+        for char in term:
+            position = text.find(char, position + 1)
+            if position < 0:
+                return None
+            if start < 0:
+                start = position
+        return position - start + 1
+
+    def _match_score(self, position: int, terms: List[str]) -> Optional[float]:
+        text = self.texts[position]
+        score = 0.0
+        for term in terms:
+            found = text.find(term)
+            if found < 0:
+                return None
+            score += 10 * len(term)
+            if found == 0 or not text[found - 1].isalnum():
+                score += 20  # starts a token
+            score -= found * 0.01
+        return score - len(text) * 0.001
+
+    def _fuzzy_score(self, position: int, terms: List[str]) -> Optional[float]:
+        text = self.texts[position]
+        score = 0.0
+        for term in terms:
+            span = self._subsequence_span(term, text)
+            if span is None:
+                return None
+            score += len(term) * len(term) / span
+        return score
+
+    def search(self, query: str, limit: int = TOP_K) -> List[int]:
+        """Positions of the best `limit` matches for query, best first."""
+        terms = query.lower().split()
+        if not terms:
+            return self.default_order[:limit]
+
+        scored = []
+        candidates = self._candidates(terms)
+        for position in candidates:
+            score = self._match_score(position, terms)
+            if score is not None:
+                scored.append((score, position))
+        if not scored:
+            for position in range(len(self.texts)):
+                score = self._fuzzy_score(position, terms)
+                if score is not None:
+                    scored.append((score, position))
+
+        best = heapq.nsmallest(
+            limit,
+            scored,
+            key=lambda item: (-(item[0] + self.frecency_scores.get(item[1], 0) / 10), item[1]),
+        )
+        return [position for _, position in best]
+
+
+def _index_completer(index: BranchSearchIndex, limit: int = TOP_K):
+    """A prompt_toolkit completer offering the top matches of index for the whole input."""
+    from prompt_toolkit.completion import Completer, Completion
+
+    class IndexCompleter(Completer):
+        def get_completions(self, document, complete_event):
+            query = document.text_before_cursor
+            for position in index.search(query, limit):
+                yield Completion(
+                    choice_key(index.values[position]),
+                    start_position=-len(query),
+                    display=index.labels[position],
+                )
+
+    return IndexCompleter()
+
+
+def _ranked_choices(index: BranchSearchIndex, positions: List[int]) -> List["Choice"]:
+    from InquirerPy.base.control import Choice
+
+    return [Choice(value=index.values[p], name=index.labels[p]) for p in positions]
+
+
+def search_select(
+    message: str,
+    choices: Iterable[Any],
+    directory: str = ".",
+    default: str = "",
+    multiselect: bool = False,
+    picker: str = PICKER_INQUIRER,
+) -> Any:
+    """
+    Pick one (or several) choices, ranked by frecency and searched through an index.
+
+    Up to SEARCH_THRESHOLD choices go straight to InquirerPy's fuzzy prompt, most
+    frecent first. Larger lists are searched with a text prompt whose completion menu
+    shows only the TOP_K best matches. Picking a completion selects it; any other query
+    narrows the list to the TOP_K (TOP_K_MULTISELECT for multiselect) best matches for a
+    fuzzy prompt, so a loose query never silently picks a branch.
+
+    With picker=PICKER_FZF (and fzf on PATH) choices are streamed to fzf instead, in
+    the order they are produced, so a generator lets the UI open before it is exhausted.
+
+    Parameters:
+        message (str): Prompt message.
+        choices (Iterable[Any]): InquirerPy Choices, {"name", "value"} dicts or plain values.
+        directory (str): The repository directory (frecency is stored per repository).
+        default (str): Initial query.
+        multiselect (bool): Allow several selections (returns a list).
+        picker (str): PICKER_INQUIRER or PICKER_FZF.
+
+    Returns:
+        Any: The selected value (None if nothing was picked or nothing matched), or a list
+        of values when multiselect is set.
+    """
+    frecency = Frecency(directory)
+    if picker == PICKER_FZF and not fzf_available():
+        logger.warning("[branch_search] fzf is not installed, using InquirerPy")
+        picker = PICKER_INQUIRER
+
+    if picker == PICKER_FZF:
+        selected = fzf_select(
+            message,
+            (_choice_parts(choice) for choice in choices),
+            default=default,
+            multiselect=multiselect,
+        )
+    else:
+        selected = _inquirer_select(
+            message, BranchSearchIndex(list(choices), frecency), default, multiselect
+        )
+
+    picked = selected if multiselect else [selected]
+    frecency.record(choice_key(value) for value in picked or [] if value is not None)
+    return selected
+
+
+def _inquirer_select(
+    message: str, index: BranchSearchIndex, default: str, multiselect: bool
+) -> Any:
+    from InquirerPy import inquirer
+
+    if len(index) <= SEARCH_THRESHOLD:
+        selected = inquirer.fuzzy(
+            message=message,
+            choices=_ranked_choices(index, index.default_order),
+            default=default,
+            multiselect=multiselect,
+        ).execute()
+    else:
+        logger.debug(f"[branch_search] {len(index)} choices, searching through the index")
+        query = inquirer.text(
+            message=message,
+            default=default,
+            completer=_index_completer(index),
+        ).execute()
+        # a completion inserts the exact key; anything else is narrowed to the best matches
+        position = index.positions_by_key.get(query)
+        if position is not None and not multiselect:
+            return index.values[position]
+        matches = index.search(query, TOP_K_MULTISELECT if multiselect else TOP_K)
+        if not matches:
+            logger.warning(f"[branch_search] nothing matches {query!r}")
+            return [] if multiselect else None
+        selected = inquirer.fuzzy(
+            message=message,
+            choices=_ranked_choices(index, matches),
+            multiselect=multiselect,
+        ).execute()
+    return selected
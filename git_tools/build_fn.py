@@ -1,41 +1,66 @@
 import os
 
+from typing import List, Optional
+
+from build_graph import (BuildStep, detach_step, install_step, run_build_graph,
+                         shell_step, symlink_step)
+from build_stamps import run_step
+from git_paths import resolve_git_dirs
 from logger.logger import Logger
-from utils import run_command, run_commands
+from utils import run_command
 
 logger = Logger("build_fn").logger_jl
 
 
-def default_build_function(directory: str):
+def default_build_steps(
+    directory: str,
+    rebuild: bool = False,
+    after: Optional[List[str]] = None,
+    open_editor: bool = True,
+) -> List[BuildStep]:
+    """Open the editor and install from the lockfile found (yarn, pnpm, npm or bun)."""
+    steps = [detach_step("editor", "code .", directory)] if open_editor else []
+    # reuses the node_modules of another worktree with the same lockfile, and is
+    # skipped while the lockfile and tool versions match the last install
+    steps.append(install_step("install", directory, rebuild=rebuild, after=after))
+    return steps
+
+
+def default_build_function(directory: str, rebuild: bool = False, open_editor: bool = True):
     # Change to the selected directory
     print(os.getcwd())
     os.chdir(directory)
-    run_command("code .")
-    # only run next command if there is a yarn.lock file present
-    if os.path.exists("yarn.lock"):
-        run_command("yarn")
-        return
-    if os.path.exists("pnpm-lock.yaml"):
-        run_command("pnpm install")
-        return
-    if os.path.exists("package-lock.json"):
-        run_command("npm install")
-        return
-    if os.path.exists("bun.lock") or os.path.exists("bun.lockb"):
-        run_command("bun install")
-
-
-def copy_husky_dir(git_dir: str):
-    os.makedirs(".husky/_", exist_ok=True)
-    print("[build_fn] copy husky dir")
-    run_command(f"cp {git_dir}/.husky/_/husky.sh .husky/_/")
-
-
-def neatleaf_build(directory: str, git_dir: str):
-    copy_husky_dir(git_dir)
-    print("[build_fn] copy envs")
-    run_command(f"cp {git_dir}/dashboard/.env dashboard")
-    default_build_function(directory)
+    run_build_graph("Build", default_build_steps(directory, rebuild, open_editor=open_editor))
+
+
+def _worktree_root(directory: str) -> str:
+    git_dirs = resolve_git_dirs(directory)
+    return git_dirs.worktree if git_dirs is not None else directory
+
+
+def copy_husky_dir_step(git_dir: str, worktree: str) -> BuildStep:
+    return shell_step(
+        "husky", f"mkdir -p .husky/_ && cp {git_dir}/.husky/_/husky.sh .husky/_/", worktree
+    )
+
+
+def neatleaf_build(
+    directory: str, git_dir: str, rebuild: bool = False, open_editor: bool = True
+):
+    # the husky script and env file go to the root of the worktree being built
+    worktree = _worktree_root(directory)
+    os.chdir(directory)
+    steps = [copy_husky_dir_step(git_dir, worktree)]
+    # a sparse worktree (see sparse_worktree) may not have the dashboard checked out
+    if os.path.isdir(os.path.join(worktree, "dashboard")):
+        steps.append(shell_step("envs", f"cp {git_dir}/dashboard/.env dashboard", worktree))
+    # install scripts may run the husky hooks and read the env file
+    steps.extend(
+        default_build_steps(
+            directory, rebuild, after=[step.name for step in steps], open_editor=open_editor
+        )
+    )
+    run_build_graph("Neatleaf Build", steps)
 
 
 def print_banner(title: str, message: str):
@@ -51,43 +76,64 @@ def print_banner(title: str, message: str):
     print("=" * bottom_decorator_count)
 
 
-def empo_build_function(dest_dir: str, git_dir: str):
+def empo_build_function(
+    dest_dir: str, git_dir: str, rebuild: bool = False, open_editor: bool = True
+):
     title = "Empo Build"
     message = f"{dest_dir}"
     print_banner(title, message)
     os.chdir(dest_dir)
 
-    # Start editor
+    # the editor and the theme script run detached: they no longer hold up the install
     # editor = "cursor"
     editor = "windsurf"
-    start_editor = [
-        f"{editor} .;",
-        "~/.bun/bin/bun run /Users/joe/Projects/js_for_fun/apply_vs_code_theme/index.ts;",
-    ]
-    run_commands(start_editor)
-    # Create symbolic links for envs
     env_dir = f"{git_dir}/../env"
-    create_symbolic_links = [
-        "echo 'creating symbolic links for envs';",
-        f"ln -sf {env_dir}/.env.server {dest_dir}/modules/backend-api/.env;",
-        f"ln -sf {env_dir}/.env.app {dest_dir}/modules/frontend-app/.env;",
-        f"ln -sf {env_dir}/.env.qa {dest_dir}/modules/qa/.env;",
-        f"ln -sf {env_dir}/.env.rhl-api-tools {dest_dir}/modules/helper-scripts/rhl-api-tools/.env;",
-        "echo 'creating symbolic links for vscode';"
-        f"ln -sf {env_dir}/vscode/launch.json {dest_dir}/.vscode/;",
-        f"ln -sf {env_dir}/vscode/tasks.json {dest_dir}/.vscode/;",
-        # "echo 'creating symbolic links for terraform';"
-        # f"ln -sf {env_dir}/terraform/.envrc.stacks.production {dest_dir}/infrastructure/stacks/production/.envrc;",
-        # f"ln -sf {env_dir}/terraform/.envrc.stacks.staging {dest_dir}/infrastructure/stacks/staging/.envrc;",
-    ]
-    run_commands(create_symbolic_links)
-
-    # Install packages
-    install_commands = [
-        # "source $HOME/.nvm/nvm.sh && nvm use 22 && corepack enable",
-        "yarn set version 4.7.0",
-        'echo "node: $(node --version)"',
-        'echo "yarn: $(yarn --version)"',
-        "yarn install",
+    # "source $HOME/.nvm/nvm.sh && nvm use 22 && corepack enable",
+    yarn_version = "4.7.0"
+    steps = [
+        detach_step(
+            "theme",
+            "~/.bun/bin/bun run /Users/joe/Projects/js_for_fun/apply_vs_code_theme/index.ts",
+            dest_dir,
+        ),
+        # symbolic links for envs
+        symlink_step("env server", f"{env_dir}/.env.server", f"{dest_dir}/modules/backend-api/.env"),
+        symlink_step("env app", f"{env_dir}/.env.app", f"{dest_dir}/modules/frontend-app/.env"),
+        symlink_step("env qa", f"{env_dir}/.env.qa", f"{dest_dir}/modules/qa/.env"),
+        symlink_step(
+            "env rhl-api-tools",
+            f"{env_dir}/.env.rhl-api-tools",
+            f"{dest_dir}/modules/helper-scripts/rhl-api-tools/.env",
+        ),
+        # symbolic links for vscode
+        symlink_step("vscode launch", f"{env_dir}/vscode/launch.json", f"{dest_dir}/.vscode/"),
+        symlink_step("vscode tasks", f"{env_dir}/vscode/tasks.json", f"{dest_dir}/.vscode/"),
+        # symbolic links for terraform
+        # symlink_step("terraform production", f"{env_dir}/terraform/.envrc.stacks.production", f"{dest_dir}/infrastructure/stacks/production/.envrc"),
+        # symlink_step("terraform staging", f"{env_dir}/terraform/.envrc.stacks.staging", f"{dest_dir}/infrastructure/stacks/staging/.envrc"),
+        # install packages
+        BuildStep(
+            "yarn set version",
+            lambda: run_step(
+                dest_dir,
+                "yarn set version",
+                [yarn_version],
+                lambda: run_command(f"cd {dest_dir} && yarn set version {yarn_version}"),
+                outputs=[".yarnrc.yml"],
+                rebuild=rebuild,
+            ),
+        ),
+        BuildStep(
+            "versions",
+            lambda: print(
+                run_command(
+                    f'cd {dest_dir} && echo "node: $(node --version)" && echo "yarn: $(yarn --version)"'
+                )
+            ),
+            after=["yarn set version"],
+        ),
+        install_step("install", dest_dir, "yarn install", rebuild, after=["yarn set version"]),
     ]
-    run_commands(install_commands)
+    if open_editor:
+        steps.insert(0, detach_step("editor", f"{editor} .", dest_dir))
+    run_build_graph(title, steps)
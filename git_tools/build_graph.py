@@ -0,0 +1,200 @@
+import os
+import shlex
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from logger.logger import Logger, LogLevel
+from utils import run_command
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+logger = Logger("build_graph", LogLevel.INFO).logger_jl
+
+# steps mostly wait on subprocesses, so threads are enough
+MAX_BUILD_STEP_WORKERS = 8
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class BuildFailed(Exception):
+    """A build step failed; the steps depending on it were not run."""
+
+
+@dataclass
+class BuildStep:
+    name: str
+    run: Callable[[], None]
+    after: List[str] = field(default_factory=list)
+    state: str = PENDING
+    seconds: Optional[float] = None
+    error: str = ""
+
+
+def symlink_step(name: str, source: str, link: str, after: Optional[List[str]] = None) -> BuildStep:
+    """
+    Like `ln -sf source link`, without a shell: a link ending in "/" (or naming an
+    existing directory) gets the link inside it, and an existing link is replaced.
+    """
+
+    def run():
+        path = link
+        if link.endswith("/") or (os.path.isdir(link) and not os.path.islink(link)):
+            path = os.path.join(link, os.path.basename(source))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.islink(path) or os.path.exists(path):
+            os.remove(path)
+        os.symlink(source, path)
+
+    return BuildStep(name, run, after or [])
+
+
+def detach_step(name: str, command: str, cwd: str, after: Optional[List[str]] = None) -> BuildStep:
+    """Start command (an editor, a theme script) and move on without waiting for it."""
+
+    def run():
+        subprocess.Popen(
+            ["bash", "-c", command],
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    return BuildStep(name, run, after or [])
+
+
+def shell_step(name: str, command: str, cwd: str, after: Optional[List[str]] = None) -> BuildStep:
+    """Run command through run_command() in cwd; a non-zero exit fails the build."""
+    return BuildStep(name, lambda: run_command(f"cd {shlex.quote(cwd)} && {command}"), after or [])
+
+
+def install_step(
+    name: str,
+    package_dir: str,
+    install_command: Optional[str] = None,
+    rebuild: bool = False,
+    after: Optional[List[str]] = None,
+) -> BuildStep:
+    """Install dependencies through dependency_store (build stamps and node_modules store)."""
+
+    def run():
+        # build_fn is imported with the profile constants; keep its imports light
+        from dependency_store import install_dependencies
+
+        install_dependencies(package_dir, install_command, rebuild=rebuild)
+
+    return BuildStep(name, run, after or [])
+
+
+def _check_graph(steps: List[BuildStep]):
+    names = [step.name for step in steps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate build step names in {names}")
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        for dependency in step.after:
+            if dependency not in by_name:
+                raise ValueError(f"build step {step.name!r} runs after unknown step {dependency!r}")
+    # depth-first search for cycles
+    visiting, visited = set(), set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"build steps form a cycle through {name!r}")
+        visiting.add(name)
+        for dependency in by_name[name].after:
+            visit(dependency)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in names:
+        visit(name)
+
+
+def run_build_graph(
+    title: str, steps: List[BuildStep], max_workers: int = MAX_BUILD_STEP_WORKERS
+) -> List[BuildStep]:
+    """
+    Run build steps concurrently, each as soon as the steps it comes after are done.
+
+    On the first failure no further steps are started; steps already running finish,
+    the rest are marked skipped. A timing line is logged for every step.
+
+    Parameters:
+        title (str): Build name for the log, e.g. "Empo Build".
+        steps (List[BuildStep]): The steps; `after` names the steps each one waits for.
+        max_workers (int): Maximum steps running at once.
+
+    Returns:
+        List[BuildStep]: The steps, with state, seconds and error filled in.
+
+    Raises:
+        ValueError: If step names are duplicated, unknown or form a cycle.
+        BuildFailed: If a step failed.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    _check_graph(steps)
+    start = time.perf_counter()
+    running: Dict["Future", BuildStep] = {}
+    failed: List[BuildStep] = []
+
+    def timed(step: BuildStep):
+        step_start = time.perf_counter()
+        try:
+            step.run()
+        finally:
+            step.seconds = time.perf_counter() - step_start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            if not failed:
+                for step in steps:
+                    if step.state != PENDING:
+                        continue
+                    if all(
+                        dependency.state == DONE
+                        for dependency in steps
+                        if dependency.name in step.after
+                    ):
+                        step.state = RUNNING
+                        running[pool.submit(timed, step)] = step
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    step.state = DONE
+                    logger.info(f"[{title}] {step.name} done in {step.seconds:.2f}s")
+                else:
+                    step.state = FAILED
+                    step.error = str(error)
+                    failed.append(step)
+                    logger.error(f"[{title}] {step.name} failed after {step.seconds:.2f}s: {error}")
+
+    for step in steps:
+        if step.state == PENDING:
+            step.state = SKIPPED
+    logger.info(
+        f"[{title}] {sum(step.state == DONE for step in steps)}/{len(steps)} steps"
+        f" in {time.perf_counter() - start:.2f}s"
+    )
+    if failed:
+        skipped = [step.name for step in steps if step.state == SKIPPED]
+        raise BuildFailed(
+            f"{title}: {', '.join(step.name for step in failed)} failed"
+            + (f"; skipped {', '.join(skipped)}" if skipped else "")
+        )
+    return steps
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import subprocess
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir, write_json_atomic
+from logger.logger import Logger, LogLevel
+
+logger = Logger("build_stamps", LogLevel.INFO).logger_jl
+
+BUILD_STAMPS_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's contents ("" if it does not exist)."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def tool_version(tool: str, directory: str) -> str:
+    """`<tool> --version` run in directory (corepack/yarnPath pick versions per dir), or ""."""
+    try:
+        process = subprocess.run(
+            [tool, "--version"], cwd=directory, capture_output=True, text=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return process.stdout.strip() if process.returncode == 0 else ""
+
+
+class BuildStamps:
+    """
+    Inputs of the last successful run of each build step, per package directory.
+
+    Stored per repository in the tool cache (build_stamps.json) and keyed by the
+    package dir's real path, so every worktree keeps its own stamps.
+    """
+
+    def __init__(self, directory: str):
+        git_dirs = resolve_git_dirs(directory)
+        if git_dirs is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        cache_dir = tool_cache_dir(git_dirs.common_dir)
+        self.stamps_file = os.path.join(cache_dir, "build_stamps.json")
+        self.lock_file = os.path.join(cache_dir, "build_stamps.lock")
+
+    def _load(self) -> Dict[str, Dict[str, dict]]:
+        try:
+            with open(self.stamps_file, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if payload.get("version") != BUILD_STAMPS_VERSION:
+            return {}
+        return payload.get("stamps", {})
+
+    def is_current(self, package_dir: str, step: str, inputs: List[str], outputs: List[str]) -> bool:
+        """True if step last ran with the same inputs and its outputs still exist."""
+        stamp = self._load().get(os.path.realpath(package_dir), {}).get(step)
+        if stamp is None or stamp.get("inputs") != inputs:
+            return False
+        return all(os.path.exists(os.path.join(package_dir, output)) for output in outputs)
+
+    def _save(self, stamps: Dict[str, Dict[str, dict]]):
+        try:
+            write_json_atomic(self.stamps_file, {"version": BUILD_STAMPS_VERSION, "stamps": stamps})
+        except OSError as e:
+            logger.warning(f"[build_stamps] could not write {self.stamps_file}: {e}")
+
+    def record(self, package_dir: str, step: str, inputs: List[str]):
+        with file_lock(self.lock_file):
+            stamps = self._load()
+            stamps.setdefault(os.path.realpath(package_dir), {})[step] = {"inputs": inputs}
+            self._save(stamps)
+
+    def move(self, old_package_dir: str, new_package_dir: str):
+        """Carry the stamps of a package dir over to where its worktree was moved."""
+        with file_lock(self.lock_file):
+            stamps = self._load()
+            moved = stamps.pop(os.path.realpath(old_package_dir), None)
+            if moved is None:
+                return
+            stamps[os.path.realpath(new_package_dir)] = moved
+            self._save(stamps)
+
+
+def run_step(
+    package_dir: str,
+    step: str,
+    inputs: List[str],
+    action: Callable[[], None],
+    outputs: Optional[List[str]] = None,
+    rebuild: bool = False,
+) -> bool:
+    """
+    Run a build step unless it already ran in package_dir with the same inputs.
+
+    Parameters:
+        package_dir (str): The directory the step builds (inside a worktree).
+        step (str): Step name, e.g. "install".
+        inputs (List[str]): Everything the result depends on (hashes, tool versions).
+        action (Callable[[], None]): Runs the step; a raised exception leaves no stamp.
+        outputs (Optional[List[str]]): Paths (relative to package_dir) the step creates;
+            the step reruns if one was deleted.
+        rebuild (bool): Run the step regardless of its stamp.
+
+    Returns:
+        bool: True if the step ran, False if it was skipped.
+    """
+    try:
+        stamps = BuildStamps(package_dir)
+    except ValueError:
+        # not in a repository: nowhere to keep stamps
+        action()
+        return True
+    if not rebuild and stamps.is_current(package_dir, step, inputs, outputs or []):
+        logger.info(f"[build_stamps] {step} is up to date in {package_dir}, skipping")
+        return False
+    action()
+    stamps.record(package_dir, step, inputs)
+    return True
@@ -0,0 +1,133 @@
+import json
+import os
+import socket
+import stat
+import tempfile
+from typing import Any, Optional
+
+from logger.logger import Logger, LogLevel
+
+logger = Logger("daemon_client", LogLevel.WARNING).logger_jl
+
+PROTOCOL_VERSION = 1
+# set in the daemon itself (and by users who want direct mode) to never query a daemon
+NO_DAEMON_ENV = "GIT_TOOLS_NO_DAEMON"
+CONNECT_TIMEOUT_SECONDS = 0.2
+# a cold snapshot of a large repository can take a while to build
+REPLY_TIMEOUT_SECONDS = 60
+
+
+class DaemonError(Exception):
+    """The daemon answered, but could not serve the request."""
+
+
+class InsecureSocketPath(PermissionError):
+    """The daemon socket (or its directory) is not owned by and private to this user."""
+
+
+def check_private(path: str, socket_file: bool = False):
+    """
+    Make sure path belongs to this user and nobody else can access it.
+
+    Parameters:
+        path (str): The socket directory (or the socket, with socket_file).
+        socket_file (bool): path must be a Unix socket instead of a directory.
+
+    Raises:
+        InsecureSocketPath: If path is another user's, accessible to others, or a
+            symlink or other file type.
+        OSError: If path cannot be stat'ed (e.g. it does not exist).
+    """
+    # lstat: a symlink planted in a shared directory must not be followed
+    st = os.lstat(path)
+    is_expected_type = stat.S_ISSOCK(st.st_mode) if socket_file else stat.S_ISDIR(st.st_mode)
+    if not is_expected_type or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise InsecureSocketPath(
+            f"{path} must be a {'socket' if socket_file else 'directory'} owned by uid"
+            f" {os.getuid()} with no group/other access (uid {st.st_uid}, mode {oct(st.st_mode)})"
+        )
+
+
+def _private_dir(path: str):
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        st = os.lstat(path)
+        if stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and st.st_mode & 0o077:
+            # ours but created with the umask (older versions): nobody else could write to it
+            os.chmod(path, 0o700)
+    check_private(path)
+
+
+def daemon_socket_path() -> str:
+    """
+    The per-user Unix socket the daemon listens on.
+
+    Without XDG_RUNTIME_DIR it lives under the shared temp dir, where another user
+    could create the directories first, so every directory is checked to be ours
+    and private (0700) before it is used.
+
+    Raises:
+        InsecureSocketPath: If a directory is not owned by and private to this user.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+        tempfile.gettempdir(), f"git_tools-{os.getuid()}"
+    )
+    socket_dir = os.path.join(runtime_dir, "git_tools")
+    _private_dir(runtime_dir)
+    _private_dir(socket_dir)
+    return os.path.join(socket_dir, "daemon.sock")
+
+
+def send_request(request: dict, timeout: float = REPLY_TIMEOUT_SECONDS) -> Any:
+    """
+    Send one JSON request line to the daemon and return the "result" of its reply.
+
+    Raises:
+        OSError: If the daemon is not running or the connection fails.
+        InsecureSocketPath: If the socket or its directory is not private to this user;
+            the reply could not be trusted.
+        DaemonError: If the daemon reported an error.
+    """
+    socket_path = daemon_socket_path()
+    check_private(socket_path, socket_file=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(CONNECT_TIMEOUT_SECONDS)
+        client.connect(socket_path)
+        client.settimeout(timeout)
+        client.sendall(json.dumps({"version": PROTOCOL_VERSION, **request}).encode() + b"\n")
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise OSError("daemon closed the connection")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise DaemonError(reply.get("error", "unknown daemon error"))
+    return reply.get("result")
+
+
+def query(op: str, directory: str, **params) -> Optional[Any]:
+    """
+    Ask a running daemon for repository state; None means "not available, work directly".
+
+    Parameters:
+        op (str): "branches", "worktrees" or "status".
+        directory (str): Any directory inside the repository.
+        **params: Extra request fields (e.g. merged_to_main).
+
+    Returns:
+        Optional[Any]: The daemon's result, or None if there is no daemon, it failed
+        or direct mode was requested through GIT_TOOLS_NO_DAEMON.
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+    try:
+        return send_request({"op": op, "directory": os.path.abspath(directory), **params})
+    except DaemonError as e:
+        logger.warning(f"[daemon_client] {op} failed in the daemon, working directly: {e}")
+    except InsecureSocketPath as e:
+        logger.warning(f"[daemon_client] not using the daemon, working directly: {e}")
+    except (OSError, ValueError):
+        # no daemon running (or it went away): direct mode
+        pass
+    return None
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from build_stamps import file_hash, run_step, tool_version
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir
+from logger.logger import Logger, LogLevel
+from utils import run_command
+
+logger = Logger("dependency_store", LogLevel.INFO).logger_jl
+
+STORE_VERSION = 2
+# (lockfile, install command), in the order default_build_function used to check them
+LOCKFILES: List[Tuple[str, str]] = [
+    ("yarn.lock", "yarn"),
+    ("pnpm-lock.yaml", "pnpm install"),
+    ("package-lock.json", "npm install"),
+    ("bun.lock", "bun install"),
+    ("bun.lockb", "bun install"),
+]
+NODE_MODULES = "node_modules"
+MANIFEST = "manifest.json"
+# never descended into when looking for workspace node_modules
+SKIPPED_DIRS = {NODE_MODULES, ".git", ".yarn", ".next", "dist", "build"}
+
+
+def find_lockfile(package_dir: str) -> Optional[Tuple[str, str]]:
+    """Return (lockfile path, install command) for the first lockfile in package_dir."""
+    for lockfile, install_command in LOCKFILES:
+        path = os.path.join(package_dir, lockfile)
+        if os.path.exists(path):
+            return path, install_command
+    return None
+
+
+def store_key(package_dir: str, lockfile: str, toolchain: List[str]) -> Optional[str]:
+    """
+    Hash of the lockfile contents, the toolchain and the package dir's path inside its worktree.
+
+    Two worktrees share an entry when the same package (e.g. "dashboard") pins the
+    same dependency versions, wherever the worktrees live on disk. The toolchain
+    (package manager and Node versions) is part of the key because native addons in
+    node_modules are built for one Node ABI.
+    """
+    git_dirs = resolve_git_dirs(package_dir)
+    if git_dirs is None:
+        return None
+    relative_dir = os.path.relpath(os.path.realpath(package_dir), os.path.realpath(git_dirs.worktree))
+    digest = hashlib.sha256(
+        "\0".join([str(STORE_VERSION), relative_dir, *toolchain, ""]).encode("utf-8")
+    )
+    with open(lockfile, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store_dir(package_dir: str) -> Optional[str]:
+    git_dirs = resolve_git_dirs(package_dir)
+    if git_dirs is None:
+        return None
+    store_dir = os.path.join(tool_cache_dir(git_dirs.common_dir), "dependency_store")
+    os.makedirs(store_dir, exist_ok=True)
+    return store_dir
+
+
+def _node_modules_dirs(package_dir: str) -> List[str]:
+    """node_modules dirs of the package and its workspaces, relative to package_dir."""
+    found = []
+    for root, dirs, _ in os.walk(package_dir):
+        if NODE_MODULES in dirs:
+            found.append(os.path.relpath(os.path.join(root, NODE_MODULES), package_dir))
+        dirs[:] = [name for name in dirs if name not in SKIPPED_DIRS]
+    return found
+
+
+def _clone_tree(source: str, destination: str) -> str:
+    """
+    Copy a directory tree as cheaply as the filesystem allows.
+
+    Tries a copy-on-write clone (APFS clonefile via `cp -c`, btrfs/XFS reflinks via
+    `cp --reflink=always`), then a plain copy. Never hardlinks: a file shared with the
+    store would be corrupted for every worktree by one in-place write (a cache under
+    node_modules/.cache, a postinstall patch).
+
+    Returns:
+        str: "reflink" or "copy".
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    clone_flag = "-c" if sys.platform == "darwin" else "--reflink=always"
+    process = subprocess.run(
+        ["cp", "-R", clone_flag, source, destination],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if process.returncode == 0:
+        return "reflink"
+    shutil.rmtree(destination, ignore_errors=True)
+    shutil.copytree(source, destination, symlinks=True)
+    return "copy"
+
+
+def restore_node_modules(package_dir: str, key: str) -> bool:
+    """
+    Populate package_dir's node_modules dirs from the store entry for key.
+
+    Returns:
+        bool: True if the entry existed and was restored.
+    """
+    store_dir = _store_dir(package_dir)
+    if store_dir is None:
+        return False
+    entry = os.path.join(store_dir, key)
+    try:
+        with open(os.path.join(entry, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != STORE_VERSION:
+        return False
+
+    start = time.perf_counter()
+    methods = set()
+    for relative_dir in manifest["node_modules"]:
+        destination = os.path.join(package_dir, relative_dir)
+        if os.path.exists(destination):
+            shutil.rmtree(destination)
+        methods.add(_clone_tree(os.path.join(entry, "tree", relative_dir), destination))
+    logger.info(
+        f"[dependency_store] restored {len(manifest['node_modules'])} node_modules dirs"
+        f" by {'/'.join(sorted(methods))} in {time.perf_counter() - start:.1f}s"
+    )
+    return True
+
+
+def save_node_modules(package_dir: str, key: str):
+    """Add package_dir's installed node_modules dirs to the store under key."""
+    store_dir = _store_dir(package_dir)
+    relative_dirs = _node_modules_dirs(package_dir)
+    if store_dir is None or not relative_dirs:
+        # e.g. Yarn Plug'n'Play installs have no node_modules to share
+        return
+    entry = os.path.join(store_dir, key)
+    with file_lock(os.path.join(store_dir, f"{key}.lock"), blocking=False) as locked:
+        if not locked or os.path.exists(os.path.join(entry, MANIFEST)):
+            # another worktree is saving (or has saved) the same dependencies
+            return
+        # build next to the entry and rename, so a partial entry is never restored
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        try:
+            for relative_dir in relative_dirs:
+                _clone_tree(
+                    os.path.join(package_dir, relative_dir),
+                    os.path.join(tmp_entry, "tree", relative_dir),
+                )
+            with open(os.path.join(tmp_entry, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump({"version": STORE_VERSION, "node_modules": relative_dirs}, f)
+            os.replace(tmp_entry, entry)
+            logger.info(f"[dependency_store] stored {len(relative_dirs)} node_modules dirs")
+        except OSError as e:
+            logger.warning(f"[dependency_store] could not store node_modules: {e}")
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def _install_outputs(package_dir: str) -> List[str]:
+    # Yarn Plug'n'Play resolves through .pnp.cjs instead of node_modules
+    if os.path.exists(os.path.join(package_dir, ".pnp.cjs")):
+        return [".pnp.cjs"]
+    return [NODE_MODULES]
+
+
+def install_dependencies(
+    package_dir: str, install_command: Optional[str] = None, rebuild: bool = False
+) -> bool:
+    """
+    Install package_dir's dependencies, from the store when its lockfile was seen before.
+
+    The install is skipped entirely while its build stamp (lockfile hash, package
+    manager and Node versions, see build_stamps) is unchanged and node_modules exists.
+
+    Parameters:
+        package_dir (str): Directory containing the lockfile.
+        install_command (Optional[str]): Overrides the command implied by the lockfile.
+        rebuild (bool): Ignore the build stamp and the store and run the package manager.
+
+    Returns:
+        bool: False if there is no lockfile (nothing was installed).
+    """
+    lockfile = find_lockfile(package_dir)
+    if lockfile is None:
+        return False
+    lockfile_path, default_command = lockfile
+    command = install_command or default_command
+    manager = command.split()[0]
+    inputs = [
+        file_hash(lockfile_path),
+        f"{manager} {tool_version(manager, package_dir)}",
+        f"node {tool_version('node', package_dir)}",
+    ]
+
+    def install():
+        # the same node_modules are only reused under the same package manager and Node
+        key = store_key(package_dir, lockfile_path, inputs[1:])
+        if key is not None and not rebuild and restore_node_modules(package_dir, key):
+            return
+        run_command(f"cd {shlex.quote(package_dir)} && {command}")
+        if key is not None:
+            save_node_modules(package_dir, key)
+
+    run_step(package_dir, "install", inputs, install, _install_outputs(package_dir), rebuild)
+    return True
@@ -0,0 +1,117 @@
+import shutil
+import subprocess
+import threading
+from typing import Any, Iterable, List, Tuple
+
+import click
+
+from logger.logger import Logger, LogLevel
+
+logger = Logger("fzf_picker", LogLevel.WARNING).logger_jl
+
+PICKER_INQUIRER = "inquirer"
+PICKER_FZF = "fzf"
+PICKERS = [PICKER_INQUIRER, PICKER_FZF]
+
+# fzf exits with 1 when nothing matched and 130 when the user aborted
+FZF_NO_SELECTION = (1, 130)
+
+picker_option = click.option(
+    "--picker",
+    type=click.Choice(PICKERS),
+    default=PICKER_INQUIRER,
+    help="Selection UI: InquirerPy prompts, or an external fzf process fed as choices are found.",
+)
+
+
+def fzf_available() -> bool:
+    return shutil.which("fzf") is not None
+
+
+def _clean_label(label: str) -> str:
+    # one choice per line, and the tab separates the hidden index from the label
+    return label.replace("\t", " ").replace("\n", " ")
+
+
+def fzf_select(
+    message: str,
+    entries: Iterable[Tuple[Any, str]],
+    default: str = "",
+    multiselect: bool = False,
+) -> Any:
+    """
+    Let the user pick from (value, label) entries in fzf, streaming them as they are produced.
+
+    Each label is written to fzf's stdin as soon as the iterable yields it, prefixed with
+    a hidden index, so fzf is interactive (and filtering natively) while the caller is
+    still enumerating. If the user picks before enumeration finishes, the rest of the
+    entries are not consumed.
+
+    Parameters:
+        message (str): Shown as fzf's prompt.
+        entries (Iterable[Tuple[Any, str]]): (value, label) pairs.
+        default (str): Initial query.
+        multiselect (bool): Allow several selections (fzf --multi).
+
+    Returns:
+        Any: The selected value (None if nothing was picked), or a list of values when
+        multiselect is set.
+    """
+    cmd = [
+        "fzf",
+        "--prompt",
+        f"{message} ",
+        "--delimiter",
+        "\t",
+        "--with-nth",
+        "2..",
+        "--query",
+        default,
+    ]
+    if multiselect:
+        cmd.append("--multi")
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        bufsize=1,  # line buffered: every entry reaches fzf as soon as it is written
+    )
+
+    values: List[Any] = []
+    selection_done = threading.Event()
+
+    def feed():
+        try:
+            for value, label in entries:
+                if selection_done.is_set():
+                    break
+                values.append(value)
+                process.stdin.write(f"{len(values) - 1}\t{_clean_label(label)}\n")
+        except (BrokenPipeError, ValueError):
+            # fzf exited (selection made) while we were still producing
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+
+    # daemon: an unfinished producer must not keep the process alive after the pick
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    output = process.stdout.read()
+    process.wait()
+    selection_done.set()
+
+    if process.returncode in FZF_NO_SELECTION:
+        return [] if multiselect else None
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+
+    selected = [
+        values[int(line.split("\t", 1)[0])] for line in output.splitlines() if "\t" in line
+    ]
+    if multiselect:
+        return selected
+    return selected[0] if selected else None
@@ -0,0 +1,129 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional
+
+
+@dataclass
+class GitDirs:
+    worktree: str
+    git_dir: str
+    common_dir: str
+
+
+def resolve_git_dirs(directory: str) -> Optional[GitDirs]:
+    """
+    Find the git directories for a working directory without running git.
+
+    Parameters:
+        directory (str): Any directory inside a worktree (or a bare repository).
+
+    Returns:
+        Optional[GitDirs]: The worktree root, its private git dir and the shared common dir,
+        or None when the directory is not inside a git repository.
+    """
+    current = os.path.abspath(directory)
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return _with_common_dir(current, dot_git)
+        if os.path.isfile(dot_git):
+            # linked worktrees have a ".git" file pointing at .git/worktrees/<name>
+            with open(dot_git, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content.startswith("gitdir:"):
+                git_dir = content[len("gitdir:"):].strip()
+                if not os.path.isabs(git_dir):
+                    git_dir = os.path.normpath(os.path.join(current, git_dir))
+                return _with_common_dir(current, git_dir)
+        if os.path.isfile(os.path.join(current, "HEAD")) and os.path.isdir(
+            os.path.join(current, "refs")
+        ):
+            # bare repository
+            return _with_common_dir(current, current)
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def _with_common_dir(worktree: str, git_dir: str) -> GitDirs:
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, "r", encoding="utf-8") as f:
+            common_dir = f.read().strip()
+        if not os.path.isabs(common_dir):
+            common_dir = os.path.normpath(os.path.join(git_dir, common_dir))
+    return GitDirs(worktree=worktree, git_dir=git_dir, common_dir=common_dir)
+
+
+def tool_cache_dir(common_dir: str) -> str:
+    """Return (and create) the per-repository cache directory under XDG_CACHE_HOME."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    repo_key = hashlib.sha1(os.path.realpath(common_dir).encode("utf-8")).hexdigest()
+    cache_dir = os.path.join(cache_home, "git_tools", repo_key[:16])
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+@contextmanager
+def file_lock(lock_path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive cross-process lock on lock_path for the duration of the block.
+
+    Parameters:
+        lock_path (str): The lock file to create/lock.
+        blocking (bool): Wait for the lock instead of giving up immediately.
+
+    Yields:
+        bool: True if the lock is held, False if it was busy and blocking is False.
+    """
+    with open(lock_path, "a+") as lock_file:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def stat_key(path: str) -> Optional[List[int]]:
+    """mtime, size and inode of path (None if it is missing); any rewrite changes one of them."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+def write_json_atomic(path: str, payload: Any):
+    """
+    Write payload as JSON to a temp file and rename it over path.
+
+    Concurrent readers see either the old or the new file, never a partial one.
+    Writers still serialize read-modify-write cycles through file_lock.
+
+    Raises:
+        OSError: If the file cannot be written; the temp file is removed.
+    """
+    # unique per thread too: the daemon writes caches from several threads
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_file, path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
@@ -0,0 +1,96 @@
+import atexit
+import os
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+from git_paths import resolve_git_dirs
+from logger.logger import Logger, LogLevel
+
+logger = Logger("git_session", LogLevel.WARNING).logger_jl
+
+
+class _CatFile:
+    """One long-lived `git cat-file --batch-check` process answering one query at a time."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.process: Optional[subprocess.Popen] = None
+
+    def _ensure_started(self) -> subprocess.Popen:
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ["git", "cat-file", "--batch-check"],
+                cwd=self.directory,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self.process
+
+    def query(self, rev: str) -> Optional[List[str]]:
+        """Send one revision; return the "<sha> <type> <size>" fields or None if missing."""
+        if "\n" in rev:
+            return None
+        with self.lock:
+            process = self._ensure_started()
+            process.stdin.write(rev.encode("utf-8") + b"\n")
+            process.stdin.flush()
+            header = process.stdout.readline().decode("utf-8").rstrip("\n").split(" ")
+            # "<rev> missing" / "<rev> ambiguous"
+            if len(header) != 3:
+                return None
+            return header
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+        self.process = None
+
+
+class GitSession:
+    """
+    A persistent cat-file helper for one repository, so per-branch ref lookups do not spawn git.
+
+    Use get_session(directory) to share sessions; they are closed at interpreter exit.
+    Object contents are read without git at all through object_reader.ObjectReader.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._batch_check = _CatFile(directory)
+
+    def resolve(self, rev: str) -> Optional[str]:
+        """Resolve a ref or revision expression (e.g. "refs/heads/main", "main^{tree}") to a sha."""
+        header = self._batch_check.query(rev)
+        return header[0] if header else None
+
+    def close(self):
+        self._batch_check.close()
+
+
+_SESSIONS: Dict[str, GitSession] = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(directory: str) -> GitSession:
+    """Return the pooled GitSession for the worktree containing directory."""
+    git_dirs = resolve_git_dirs(directory)
+    key = os.path.realpath(git_dirs.worktree if git_dirs else directory)
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            logger.debug(f"[git_session] starting cat-file helper for {key}")
+            session = GitSession(key)
+            _SESSIONS[key] = session
+        return session
+
+
+@atexit.register
+def close_sessions():
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            session.close()
+        _SESSIONS.clear()
@@ -1,53 +1,21 @@
 # /// script
 # requires-python = ">=3.13"
 # dependencies = [
-#     "alive-progress",
 #     "click",
 #     "loguru",
 #     "inquirerpy",
 # ]
 # ///
-import concurrent.futures
-import subprocess
 from typing import List
 
 import click
-from alive_progress import alive_bar
-from InquirerPy import inquirer
 
+from branch_delete import (MISSING, NOT_MERGED, delete_refs_transaction,
+                           delete_remote_branches)
 from branch_info_jl import BranchInfoJL, format_branch_info_names, get_branch_info
-
-
-def run_git_command(
-    cmd: List[str], directory: str, swollow_output: bool = False
-) -> str:
-    """Run a git command in the specified directory.
-
-    Args:
-        cmd (List[str]): The command to run as a list of strings.
-        directory (str): The directory where the command should be run.
-        swollow_output (bool, optional): Whether to suppress the command output. Defaults to False.
-
-    Returns:
-        str: The output of the command as a string, or an empty string if swollow_output is True.
-    """
-    try:
-        print(f"Running command: {' '.join(cmd)}")
-        if swollow_output:
-            result = subprocess.run(
-                cmd,
-                cwd=directory,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.PIPE,
-                check=True,
-                text=True,
-            )
-            return ""
-
-        result = subprocess.check_output(cmd, text=True, cwd=directory)
-        return result.strip()
-    except subprocess.CalledProcessError as e:
-        click.echo(f"Command failed with error code {e.returncode}")
+from branch_search import search_select
+from fzf_picker import PICKER_INQUIRER, picker_option
+from prefetch import fetch_age_label
 
 
 @click.command()
@@ -60,13 +28,27 @@ def run_git_command(
 @click.option(
     "--directory", default=".", help="Directory to execute the git command in"
 )
-def get_stale_branches(threshold_days, directory):
+@click.option(
+    "--atomic",
+    is_flag=True,
+    help="Delete remote branches all-or-nothing (git push --atomic).",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Also delete local branches that are not merged (git branch -D).",
+)
+@picker_option
+def get_stale_branches(threshold_days, directory, atomic, force, picker):
     """
     Return branches that were last updated more than the given threshold ago.
 
     Parameters:
     - threshold (int): Time threshold in days.
     - directory (str): Directory to execute the git command in
+    - atomic (bool): Delete remote branches all-or-nothing
+    - force (bool): Also delete local branches that are not merged
+    - picker (str): Selection UI, PICKER_INQUIRER or PICKER_FZF
     """
     print(f"Getting stale branches older than {threshold_days} days")
 
@@ -98,7 +80,7 @@ def get_stale_branches(threshold_days, directory):
         print("No branches found.")
         return
 
-    delete_branches(directory, sorted_branches)
+    delete_branches(directory, sorted_branches, atomic, force, picker)
 
 
 def filter_by_branch_name(branch_name: str) -> bool:
@@ -118,74 +100,95 @@ def filter_by_branch_name(branch_name: str) -> bool:
     )
 
 
-def select_branches(branch_info_list: List[BranchInfoJL]):
+def select_branches(
+    branch_info_list: List[BranchInfoJL], directory: str = ".", picker: str = PICKER_INQUIRER
+):
     """
     A function to select branches based on author information.
 
     Parameters:
     branch_info_list (List[BranchInfoJL]): A list of BranchInfoJL objects containing branch information.
+    directory (str): The repository directory, used for the "last fetched" marker.
+    picker (str): Selection UI, PICKER_INQUIRER or PICKER_FZF.
 
     Returns:
     List[str]: A list of selected branch names.
     """
     authors = sorted(set(branch_info.author for branch_info in branch_info_list))
-    selected_authors = inquirer.fuzzy(
+    selected_authors = search_select(
         message="Select authors:",
-        choices=list(authors),
-        multiselect=True,
+        choices=authors,
+        directory=directory,
         default="joe",
-    ).execute()
+        multiselect=True,
+        picker=picker,
+    )
 
     format_branch_info_names(branch_info_list)
-    branch_choices = [
+    branch_choices = (
         {"name": branch_info.info, "value": branch_info}
         for branch_info in branch_info_list
         if branch_info.author in selected_authors
-    ]
+    )
 
-    selected_branches: List[BranchInfoJL] = inquirer.fuzzy(
-        message="Select branches:", choices=branch_choices, multiselect=True
-    ).execute()
+    selected_branches: List[BranchInfoJL] = search_select(
+        message=f"Select branches ({fetch_age_label(directory)}):",
+        choices=branch_choices,
+        directory=directory,
+        multiselect=True,
+        picker=picker,
+    )
 
     return selected_branches
 
 
-def delete_branches_concurrenlty(directory, branches):
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(delete_branch, branch, directory) for branch in branches
-        ]
-        with alive_bar(len(futures)) as progress_bar:
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    future.result()
-                    progress_bar()
-                except Exception as e:
-                    print(f"An error occurred during branch deletion: {str(e)}")
-
-
-def delete_branch(branch: BranchInfoJL, directory):
-    # Check if the branch is a local branch
-    print(f"Deleting branch: {branch.name}")
-    if branch.is_origin:
-        # Delete the remote branch
-        new_branch_name = branch.original_name.replace("origin/", "")
-        run_git_command(
-            ["git", "push", "origin", "--delete", "--no-verify", new_branch_name],
-            directory,
-            swollow_output=True,
-        )
-    else:
-        # Delete the local branch
-        run_git_command(["git", "branch", "--delete", branch.name], directory)
-        run_git_command(
-            ["git", "branch", "--delete", "--remote", branch.name], directory
-        )
+def delete_branches_batched(
+    directory, branches: List[BranchInfoJL], atomic: bool = False, force: bool = False
+):
+    """
+    Delete the selected branches with one push for the remote ones and one ref transaction for the local ones.
 
+    Like `git branch --delete`, local branches that are not merged (into their upstream,
+    or HEAD) are kept unless force is set.
 
-def delete_branches(directory: str, branch_info_list: List[BranchInfoJL]):
-    branches = select_branches(branch_info_list)
-    delete_branches_concurrenlty(directory, branches)
+    Parameters:
+    directory (str): Directory to execute the git commands in.
+    branches (List[BranchInfoJL]): The selected branches.
+    atomic (bool): Delete the remote branches all-or-nothing.
+    force (bool): Also delete unmerged local branches (`git branch -D`).
+    """
+    remote_branches = [
+        branch.original_name.replace("origin/", "")
+        for branch in branches
+        if branch.is_origin
+    ]
+    local_branches = [branch.name for branch in branches if not branch.is_origin]
+
+    if remote_branches:
+        print(f"Deleting {len(remote_branches)} remote branches in one push")
+        for name, status in delete_remote_branches(
+            directory, remote_branches, atomic=atomic
+        ).items():
+            print(f"  {status:<12} origin/{name}")
+    if local_branches:
+        print(f"Deleting {len(local_branches)} local branches")
+        results = delete_refs_transaction(directory, local_branches, force=force)
+        for refname, status in results.items():
+            if status != MISSING:
+                print(f"  {status:<12} {refname}")
+        if NOT_MERGED in results.values():
+            print("Unmerged branches were kept; use --force to delete them too.")
+
+
+def delete_branches(
+    directory: str,
+    branch_info_list: List[BranchInfoJL],
+    atomic: bool = False,
+    force: bool = False,
+    picker: str = PICKER_INQUIRER,
+):
+    branches = select_branches(branch_info_list, directory, picker)
+    delete_branches_batched(directory, branches, atomic, force)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,10 @@
-from typing import Callable
-
-from InquirerPy.base.control import Choice
+from typing import TYPE_CHECKING, Callable, List
 
 from build_fn import empo_build_function, neatleaf_build
 
+if TYPE_CHECKING:
+    from InquirerPy.base.control import Choice
+
 NEATLEAF_PROFILE = "NEATLEAF"
 EMPO_PROFILE = "EMPO"
 QC_PROFILE = "QC"
@@ -52,6 +53,11 @@ CONSTANTS_MAP = {
         ],
         "DEFAULT_DIR": "dashboard",
         "BUILD_FN": neatleaf_build,
+        # built worktrees on main kept ready for "Add Worktree" (0 disables the pool)
+        "SPARE_WORKTREES": 0,
+        # check out only the selected DIR_OPTIONS package plus these paths (cone mode)
+        "SPARSE_WORKTREES": False,
+        "SPARSE_SHARED_PATHS": ["shared"],
     },
     EMPO_PROFILE: {
         "GIT_DIR": "/Users/joe/Projects/empo_health/remote-health-link",
@@ -59,6 +65,9 @@ CONSTANTS_MAP = {
         "DIR_OPTIONS": ["root"],
         "DEFAULT_DIR": "root",
         "BUILD_FN": empo_build_function,
+        "SPARE_WORKTREES": 0,
+        "SPARSE_WORKTREES": False,
+        "SPARSE_SHARED_PATHS": [],
     },
 }
 
@@ -68,8 +77,30 @@ PROFILE = CONSTANTS_MAP[PROFILE_NAME]
 WORKTREE_DIR = PROFILE["WORKTREE_DIR"]
 GIT_DIR = PROFILE["GIT_DIR"]
 DIR_OPTIONS = PROFILE["DIR_OPTIONS"]
-BUILD_FN: Callable[[str, str], None] = PROFILE["BUILD_FN"]
+# BUILD_FN(directory, git_dir, rebuild=False, open_editor=True); rebuild ignores the
+# build stamps, open_editor=False skips opening the editor (bulk provisioning)
+BUILD_FN: Callable[..., None] = PROFILE["BUILD_FN"]
 PROFILE_DEFAULT_DIR = PROFILE["DEFAULT_DIR"]
+SPARE_WORKTREES: int = PROFILE.get("SPARE_WORKTREES", 0)
+SPARSE_WORKTREES: bool = PROFILE.get("SPARSE_WORKTREES", False)
+SPARSE_SHARED_PATHS: List[str] = PROFILE.get("SPARSE_SHARED_PATHS", [])
+# lock reason of the pooled spare worktrees, which the worktree pickers leave out
+SPARE_LOCK_REASON = "git_tools spare worktree"
 # IS_VERBOSE = False
 IS_VERBOSE = False
-DIR_CHOICES = [Choice(value=dir, name=dir) for dir in DIR_OPTIONS]
+# background `git fetch` is skipped while the last one is younger than this
+PREFETCH_TTL_MINUTES = 10
+
+
+def get_dir_choices() -> List["Choice"]:
+    """DIR_OPTIONS as InquirerPy choices, built on first use to keep imports light."""
+    from InquirerPy.base.control import Choice
+
+    return [Choice(value=dir, name=dir) for dir in DIR_OPTIONS]
+
+
+def __getattr__(name: str):
+    # DIR_CHOICES used to be built at import time; keep it importable, lazily
+    if name == "DIR_CHOICES":
+        return get_dir_choices()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
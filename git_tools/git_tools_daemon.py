@@ -0,0 +1,406 @@
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "click",
+#     "loguru",
+# ]
+# ///
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+from dataclasses import asdict
+from typing import Dict, List, Optional, Set
+
+import click
+
+from branch_cache import REF_NAMESPACES, current_fingerprint
+from branch_info_jl import (branch_row, get_branch_records, native_branch_rows,
+                            upstream_tracks)
+from daemon_client import (NO_DAEMON_ENV, PROTOCOL_VERSION, InsecureSocketPath,
+                           check_private, daemon_socket_path, send_request)
+from git_paths import GitDirs, resolve_git_dirs, stat_key
+from git_tool_constants import CONSTANTS_MAP, PREFETCH_TTL_MINUTES
+from logger.logger import Logger, LogLevel
+from object_reader import ObjectReader, UnsupportedRepository
+from porcelain import iter_refs, iter_worktrees
+from prefetch import start_background_prefetch
+from ref_store import RefStore
+from ref_watcher import (CONFIG_CHANGED, HEAD_CHANGED, OVERFLOW, PACKED_REFS_CHANGED,
+                         REF_CHANGED, WORKTREES_CHANGED, RepoWatcher, UnsupportedPlatform)
+from worktree_status import compute_worktree_statuses
+
+logger = Logger("git_tools_daemon", LogLevel.INFO).logger_jl
+
+REF_PREFIXES = tuple(f"{namespace}/" for namespace in REF_NAMESPACES)
+
+
+def _worktrees_key(git_dirs: GitDirs) -> list:
+    """Stat of everything `git worktree list` reads: the HEADs and per-worktree admin files."""
+    key = [stat_key(os.path.join(git_dirs.common_dir, "HEAD"))]
+    admin_dir = os.path.join(git_dirs.common_dir, "worktrees")
+    key.append(stat_key(admin_dir))
+    try:
+        entries = sorted(os.scandir(admin_dir), key=lambda entry: entry.name)
+    except OSError:
+        entries = []
+    for entry in entries:
+        for name in ("HEAD", "gitdir", "locked"):
+            key.append([entry.name, name, stat_key(os.path.join(entry.path, name))])
+    return key
+
+
+class RepoState:
+    """
+    Warm state of one repository: branch records and the worktree list.
+
+    On Linux a RepoWatcher (inotify) keeps the branch rows and worktree records up to
+    date incrementally: a changed loose ref re-reads just that ref, a moved HEAD just
+    that worktree, and only a rewritten packed-refs (or lost events) re-reads the
+    whole list. Elsewhere each query revalidates with stat calls only (the refs
+    fingerprint from branch_cache and the worktree admin files) and rebuilds just the
+    part that changed.
+    """
+
+    def __init__(self, git_dirs: GitDirs):
+        self.git_dirs = git_dirs
+        self.directory = git_dirs.worktree
+        self.lock = threading.Lock()
+        self._branches: Dict[bool, tuple] = {}
+        self._worktrees: Optional[tuple] = None
+        # maintained by the watcher (None: not loaded yet, or must be re-read)
+        self._rows: Optional[Dict[str, tuple]] = None
+        self._sorted_records: Optional[List[List[str]]] = None
+        self._tracking: Dict[str, Set[str]] = {}
+        self._worktree_records: Optional[List[Dict[str, str]]] = None
+        self.watcher = self._start_watcher()
+
+    def _start_watcher(self) -> Optional[RepoWatcher]:
+        try:
+            self.ref_store = RefStore(self.directory)
+            self.reader = ObjectReader(self.directory)
+            watcher = RepoWatcher(self.git_dirs)
+        except (UnsupportedPlatform, UnsupportedRepository, OSError, ValueError) as e:
+            logger.info(f"[daemon] no file watcher for {self.directory} ({e}), using stat checks")
+            return None
+        threading.Thread(target=self._watch_forever, args=(watcher,), daemon=True).start()
+        return watcher
+
+    # -- watcher-maintained state -------------------------------------------------
+
+    def _load_rows(self):
+        """Re-read every ref (first query, packed-refs rewrite, config change, lost events)."""
+        rows = native_branch_rows(self.directory, ref_store=self.ref_store, reader=self.reader)
+        self._rows = {row[1]: row for row in rows}
+        self._sorted_records = [row[2] for row in rows]
+        self._tracking = {}
+        for refname, upstream in iter_refs(self.directory, ["refname", "upstream"], ["refs/heads"]):
+            if upstream:
+                self._tracking.setdefault(upstream, set()).add(refname)
+
+    def _update_refs(self, refnames: List[str]):
+        """Apply changed loose refs to the loaded rows; only their own commits are read."""
+        local_refs = {refname for refname in refnames if refname.startswith("refs/heads/")}
+        for refname in refnames:
+            # a moved remote branch changes the ahead/behind of the branches tracking it
+            local_refs |= self._tracking.get(refname, set())
+        tracks = upstream_tracks(self.directory, sorted(local_refs))
+        for refname in set(refnames) | local_refs:
+            if not refname.startswith(REF_PREFIXES):
+                continue
+            sha = self.ref_store.read_ref(refname)
+            if sha is None:
+                self._rows.pop(refname, None)
+                continue
+            row = branch_row(self.reader, refname, sha, tracks.get(refname, ""))
+            if row is None:
+                self._rows.pop(refname, None)
+            else:
+                self._rows[refname] = row
+        self._sorted_records = None
+
+    def _update_worktree_head(self, path: str):
+        record = next(
+            (record for record in self._worktree_records if record.get("worktree") == path),
+            None,
+        )
+        if record is None:
+            self._worktree_records = None
+            return
+        worktree_refs = RefStore(path)
+        record["HEAD"] = worktree_refs.read_ref("HEAD") or record.get("HEAD", "")
+        branch = worktree_refs.head_branch()
+        record.pop("branch", None)
+        record.pop("detached", None)
+        if branch is None:
+            record["detached"] = ""
+        else:
+            record["branch"] = f"refs/heads/{branch}"
+
+    def _apply(self, changes: List[tuple]):
+        kinds = {kind for kind, _ in changes}
+        self._branches.pop(True, None)  # --merged=main depends on every tip
+        if kinds & {PACKED_REFS_CHANGED, CONFIG_CHANGED, OVERFLOW}:
+            self._rows = None
+            self._sorted_records = None
+        refnames = [detail for kind, detail in changes if kind == REF_CHANGED]
+        if refnames and self._rows is not None:
+            self._update_refs(refnames)
+        if self._worktree_records is None:
+            return
+        if kinds & {WORKTREES_CHANGED, OVERFLOW}:
+            self._worktree_records = None
+            return
+        for kind, detail in changes:
+            if kind == HEAD_CHANGED:
+                self._update_worktree_head(detail)
+            elif kind == REF_CHANGED:
+                # worktrees with this branch checked out report its new tip
+                for record in self._worktree_records:
+                    if record.get("branch") == detail:
+                        record["HEAD"] = self.ref_store.read_ref(detail) or record["HEAD"]
+            if self._worktree_records is None:
+                return
+
+    def _watch_forever(self, watcher: RepoWatcher):
+        while True:
+            changes = watcher.read()
+            if not changes:
+                continue
+            logger.debug(f"[daemon] {self.directory}: {changes}")
+            with self.lock:
+                try:
+                    self._apply(changes)
+                except (LookupError, ValueError, OSError, subprocess.CalledProcessError) as e:
+                    logger.warning(f"[daemon] incremental update failed ({e}), re-reading")
+                    self._rows = None
+                    self._sorted_records = None
+                    self._worktree_records = None
+
+    # -- queries --------------------------------------------------------------------
+
+    def branches(self, merged_to_main: bool = False) -> List[List[str]]:
+        start_background_prefetch(self.directory)
+        if self.watcher is not None and not merged_to_main:
+            with self.lock:
+                if self._rows is None:
+                    self._load_rows()
+                if self._sorted_records is None:
+                    rows = sorted(self._rows.values(), key=lambda row: (row[0], row[1]))
+                    self._sorted_records = [row[2] for row in rows]
+                return self._sorted_records
+
+        fingerprint = current_fingerprint(self.directory)
+        with self.lock:
+            cached = self._branches.get(merged_to_main)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+            records = get_branch_records(self.directory, merged_to_main)
+            self._branches[merged_to_main] = (fingerprint, records)
+            return records
+
+    def worktrees(self) -> List[Dict[str, str]]:
+        if self.watcher is not None:
+            with self.lock:
+                if self._worktree_records is None:
+                    self._worktree_records = list(iter_worktrees(self.directory))
+                # the watcher edits these records in place once the lock is released
+                return [dict(record) for record in self._worktree_records]
+
+        key = _worktrees_key(self.git_dirs)
+        with self.lock:
+            if self._worktrees is not None and self._worktrees[0] == key:
+                return self._worktrees[1]
+            records = list(iter_worktrees(self.directory))
+            self._worktrees = (key, records)
+            return records
+
+    def status(self, use_cache: bool = True) -> List[dict]:
+        # not kept in memory: edits to tracked files never reach the watcher, so the
+        # dirty counts are read on every request (ahead/behind are cached on disk)
+        return [asdict(status) for status in compute_worktree_statuses(self.directory, use_cache)]
+
+
+class GitToolsDaemon:
+    """Dispatches JSON requests to the RepoState of the repository they name."""
+
+    def __init__(self):
+        self.repos: Dict[str, RepoState] = {}
+        self.lock = threading.Lock()
+
+    def repo_for(self, directory: str) -> RepoState:
+        git_dirs = resolve_git_dirs(directory)
+        if git_dirs is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        key = os.path.realpath(git_dirs.common_dir)
+        with self.lock:
+            repo = self.repos.get(key)
+            if repo is None:
+                logger.info(f"[daemon] tracking {git_dirs.worktree}")
+                repo = RepoState(git_dirs)
+                self.repos[key] = repo
+            return repo
+
+    def warm(self, directories: List[str]):
+        """Build the snapshots of the configured repositories before the first query."""
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            try:
+                repo = self.repo_for(directory)
+                repo.branches()
+                repo.worktrees()
+            except (ValueError, OSError, subprocess.CalledProcessError) as e:
+                logger.warning(f"[daemon] could not warm {directory}: {e}")
+
+    def refresh_forever(self, stop: threading.Event):
+        """Keep remote refs fresh for every tracked repository while idle."""
+        while not stop.wait(PREFETCH_TTL_MINUTES * 60):
+            with self.lock:
+                repos = list(self.repos.values())
+            for repo in repos:
+                start_background_prefetch(repo.directory)
+
+    def handle(self, request: dict):
+        op = request.get("op")
+        if op == "ping":
+            return {"pid": os.getpid(), "repos": sorted(self.repos)}
+        repo = self.repo_for(request["directory"])
+        if op == "branches":
+            return repo.branches(bool(request.get("merged_to_main")))
+        if op == "worktrees":
+            return repo.worktrees()
+        if op == "status":
+            return repo.status(bool(request.get("use_cache", True)))
+        raise ValueError(f"unknown op {op!r}")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        shutdown = False
+        try:
+            request = json.loads(line)
+            if request.get("version") != PROTOCOL_VERSION:
+                raise ValueError(f"protocol version {request.get('version')} is not supported")
+            if request.get("op") == "shutdown":
+                reply = {"ok": True, "result": None}
+                shutdown = True
+            else:
+                reply = {"ok": True, "result": self.server.daemon_state.handle(request)}
+        except Exception as e:
+            logger.warning(f"[daemon] request failed: {e}")
+            reply = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+        self.wfile.flush()
+        if shutdown:
+            # answer first: serve_forever() returns and the process exits right after
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon_state: GitToolsDaemon):
+        self.daemon_state = daemon_state
+        super().__init__(socket_path, _RequestHandler)
+
+
+def _is_running(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(0.5)
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def serve():
+    """Serve until a shutdown request; the configured GIT_DIRs are warmed first."""
+    # queries made while serving must never be routed back to this daemon
+    os.environ[NO_DAEMON_ENV] = "1"
+    try:
+        socket_path = daemon_socket_path()
+        if os.path.lexists(socket_path):
+            # never talk to (or unlink) a socket another user planted
+            check_private(socket_path, socket_file=True)
+    except InsecureSocketPath as e:
+        click.echo(f"refusing to serve: {e}", err=True)
+        sys.exit(1)
+    if _is_running(socket_path):
+        click.echo(f"git_tools daemon is already running on {socket_path}")
+        return
+    if os.path.lexists(socket_path):
+        os.unlink(socket_path)
+
+    daemon_state = GitToolsDaemon()
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(socket_path, daemon_state)
+    finally:
+        os.umask(old_umask)
+    check_private(socket_path, socket_file=True)
+
+    daemon_state.warm([profile["GIT_DIR"] for profile in CONSTANTS_MAP.values()])
+    stop = threading.Event()
+    threading.Thread(target=daemon_state.refresh_forever, args=(stop,), daemon=True).start()
+    logger.info(f"[daemon] listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        logger.info("[daemon] stopped")
+
+
+@click.command()
+@click.option("--detach", is_flag=True, help="Run the daemon in the background")
+@click.option("--stop", is_flag=True, help="Stop the running daemon")
+@click.option("--status", is_flag=True, help="Show whether the daemon runs and what it tracks")
+def main(detach, stop, status):
+    """
+    Per-user daemon that keeps warm repository snapshots for the git_tools commands.
+
+    The commands ask it for branches, worktrees and worktree status over a Unix socket
+    and work directly (as before) whenever it is not running.
+    """
+    if stop or status:
+        try:
+            result = send_request({"op": "shutdown" if stop else "ping"}, timeout=5)
+        except InsecureSocketPath as e:
+            click.echo(f"not contacting the daemon: {e}", err=True)
+            return
+        except OSError:
+            click.echo("git_tools daemon is not running")
+            return
+        if stop:
+            click.echo("git_tools daemon stopped")
+        else:
+            click.echo(f"git_tools daemon pid {result['pid']}, tracking:")
+            for repo in result["repos"]:
+                click.echo(f"  - {repo}")
+        return
+
+    if detach:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        click.echo("git_tools daemon started")
+        return
+    serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,30 @@
 # ]
 # ///
 import os
+import subprocess
+from typing import Optional
 
 import click
 from branch_info_jl import format_branch_info_names, get_branch_info
-from git_tool_constants import BUILD_FN, DIR_CHOICES, GIT_DIR, ROOT_DIR, WORKTREE_DIR
-from InquirerPy import inquirer
-from InquirerPy.resolver import prompt
-from InquirerPy.base.control import Choice
+from branch_search import search_select
+from fzf_picker import PICKER_INQUIRER, picker_option
+from git_tool_constants import (BUILD_FN, GIT_DIR, PROFILE_DEFAULT_DIR, ROOT_DIR,
+                                SPARE_WORKTREES, SPARSE_WORKTREES, WORKTREE_DIR,
+                                get_dir_choices)
 from logger.logger import Logger, LogLevel
+from prefetch import fetch_age_label, start_background_prefetch
+from provision import DEFAULT_BUILD_JOBS
+from spare_worktrees import claim_spare, start_background_refill
+from sparse_worktree import sparse_paths_for, widen_sparse_worktree
 from utils import prompt_fzf_directory, run_command
+from worktree_add import CHECKOUT_WORKERS, add_worktree
 
 logger = Logger("git_worktree_and_branches", LogLevel.DEBUG).logger_jl
 
 
-def create_new_branch(branch_name, directory):
+def create_new_branch(
+    branch_name, directory, rebuild=False, sparse=SPARSE_WORKTREES, parallel_checkout=True
+):
     logger.info(f"create new branch {branch_name}")
     run_command(f"cd {GIT_DIR}")
     run_command(
@@ -32,36 +42,81 @@ def create_new_branch(branch_name, directory):
     run_command("git push origin --no-verify")
     run_command("git switch -")
     run_command("git stash pop")
-    common_worktree_add(branch_name, directory)
+    common_worktree_add(branch_name, directory, rebuild, sparse, parallel_checkout)
 
 
-def common_checkout_branch(branch_name, directory, here_directory):
+def common_checkout_branch(branch_name, directory, here_directory, rebuild=False):
     logger.info(f"git stash {here_directory}")
     run_command(f"cd {here_directory}; git stash push")
     logger.info(f"switch {branch_name}")
     run_command(f"git switch {branch_name}")
     logger.info("git stash pop")
     run_command("git stash pop")
-    BUILD_FN(directory, GIT_DIR)
+    BUILD_FN(directory, GIT_DIR, rebuild=rebuild)
 
 
-def common_worktree_add(branch_name, directory):
+def common_worktree_add(
+    branch_name, directory, rebuild=False, sparse=SPARSE_WORKTREES, parallel_checkout=True
+):
     new_branch_name = branch_name.replace("*", "")
     new_worktree_dir = f"{WORKTREE_DIR}/{new_branch_name}"
     logger.info(f"[common_worktree_add] git worktree add {new_worktree_dir}")
     if os.path.exists(new_worktree_dir):
         logger.info("[common_worktree_add] worktree already exists")
-        BUILD_FN(new_worktree_dir, GIT_DIR)
+        # a sparse worktree is widened to a newly selected directory
+        widen_sparse_worktree(new_worktree_dir, [directory])
+        # unchanged installs are skipped through the build stamps unless rebuild is set
+        BUILD_FN(new_worktree_dir, GIT_DIR, rebuild=rebuild)
         return
-    try:
-        run_command(f"git worktree add {new_worktree_dir} {new_branch_name}")
-    except Exception as e:
-        logger.error(f"[worktree add] Exception while running git worktree add {e}")
+    # only the selected package and the shared paths, if sparse worktrees are enabled
+    sparse_paths = sparse_paths_for(directory) if sparse else None
+    if sparse_paths is None and SPARE_WORKTREES and claim_spare(
+        GIT_DIR, WORKTREE_DIR, SPARE_WORKTREES, new_branch_name, new_worktree_dir, PROFILE_DEFAULT_DIR
+    ):
+        logger.info("[common_worktree_add] claimed a spare worktree")
+    else:
+        # add_worktree logs the time of each phase; --serial-checkout runs a plain
+        # `git worktree add` to compare against
+        try:
+            add_worktree(
+                GIT_DIR, new_worktree_dir, new_branch_name, sparse_paths, parallel=parallel_checkout
+            )
+        except subprocess.CalledProcessError as e:
+            logger.error(f"[worktree add] Exception while running git worktree add {e.output}")
+    # replace the claimed spare (and move the others to the latest main) in the background
+    start_background_refill(GIT_DIR, WORKTREE_DIR, SPARE_WORKTREES, PROFILE_DEFAULT_DIR)
 
     if "root" in directory:
-        BUILD_FN(directory, GIT_DIR)
+        BUILD_FN(directory, GIT_DIR, rebuild=rebuild)
     else:
-        BUILD_FN(new_worktree_dir, GIT_DIR)
+        BUILD_FN(new_worktree_dir, GIT_DIR, rebuild=rebuild)
+
+
+def provision_worktrees_for(
+    branch_names, jobs: int = DEFAULT_BUILD_JOBS, picker: str = PICKER_INQUIRER, rebuild: bool = False
+):
+    """Add a worktree per branch (names or patterns such as "feature/*") and build them."""
+    from provision import format_summary, provision_worktrees, resolve_branch_names
+
+    if not branch_names:
+        branch_names = search_select(
+            message=f"Select branches to provision ({fetch_age_label(GIT_DIR)})",
+            choices=get_branches_as_choice_list(),
+            directory=GIT_DIR,
+            multiselect=True,
+            picker=picker,
+        )
+        # the pickers mark remote-only branches with "*" in place of "origin/"
+        branch_names = [name.replace("*", "origin/", 1) for name in branch_names]
+    branches = resolve_branch_names(GIT_DIR, list(branch_names))
+    if not branches:
+        logger.warning("[provision] no branches to provision")
+        return
+    logger.info(f"[provision] {len(branches)} worktrees, {jobs} builds at a time")
+    results = provision_worktrees(
+        GIT_DIR, branches, WORKTREE_DIR, BUILD_FN, GIT_DIR, jobs, rebuild=rebuild
+    )
+    print(format_summary(results))
 
 
 def update_version(version_string, update_type):
@@ -82,10 +137,15 @@ def update_version(version_string, update_type):
     return new_version.split("/")[1]
 
 
-def release_process():
+def release_process(picker: str = PICKER_INQUIRER):
     # choose a prod branch for which to create a release
-    tag_name = prompt_fzf_git_branches("release/")
+    tag_name = prompt_fzf_git_branches("release/", picker=picker)
+    if tag_name is None:
+        print("No release branch selected.")
+        return
     logger.info(f"release branch: {tag_name}")
+    from InquirerPy import inquirer
+
     # prompt user for version type major, minor, patchj
     version_type = inquirer.fuzzy(
         message="What version type do you want to release?",
@@ -124,6 +184,8 @@ def release_process():
 
 
 def get_branches_as_choice_list():
+    from InquirerPy.base.control import Choice
+
     # Run the git branch command
     branches = get_branch_info(GIT_DIR)
     logger.debug(f"GIT_DIR: {GIT_DIR}")
@@ -138,7 +200,9 @@ def get_branches_as_choice_list():
     return choices
 
 
-def prompt_fzf_git_branches(branch_name: str = "", auto_select: bool = False) -> str:
+def prompt_fzf_git_branches(
+    branch_name: str = "", auto_select: bool = False, picker: str = PICKER_INQUIRER
+) -> Optional[str]:
     choices = get_branches_as_choice_list()
 
     matches = []
@@ -152,9 +216,14 @@ def prompt_fzf_git_branches(branch_name: str = "", auto_select: bool = False) ->
         return matches[0]
 
     # Use inquirer to let the user select a branch
-    selected_branch: str = inquirer.fuzzy(
-        message="Select a branch", default=branch_name, choices=choices
-    ).execute()
+    # None when the picker is cancelled or nothing matches
+    selected_branch: Optional[str] = search_select(
+        message=f"Select a branch ({fetch_age_label(GIT_DIR)})",
+        choices=choices,
+        directory=GIT_DIR,
+        default=branch_name,
+        picker=picker,
+    )
 
     return selected_branch
 
@@ -162,8 +231,9 @@ def prompt_fzf_git_branches(branch_name: str = "", auto_select: bool = False) ->
 ADD_WORKTREE = "Add Worktree"
 CHECKOUT_BRANCH = "Checkout Branch"
 RELEASE_PROCESS = "Release Process"
+PROVISION = "Provision Worktrees"
 INTERACTIVE = "Interactive"
-ACTIONS = [ADD_WORKTREE, CHECKOUT_BRANCH, RELEASE_PROCESS, INTERACTIVE]
+ACTIONS = [ADD_WORKTREE, CHECKOUT_BRANCH, RELEASE_PROCESS, PROVISION, INTERACTIVE]
 
 
 @click.command()
@@ -182,8 +252,50 @@ ACTIONS = [ADD_WORKTREE, CHECKOUT_BRANCH, RELEASE_PROCESS, INTERACTIVE]
 @click.option(
     "--here_directory", default="", help="Directory to execute the git command in"
 )
-def main(action, directory, here_directory, branch_name):
+@click.option(
+    "--branches",
+    multiple=True,
+    help="Branch name or pattern (e.g. 'feature/*') to provision; repeatable",
+)
+@click.option(
+    "--jobs",
+    default=DEFAULT_BUILD_JOBS,
+    type=int,
+    help=f"Builds to run at once when provisioning (default: {DEFAULT_BUILD_JOBS})",
+)
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="Run every build step, even when its build stamp says it is up to date",
+)
+@click.option(
+    "--sparse/--no-sparse",
+    default=SPARSE_WORKTREES,
+    help="Add worktrees with only the selected directory and SPARSE_SHARED_PATHS checked out"
+    f" (profile default: {'on' if SPARSE_WORKTREES else 'off'})",
+)
+@click.option(
+    "--parallel-checkout/--serial-checkout",
+    default=True,
+    help="Add worktrees without a checkout, then write their files with parallel checkout"
+    f" workers (checkout.workers={CHECKOUT_WORKERS}, default), or with a plain git worktree add",
+)
+@picker_option
+def main(
+    action,
+    directory,
+    here_directory,
+    branch_name,
+    branches,
+    jobs,
+    rebuild,
+    sparse,
+    parallel_checkout,
+    picker,
+):
     if action == INTERACTIVE:
+        from InquirerPy.resolver import prompt
+
         answers = prompt(
             [
                 {
@@ -198,29 +310,45 @@ def main(action, directory, here_directory, branch_name):
     else:
         answers = {"action": action}
     if CHECKOUT_BRANCH == answers["action"]:
-        branch_name = prompt_fzf_git_branches(branch_name=branch_name, auto_select=True)
+        branch_name = prompt_fzf_git_branches(
+            branch_name=branch_name, auto_select=True, picker=picker
+        )
+        if branch_name is None:
+            print("No branch selected.")
+            return
         if directory == "":
-            directory = prompt_fzf_directory(dir_choices=DIR_CHOICES, root_dir=ROOT_DIR)
-        common_checkout_branch(branch_name, directory, here_directory)
+            directory = prompt_fzf_directory(
+                dir_choices=get_dir_choices(), root_dir=ROOT_DIR
+            )
+        common_checkout_branch(branch_name, directory, here_directory, rebuild)
     elif ADD_WORKTREE == answers["action"]:
         original_branch_name = branch_name
-        branch_name = prompt_fzf_git_branches(branch_name=branch_name, auto_select=True)
+        branch_name = prompt_fzf_git_branches(
+            branch_name=branch_name, auto_select=True, picker=picker
+        )
         if directory == "":
-            directory = prompt_fzf_directory(dir_choices=DIR_CHOICES, root_dir=ROOT_DIR)
+            directory = prompt_fzf_directory(
+                dir_choices=get_dir_choices(), root_dir=ROOT_DIR
+            )
         logger.info(
             f"[worktree add] branch_name: {branch_name}, directory: {directory}"
         )
-        if branch_name is None and directory == "":
+        if branch_name is None and directory == "" and original_branch_name:
             # create a new branch
-            create_new_branch(original_branch_name, directory)
+            create_new_branch(original_branch_name, directory, rebuild, sparse, parallel_checkout)
+            return
+        if branch_name is None:
+            print("No branch selected.")
             return
-        common_worktree_add(branch_name, directory)
+        common_worktree_add(branch_name, directory, rebuild, sparse, parallel_checkout)
     elif RELEASE_PROCESS == answers["action"]:
-        release_process()
+        release_process(picker)
+    elif PROVISION == answers["action"]:
+        provision_worktrees_for(branches, jobs, picker, rebuild)
 
 
 if __name__ == "__main__":
-    logger.info(f"[worktree add] fetch {GIT_DIR}")
+    logger.info(f"[worktree add] prefetch {GIT_DIR} ({fetch_age_label(GIT_DIR)})")
     os.chdir(GIT_DIR)
-    run_command("git fetch --prune")
+    start_background_prefetch(GIT_DIR)
     main()
@@ -8,17 +8,22 @@
 # ///
 import json
 import os
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import click
-from InquirerPy import inquirer
-from InquirerPy.base.control import Choice
 
-from git_tool_constants import (BUILD_FN, DIR_CHOICES, GIT_DIR,
-                                PROFILE_DEFAULT_DIR, ROOT_DIR)
+from branch_search import search_select
+from fzf_picker import PICKER_FZF, picker_option
+from git_tool_constants import (BUILD_FN, GIT_DIR, PROFILE_DEFAULT_DIR,
+                                ROOT_DIR, get_dir_choices)
 from logger.logger import Logger
+from prefetch import fetch_age_label
+from sparse_worktree import widen_sparse_worktree
 from utils import prompt_fzf_directory
-from worktree_jl import create_choices_for_worktrees
+from worktree_jl import create_choices_for_worktrees, iter_choices_for_worktrees
+
+if TYPE_CHECKING:
+    from InquirerPy.base.control import Choice
 
 logger = Logger("git_worktree_list").logger_jl
 
@@ -30,26 +35,72 @@ logger = Logger("git_worktree_list").logger_jl
     help="Directory to execute the git command in",
     type=click.Path(exists=True),
 )
-def main(directory):
-    print(f"[worktree list] directory: {directory}")
+@click.option(
+    "--status",
+    is_flag=True,
+    help="Show dirty files, ahead/behind, age and lock state of every worktree and exit",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="With --status, ignore cached results and run git status in every worktree",
+)
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="Run every build step, even when its build stamp says it is up to date",
+)
+@click.option(
+    "--widen",
+    multiple=True,
+    help="Path to add to the selected worktree's sparse checkout; repeatable",
+)
+@picker_option
+def main(directory, status, refresh, rebuild, widen, picker):
     """Main function to list git worktrees and allow selection."""
-    worktrees_choices = create_choices_for_worktrees(directory)
+    print(f"[worktree list] directory: {directory}")
+    if status:
+        from worktree_status import format_status_table, get_worktree_statuses
 
-    if not worktrees_choices or len(worktrees_choices) == 0:
-        print("No git worktrees found.")
+        print(format_status_table(get_worktree_statuses(directory, use_cache=not refresh)))
         return
-    worktree_to_directory = get_worktree_to_directory(worktrees_choices)
-
-    # InquirerPy uses a different syntax for prompts
-    selected_worktree = inquirer.fuzzy(
-        message="Which git worktree do you want to switch to?",
-        choices=worktrees_choices,
-    ).execute()
+    message = f"Which git worktree do you want to switch to? ({fetch_age_label(directory)})"
+
+    if picker == PICKER_FZF:
+        # open fzf while git is still listing worktrees; the mapping file can wait
+        selected_worktree = search_select(
+            message=message,
+            choices=iter_choices_for_worktrees(directory),
+            directory=directory,
+            picker=picker,
+        )
+        if selected_worktree is None:
+            print("No git worktree selected.")
+            return
+        worktrees_choices = create_choices_for_worktrees(directory)
+        worktree_to_directory = get_worktree_to_directory(worktrees_choices)
+    else:
+        worktrees_choices = create_choices_for_worktrees(directory)
+
+        if not worktrees_choices or len(worktrees_choices) == 0:
+            print("No git worktrees found.")
+            return
+        worktree_to_directory = get_worktree_to_directory(worktrees_choices)
+
+        # InquirerPy uses a different syntax for prompts
+        selected_worktree = search_select(
+            message=message,
+            choices=worktrees_choices,
+            directory=directory,
+        )
+        if selected_worktree is None:
+            print("No git worktree selected.")
+            return
     print(f"Selected worktree: {selected_worktree}")
 
     directory = prompt_fzf_directory(
         default_choice=worktree_to_directory[selected_worktree],
-        dir_choices=DIR_CHOICES,
+        dir_choices=get_dir_choices(),
         root_dir=ROOT_DIR,
     )
 
@@ -59,14 +110,18 @@ def main(directory):
         # write the dictionary as json to the file
         f.write(json.dumps(worktree_to_directory))
 
+    # a sparse worktree gets the selected directory (and --widen paths) checked out
+    widen_sparse_worktree(selected_worktree, [directory, *widen])
+
     # Run the build function for profile
-    BUILD_FN(f"{selected_worktree}/{directory}", GIT_DIR)
+    # installs whose lockfile and tool versions are unchanged are skipped (build stamps)
+    BUILD_FN(f"{selected_worktree}/{directory}", GIT_DIR, rebuild=rebuild)
 
 
 WORKTREE_TO_DIRECTORY_URI = "worktree_to_directory.json"
 
 
-def initialize_worktree_to_directory(worktrees_choices: List[Choice]):
+def initialize_worktree_to_directory(worktrees_choices: List["Choice"]):
     initial_worktree_to_directory = {}
     # Iterate over each of the choices and map the value to a default directory
     for choice in worktrees_choices:
@@ -77,7 +132,7 @@ def initialize_worktree_to_directory(worktrees_choices: List[Choice]):
     return initial_worktree_to_directory
 
 
-def update_worktree_to_directory(worktrees_choices: List[Choice]):
+def update_worktree_to_directory(worktrees_choices: List["Choice"]):
     with open(WORKTREE_TO_DIRECTORY_URI, "r", encoding="utf-8") as f:
         worktree_to_directory = json.load(f)
     # if worktree_choices is not in worktree_to_directory then add it and set it to default directory and update file
@@ -100,7 +155,7 @@ def update_worktree_to_directory(worktrees_choices: List[Choice]):
     return worktree_to_directory
 
 
-def get_worktree_to_directory(worktrees_choices: List[Choice]):
+def get_worktree_to_directory(worktrees_choices: List["Choice"]):
     # Create a json file if it does not exist for saving the preference of a directory to a worktree
     if not os.path.exists(WORKTREE_TO_DIRECTORY_URI):
         print(f"[worktree list] create {WORKTREE_TO_DIRECTORY_URI}")
@@ -10,8 +10,6 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import click
-from alive_progress import alive_bar
-from InquirerPy import inquirer
 
 from git_worktree_list import create_choices_for_worktrees
 from utils import run_command
@@ -37,6 +35,10 @@ def main(directory):
     Returns:
         None
     """
+    # prompt and progress libraries are slow to import; load them once we need them
+    from alive_progress import alive_bar
+    from InquirerPy import inquirer
+
     workingtree_choices = create_choices_for_worktrees(directory)
     selected_trees = inquirer.checkbox(
         message="Which working trees do you want to remove?",
@@ -0,0 +1,102 @@
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "click",
+# ]
+# ///
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+import click
+
+# the command-line entry points whose cold start we care about
+ENTRY_POINTS = [
+    "branch_cleanup",
+    "git_stale_branches",
+    "git_worktree_and_branches",
+    "git_worktree_list",
+    "git_worktree_prune",
+    "prefetch",
+]
+# libraries that must only be imported on the code paths that use them
+DEFERRED_MODULES = ["InquirerPy", "prompt_toolkit", "alive_progress", "loguru", "tabulate"]
+IMPORT_BUDGET_MS = 100
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _import_time_ms(module: str) -> float:
+    """Cumulative import time of module in a fresh interpreter, from `-X importtime`."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=TOOLS_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: <self us> | <cumulative us> | <module>", nesting shown as indentation
+    for line in process.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            return int(parts[1]) / 1000
+    raise ValueError(f"no import time reported for {module}")
+
+
+def _deferred_modules_loaded(module: str) -> List[str]:
+    check = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", check], cwd=TOOLS_DIR, text=True
+    )
+    return output.split()
+
+
+def measure(module: str, repeat: int) -> Tuple[float, List[str]]:
+    """Best of `repeat` cold imports (ms), and the deferred libraries it pulled in."""
+    best: Optional[float] = None
+    for _ in range(repeat):
+        elapsed = _import_time_ms(module)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, _deferred_modules_loaded(module)
+
+
+@click.command()
+@click.option(
+    "--budget_ms",
+    default=IMPORT_BUDGET_MS,
+    type=float,
+    help=f"Maximum import time per entry point in ms (default: {IMPORT_BUDGET_MS}).",
+)
+@click.option("--repeat", default=5, type=int, help="Cold imports per entry point; the best counts.")
+def main(budget_ms, repeat):
+    """
+    Check that every entry point imports within the budget and without the heavy UI libraries.
+
+    Exits with status 1 when an entry point is over budget or imports one of
+    DEFERRED_MODULES at startup, so it can gate a pre-commit hook or CI job.
+    """
+    failures = []
+    for module in ENTRY_POINTS:
+        elapsed, loaded = measure(module, repeat)
+        over_budget = elapsed > budget_ms
+        status = "FAIL" if over_budget or loaded else "ok"
+        detail = f" (imports {', '.join(loaded)})" if loaded else ""
+        click.echo(f"{status:<5}{module:<28}{elapsed:7.1f} ms{detail}")
+        if status == "FAIL":
+            failures.append(module)
+
+    if failures:
+        click.echo(
+            f"{len(failures)} entry points over the {budget_ms:g} ms import budget"
+            " or importing deferred libraries"
+        )
+        sys.exit(1)
+    click.echo(f"All entry points import within {budget_ms:g} ms")
+
+
+if __name__ == "__main__":
+    main()
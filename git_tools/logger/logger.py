@@ -1,8 +1,6 @@
 import sys
 from enum import Enum
-from typing import Optional, Union
-
-from loguru import logger
+from typing import Dict, Optional, Union
 
 
 class LogLevel(Enum):
@@ -15,6 +13,64 @@ class LogLevel(Enum):
     CRITICAL = "CRITICAL"
 
 
+# loguru's built-in level numbers; "exception" logs at ERROR
+_LEVEL_NUMBERS = {
+    "TRACE": 5,
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "EXCEPTION": 40,
+    "CRITICAL": 50,
+}
+
+# logger name -> minimum level number, consulted by the one shared stdout sink
+_LEVELS: Dict[str, int] = {}
+_sink_id: Optional[int] = None
+
+
+def _filter_by_logger_level(record) -> bool:
+    minimum = _LEVELS.get(record["extra"].get("logger_name"), 0)
+    return record["level"].no >= minimum
+
+
+def _loguru_logger():
+    """Import loguru and replace its default handler with our stdout sink, once per process."""
+    global _sink_id
+    from loguru import logger
+
+    if _sink_id is None:
+        logger.remove()
+        _sink_id = logger.add(sys.stdout, level=0, filter=_filter_by_logger_level)
+    return logger
+
+
+def _discard(*args, **kwargs) -> None:
+    pass
+
+
+class _LazyLogger:
+    """
+    Stands in for a bound loguru logger until a message passes the logger's level.
+
+    loguru is slow to import, so messages below the level are dropped without it and
+    it is only imported (and the sink set up) for the first message that is emitted.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._bound = None
+
+    def __getattr__(self, attr: str):
+        level_no = _LEVEL_NUMBERS.get(attr.upper())
+        if level_no is not None and level_no < _LEVELS.get(self._name, 0):
+            return _discard
+        if self._bound is None:
+            self._bound = _loguru_logger().bind(logger_name=self._name)
+        return getattr(self._bound, attr)
+
+
 class Logger:
     def __init__(self, name: str, level: Union[LogLevel, str] = LogLevel.INFO) -> None:
         """Initialize a logger with a name and level.
@@ -26,9 +82,8 @@ class Logger:
         self.name = name
         self.level = level.value if isinstance(
             level, LogLevel) else level.upper()
-        logger.remove()
-        logger.add(sys.stdout, level=self.level)
-        self.logger_jl = logger
+        _LEVELS[name] = _LEVEL_NUMBERS[self.level]
+        self.logger_jl = _LazyLogger(name)
 
     def create_child(
         self, child_name: str, level: Optional[Union[LogLevel, str]] = None
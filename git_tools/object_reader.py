@@ -0,0 +1,309 @@
+import glob
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from git_paths import resolve_git_dirs
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+TYPE_NAMES = {OBJ_COMMIT: "commit", OBJ_TREE: "tree", OBJ_BLOB: "blob", OBJ_TAG: "tag"}
+
+IDX_MAGIC = b"\377tOc"
+MAX_TAG_DEPTH = 10
+
+
+@dataclass
+class CommitInfo:
+    sha: str
+    tree: str
+    parents: List[str]
+    author: str
+    author_time: int
+    committer: str
+    committer_time: int
+    committer_tz: str
+
+
+def parse_commit(sha: str, data: bytes) -> CommitInfo:
+    """Parse the header of a raw commit object (everything before the first blank line)."""
+    header = data.split(b"\n\n", 1)[0].decode("utf-8", errors="replace")
+    tree = ""
+    parents = []
+    author = committer = ""
+    author_time = committer_time = 0
+    committer_tz = "+0000"
+    for line in header.split("\n"):
+        key, _, value = line.partition(" ")
+        if key == "tree":
+            tree = value
+        elif key == "parent":
+            parents.append(value)
+        elif key in ("author", "committer"):
+            # "Name <email> 1700000000 +0100"
+            identity, _, when = value.rpartition(">")
+            name = identity.split("<", 1)[0].strip()
+            timestamp, _, tz = when.strip().partition(" ")
+            if key == "author":
+                author, author_time = name, int(timestamp or 0)
+            else:
+                committer, committer_time, committer_tz = name, int(timestamp or 0), tz
+    return CommitInfo(
+        sha=sha,
+        tree=tree,
+        parents=parents,
+        author=author,
+        author_time=author_time,
+        committer=committer,
+        committer_time=committer_time,
+        committer_tz=committer_tz,
+    )
+
+
+class UnsupportedRepository(Exception):
+    """The object database uses a format this reader does not handle (e.g. SHA-256)."""
+
+
+class _Pack:
+    """A pack .idx (version 2) and its .pack, both memory-mapped."""
+
+    def __init__(self, idx_path: str):
+        self.idx_path = idx_path
+        self.pack_path = idx_path[: -len(".idx")] + ".pack"
+        with open(idx_path, "rb") as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.idx[:4] != IDX_MAGIC or struct.unpack(">I", self.idx[4:8])[0] != 2:
+            raise UnsupportedRepository(f"unsupported pack index {idx_path}")
+        self.fanout = struct.unpack(">256I", self.idx[8 : 8 + 1024])
+        self.count = self.fanout[255]
+        self.sha_offset = 8 + 1024
+        self.crc_offset = self.sha_offset + 20 * self.count
+        self.offset_offset = self.crc_offset + 4 * self.count
+        self.large_offset_offset = self.offset_offset + 4 * self.count
+        self._pack: Optional[mmap.mmap] = None
+
+    @property
+    def pack(self) -> mmap.mmap:
+        if self._pack is None:
+            with open(self.pack_path, "rb") as f:
+                self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._pack
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Binary search the sorted sha table; return the object's pack offset."""
+        low = self.fanout[sha[0] - 1] if sha[0] else 0
+        high = self.fanout[sha[0]]
+        while low < high:
+            mid = (low + high) // 2
+            start = self.sha_offset + 20 * mid
+            candidate = self.idx[start : start + 20]
+            if candidate < sha:
+                low = mid + 1
+            elif candidate > sha:
+                high = mid
+            else:
+                return self._offset_at(mid)
+        return None
+
+    def _offset_at(self, index: int) -> int:
+        start = self.offset_offset + 4 * index
+        offset = struct.unpack(">I", self.idx[start : start + 4])[0]
+        if offset & 0x80000000:
+            start = self.large_offset_offset + 8 * (offset & 0x7FFFFFFF)
+            offset = struct.unpack(">Q", self.idx[start : start + 8])[0]
+        return offset
+
+
+def _inflate(data: mmap.mmap, start: int, size: int) -> bytes:
+    """Inflate one zlib stream starting at data[start] whose output is `size` bytes."""
+    decompressor = zlib.decompressobj()
+    output = []
+    chunk_size = max(size + 64, 512)
+    position = start
+    while not decompressor.eof and position < len(data):
+        chunk = decompressor.decompress(data[position : position + chunk_size])
+        output.append(chunk)
+        position += chunk_size
+    return b"".join(output)
+
+
+def _delta_varint(delta: bytes, position: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = delta[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    _, position = _delta_varint(delta, 0)  # base size
+    result_size, position = _delta_varint(delta, position)
+    result = bytearray()
+    while position < len(delta):
+        opcode = delta[position]
+        position += 1
+        if opcode & 0x80:
+            # copy from base: offset and size bytes are present per bit
+            offset = size = 0
+            for bit in range(4):
+                if opcode & (1 << bit):
+                    offset |= delta[position] << (8 * bit)
+                    position += 1
+            for bit in range(3):
+                if opcode & (1 << (4 + bit)):
+                    size |= delta[position] << (8 * bit)
+                    position += 1
+            result += base[offset : offset + (size or 0x10000)]
+        elif opcode:
+            # insert literal bytes
+            result += delta[position : position + opcode]
+            position += opcode
+        else:
+            raise ValueError("invalid delta opcode 0")
+    if len(result) != result_size:
+        raise ValueError("delta produced the wrong size")
+    return bytes(result)
+
+
+class ObjectReader:
+    """
+    Read objects straight from the object database: loose zlib files and mmap'ed packs.
+
+    Handles version 2 pack indexes with OFS/REF delta resolution and alternates.
+    Parsed commit headers are cached by sha.
+    """
+
+    def __init__(self, directory: str):
+        git_dirs = resolve_git_dirs(directory)
+        if git_dirs is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        self._check_object_format(git_dirs.common_dir)
+        self.object_dirs = self._object_dirs(os.path.join(git_dirs.common_dir, "objects"))
+        self.packs: List[_Pack] = []
+        self._load_packs()
+        self._commits: Dict[str, Optional[CommitInfo]] = {}
+
+    def _load_packs(self) -> bool:
+        """Map any pack index not seen yet; return True if new packs were found."""
+        known = {pack.idx_path for pack in self.packs}
+        found = False
+        for object_dir in self.object_dirs:
+            for idx_path in sorted(glob.glob(os.path.join(object_dir, "pack", "*.idx"))):
+                if idx_path not in known:
+                    self.packs.append(_Pack(idx_path))
+                    found = True
+        return found
+
+    @staticmethod
+    def _check_object_format(common_dir: str):
+        try:
+            with open(os.path.join(common_dir, "config"), "r", encoding="utf-8") as f:
+                config = f.read().lower()
+        except OSError:
+            return
+        if "objectformat" in config and "sha256" in config:
+            raise UnsupportedRepository("SHA-256 repositories are not supported")
+
+    @staticmethod
+    def _object_dirs(objects_dir: str) -> List[str]:
+        object_dirs = [objects_dir]
+        alternates = os.path.join(objects_dir, "info", "alternates")
+        if os.path.isfile(alternates):
+            with open(alternates, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        if not os.path.isabs(line):
+                            line = os.path.normpath(os.path.join(objects_dir, line))
+                        object_dirs.append(line)
+        return object_dirs
+
+    def _read_loose(self, sha: str) -> Optional[Tuple[str, bytes]]:
+        for object_dir in self.object_dirs:
+            path = os.path.join(object_dir, sha[:2], sha[2:])
+            try:
+                with open(path, "rb") as f:
+                    raw = zlib.decompress(f.read())
+            except OSError:
+                continue
+            header, _, content = raw.partition(b"\0")
+            return header.split(b" ", 1)[0].decode("ascii"), content
+        return None
+
+    def _read_packed_at(self, pack: _Pack, offset: int) -> Tuple[int, bytes]:
+        data = pack.pack
+        byte = data[offset]
+        position = offset + 1
+        obj_type = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        while byte & 0x80:
+            byte = data[position]
+            position += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+
+        if obj_type == OBJ_OFS_DELTA:
+            byte = data[position]
+            position += 1
+            base_distance = byte & 0x7F
+            while byte & 0x80:
+                byte = data[position]
+                position += 1
+                base_distance = ((base_distance + 1) << 7) | (byte & 0x7F)
+            base_type, base = self._read_packed_at(pack, offset - base_distance)
+            return base_type, _apply_delta(base, _inflate(data, position, size))
+        if obj_type == OBJ_REF_DELTA:
+            base_sha = data[position : position + 20].hex()
+            base_obj = self.read_object(base_sha)
+            if base_obj is None:
+                raise KeyError(f"missing delta base {base_sha}")
+            base_type = next(k for k, v in TYPE_NAMES.items() if v == base_obj[0])
+            return base_type, _apply_delta(base_obj[1], _inflate(data, position + 20, size))
+        return obj_type, _inflate(data, position, size)
+
+    def read_object(self, sha: str) -> Optional[Tuple[str, bytes]]:
+        """Return (type name, content) for a full hex sha, or None if it is not present."""
+        sha_bytes = bytes.fromhex(sha)
+        for pack in self.packs:
+            offset = pack.find(sha_bytes)
+            if offset is not None:
+                obj_type, content = self._read_packed_at(pack, offset)
+                return TYPE_NAMES.get(obj_type, "unknown"), content
+        loose = self._read_loose(sha)
+        # a gc or fetch may have written a new pack since the reader was created
+        if loose is None and self._load_packs():
+            return self.read_object(sha)
+        return loose
+
+    def read_commit(self, sha: str, peel_tags: bool = True) -> Optional[CommitInfo]:
+        """Return the parsed header of the commit sha points at, peeling annotated tags if asked."""
+        cache_key = sha if peel_tags else f"{sha}^0"
+        if cache_key in self._commits:
+            return self._commits[cache_key]
+        commit = None
+        current = sha
+        for _ in range(MAX_TAG_DEPTH if peel_tags else 1):
+            obj = self.read_object(current)
+            if obj is None:
+                break
+            obj_type, content = obj
+            if obj_type == "commit":
+                commit = parse_commit(current, content)
+                break
+            if obj_type != "tag":
+                break
+            # "object <sha>" is the first line of a tag
+            current = content.split(b"\n", 1)[0].split(b" ", 1)[1].decode("ascii")
+        self._commits[cache_key] = commit
+        return commit
@@ -0,0 +1,166 @@
+import json
+import os
+import subprocess
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir, write_json_atomic
+from git_session import get_session
+from logger.logger import Logger, LogLevel
+
+logger = Logger("patch_id_index", LogLevel.WARNING).logger_jl
+
+INDEX_VERSION = 2
+
+# Every patch that gets hashed, on main and on the branches, comes from this one plumbing
+# command. Porcelain like `git log -p` applies rename detection and the user's diff config,
+# so its patch ids would not match those of the same change on a branch.
+DIFF_TREE_CMD = ["git", "diff-tree", "--stdin", "-p", "--root", "--no-renames", "--no-ext-diff"]
+
+
+def write_stdin_lines(stream, lines: Iterable[str]):
+    try:
+        for line in lines:
+            stream.write(f"{line}\n")
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+def patch_ids(
+    directory: str, producer_cmd: List[str], stdin_lines: Optional[List[str]] = None
+) -> Dict[str, str]:
+    """
+    Stream the patches printed by producer_cmd through one `git patch-id --stable`.
+
+    Parameters:
+        directory (str): The repository directory.
+        producer_cmd (List[str]): A git command printing "<sha>" headers followed by diffs,
+            normally DIFF_TREE_CMD.
+        stdin_lines (Optional[List[str]]): Lines fed to the producer's stdin, if any.
+
+    Returns:
+        Dict[str, str]: Map of commit sha to patch id. Commits with an empty diff are absent.
+    """
+    producer = subprocess.Popen(
+        producer_cmd,
+        cwd=directory,
+        stdin=subprocess.PIPE if stdin_lines is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    patch_id = subprocess.Popen(
+        ["git", "patch-id", "--stable"],
+        cwd=directory,
+        stdin=producer.stdout,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # let patch-id see EOF when the producer exits
+    producer.stdout.close()
+    writer = None
+    if stdin_lines is not None:
+        writer = threading.Thread(target=write_stdin_lines, args=(producer.stdin, stdin_lines))
+        writer.start()
+
+    sha_to_patch_id = {}
+    for line in patch_id.stdout:
+        parts = line.split()
+        if len(parts) == 2:
+            sha_to_patch_id[parts[1]] = parts[0]
+    if writer is not None:
+        writer.join()
+    producer.wait()
+    patch_id.wait()
+    if producer.returncode != 0:
+        raise subprocess.CalledProcessError(producer.returncode, producer_cmd)
+    return sha_to_patch_id
+
+
+class PatchIdIndex:
+    """
+    Persistent map of patch id -> main commit, extended with only the commits new since the last run.
+
+    The index remembers the main tip it was built up to. When main has moved forward
+    only `<old tip>..<new tip>` is hashed; if main was rewritten it is rebuilt.
+    """
+
+    def __init__(self, directory: str, main_branch: str):
+        self.directory = directory
+        self.main_branch = main_branch
+        git_dirs = resolve_git_dirs(directory)
+        cache_dir = tool_cache_dir(git_dirs.common_dir if git_dirs else directory)
+        safe_name = main_branch.replace("/", "_")
+        self.index_file = os.path.join(cache_dir, f"patch_ids-{safe_name}.json")
+        self.lock_file = os.path.join(cache_dir, f"patch_ids-{safe_name}.lock")
+        self.tip: Optional[str] = None
+        self.patch_ids: Dict[str, str] = {}
+
+    def _load(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("version") != INDEX_VERSION:
+            return
+        self.tip = stored.get("tip")
+        self.patch_ids = stored.get("patch_ids", {})
+
+    def _save(self):
+        write_json_atomic(
+            self.index_file,
+            {"version": INDEX_VERSION, "tip": self.tip, "patch_ids": self.patch_ids},
+        )
+
+    def _is_ancestor(self, ancestor: str, descendant: str) -> bool:
+        return (
+            subprocess.run(
+                ["git", "merge-base", "--is-ancestor", ancestor, descendant],
+                cwd=self.directory,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ).returncode
+            == 0
+        )
+
+    def update(self) -> "PatchIdIndex":
+        """
+        Bring the index up to the current main tip.
+
+        Returns:
+            PatchIdIndex: self, for chaining.
+        """
+        new_tip = get_session(self.directory).resolve(f"{self.main_branch}^{{commit}}")
+        if new_tip is None:
+            raise ValueError(f"{self.main_branch} does not resolve to a commit")
+        with file_lock(self.lock_file):
+            self._load()
+            if self.tip == new_tip:
+                return self
+            rev_list = ["git", "rev-list", "--no-merges", new_tip]
+            if self.tip and self._is_ancestor(self.tip, new_tip):
+                rev_list.append(f"^{self.tip}")
+            else:
+                if self.tip:
+                    logger.info(f"[patch_id_index] {self.main_branch} was rewritten, rebuilding")
+                self.patch_ids = {}
+            new_commits = subprocess.check_output(rev_list, cwd=self.directory, text=True).split()
+            new_ids = patch_ids(self.directory, DIFF_TREE_CMD, new_commits)
+            logger.debug(f"[patch_id_index] indexed {len(new_ids)} new commits")
+            for sha, patch_id in new_ids.items():
+                self.patch_ids[patch_id] = sha
+            self.tip = new_tip
+            self._save()
+        return self
+
+    def __contains__(self, patch_id: str) -> bool:
+        return patch_id in self.patch_ids
+
+    def commit_for(self, patch_id: str) -> Optional[str]:
+        """Return the main commit carrying patch_id, if any."""
+        return self.patch_ids.get(patch_id)
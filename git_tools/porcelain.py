@@ -0,0 +1,121 @@
+import subprocess
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+from logger.logger import Logger, LogLevel
+
+logger = Logger("porcelain", LogLevel.WARNING).logger_jl
+
+READ_SIZE = 64 * 1024
+
+
+def _stream_fields(directory: str, cmd: List[str], separator: bytes) -> Iterator[bytes]:
+    """
+    Run cmd and yield its stdout split on separator, chunk by chunk as git writes it.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits non-zero once drained.
+    """
+    # stderr goes to a file: a pipe read only after stdout ends would block git once full
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, cwd=directory, stdout=subprocess.PIPE, stderr=stderr_file)
+        finished = False
+        try:
+            pending = b""
+            while True:
+                chunk = process.stdout.read1(READ_SIZE)
+                if not chunk:
+                    break
+                pending += chunk
+                *fields, pending = pending.split(separator)
+                yield from fields
+            if pending:
+                yield pending
+            finished = True
+        finally:
+            if not finished:
+                # the consumer stopped early; do not wait for the rest of the output
+                process.kill()
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(
+                process.returncode, cmd, stderr=stderr_file.read()
+            )
+
+
+def _decode(value: bytes) -> str:
+    return value.decode("utf-8", errors="surrogateescape")
+
+
+def iter_worktrees(directory: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream `git worktree list --porcelain -z`, one record per worktree.
+
+    Each record maps attribute -> value, e.g. {"worktree": path, "HEAD": sha,
+    "branch": "refs/heads/x"}. Flag attributes ("bare", "detached") map to "", and
+    "locked"/"prunable" to their reason (possibly ""). Paths are taken verbatim, so
+    spaces and newlines in them survive.
+
+    Parameters:
+        directory (str): Any directory inside the repository.
+
+    Yields:
+        Dict[str, str]: One record per worktree, the main worktree first.
+    """
+    record: Dict[str, str] = {}
+    for field in _stream_fields(
+        directory, ["git", "worktree", "list", "--porcelain", "-z"], b"\0"
+    ):
+        # an empty field terminates a record
+        if not field:
+            if record:
+                yield record
+            record = {}
+            continue
+        key, _, value = _decode(field).partition(" ")
+        record[key] = value
+    if record:
+        yield record
+
+
+def iter_refs(
+    directory: str,
+    fields: List[str],
+    patterns: List[str],
+    sort: Optional[str] = None,
+    merged: Optional[str] = None,
+) -> Iterator[List[str]]:
+    """
+    Stream `git for-each-ref` with NUL-separated fields, one list of values per ref.
+
+    Ref names cannot contain NUL or newlines, so each ref is a single line whose
+    fields are split on NUL; no value (author names, track info) can break the split.
+
+    Parameters:
+        directory (str): Any directory inside the repository.
+        fields (List[str]): for-each-ref atoms without %(), e.g. ["refname", "authorname"].
+        patterns (List[str]): Ref patterns such as ["refs/heads", "refs/remotes"].
+        sort (Optional[str]): A --sort key, e.g. "committerdate".
+        merged (Optional[str]): Only list refs merged into this commit (--merged).
+
+    Yields:
+        List[str]: The values of fields, in order, for each ref.
+    """
+    ref_format = "%00".join(f"%({atom})" for atom in fields)
+    cmd = ["git", "for-each-ref", f"--format={ref_format}"]
+    if sort:
+        cmd.append(f"--sort={sort}")
+    if merged:
+        cmd.append(f"--merged={merged}")
+    cmd.extend(patterns)
+
+    for line in _stream_fields(directory, cmd, b"\n"):
+        if not line:
+            continue
+        values = _decode(line).split("\0")
+        if len(values) != len(fields):
+            logger.warning(f"[porcelain] unexpected for-each-ref line: {values}")
+            continue
+        yield values
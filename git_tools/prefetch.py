@@ -0,0 +1,251 @@
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "click",
+#     "loguru",
+# ]
+# ///
+import os
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import click
+
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir
+from git_tool_constants import PREFETCH_TTL_MINUTES
+from logger.logger import Logger, LogLevel
+from porcelain import iter_refs
+
+logger = Logger("prefetch", LogLevel.WARNING).logger_jl
+
+PREFETCH_NAMESPACE = "refs/prefetch/remotes"
+# after a failed fetch (offline, auth), retry after 1, 2, 4... minutes, at most the TTL
+MAX_BACKOFF_EXPONENT = 16
+
+
+def _prefetch_paths(directory: str) -> Optional[tuple]:
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None:
+        return None
+    cache_dir = tool_cache_dir(git_dirs.common_dir)
+    return (
+        os.path.join(cache_dir, "last_fetch"),
+        os.path.join(cache_dir, "fetch.lock"),
+        os.path.join(cache_dir, "last_fetch_failure"),
+    )
+
+
+def last_fetch_time(directory: str) -> Optional[float]:
+    """Return the epoch time of the last completed prefetch, or None if it never ran."""
+    paths = _prefetch_paths(directory)
+    if paths is None:
+        return None
+    try:
+        return os.path.getmtime(paths[0])
+    except OSError:
+        return None
+
+
+def is_fresh(directory: str, ttl_minutes: int = PREFETCH_TTL_MINUTES) -> bool:
+    fetched_at = last_fetch_time(directory)
+    return fetched_at is not None and time.time() - fetched_at < ttl_minutes * 60
+
+
+def is_backing_off(directory: str, ttl_minutes: int = PREFETCH_TTL_MINUTES) -> bool:
+    """True while the last fetch failed too recently to try again."""
+    paths = _prefetch_paths(directory)
+    if paths is None:
+        return False
+    failure_file = paths[2]
+    try:
+        # the file holds the number of consecutive failures, its mtime the last one
+        with open(failure_file, "r", encoding="utf-8") as f:
+            failures = int(f.read().strip() or 1)
+        failed_at = os.path.getmtime(failure_file)
+    except (OSError, ValueError):
+        return False
+    backoff_minutes = min(ttl_minutes, 2 ** min(max(failures - 1, 0), MAX_BACKOFF_EXPONENT))
+    return time.time() - failed_at < backoff_minutes * 60
+
+
+def is_due(directory: str, ttl_minutes: int = PREFETCH_TTL_MINUTES) -> bool:
+    """A fetch is due when the last success is older than the TTL and no failure backoff runs."""
+    return not is_fresh(directory, ttl_minutes) and not is_backing_off(directory, ttl_minutes)
+
+
+def _record_failure(failure_file: str):
+    try:
+        with open(failure_file, "r", encoding="utf-8") as f:
+            failures = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        failures = 0
+    with open(failure_file, "w", encoding="utf-8") as f:
+        f.write(str(failures + 1))
+
+
+def fetch_age_label(directory: str) -> str:
+    """Human readable freshness marker for picker prompts, e.g. "last fetched 3 min ago"."""
+    fetched_at = last_fetch_time(directory)
+    if fetched_at is None:
+        return "never fetched"
+    minutes = int((time.time() - fetched_at) // 60)
+    if minutes < 1:
+        return "last fetched just now"
+    return f"last fetched {minutes} min ago"
+
+
+def _promote_prefetched_refs(directory: str, remote: str):
+    """
+    Mirror refs/prefetch/remotes/<remote> onto refs/remotes/<remote> in one ref transaction.
+
+    The slow network fetch only ever writes the prefetch namespace, so the refs other
+    commands look at change in a single atomic local update.
+    """
+    prefetch_prefix = f"{PREFETCH_NAMESPACE}/{remote}/"
+    remote_prefix = f"refs/remotes/{remote}/"
+    prefetched = {}
+    current = {}
+    for sha, refname in iter_refs(
+        directory, ["objectname", "refname"], [prefetch_prefix, remote_prefix]
+    ):
+        if refname.startswith(prefetch_prefix):
+            prefetched[refname[len(prefetch_prefix):]] = sha
+        else:
+            current[refname[len(remote_prefix):]] = sha
+    # origin/HEAD is a symbolic ref maintained by clone/remote set-head
+    current.pop("HEAD", None)
+
+    commands = []
+    for name, sha in prefetched.items():
+        if current.get(name) != sha:
+            commands.append(f"update {remote_prefix}{name} {sha}\n")
+    for name, sha in current.items():
+        if name not in prefetched:
+            commands.append(f"delete {remote_prefix}{name} {sha}\n")
+    if not commands:
+        return
+    subprocess.run(
+        ["git", "update-ref", "--stdin"],
+        cwd=directory,
+        input="start\n" + "".join(commands) + "prepare\ncommit\n",
+        text=True,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def prefetch(
+    directory: str,
+    remote: str = "origin",
+    ttl_minutes: int = PREFETCH_TTL_MINUTES,
+    force: bool = False,
+) -> bool:
+    """
+    Fetch remote into the prefetch namespace and promote it, unless the last fetch is fresh.
+
+    A failed fetch is recorded too, so callers back off (see is_backing_off) instead
+    of starting a new fetch on every invocation while offline.
+
+    Parameters:
+        directory (str): A directory inside the repository.
+        remote (str): The remote to fetch.
+        ttl_minutes (int): Skip the fetch if the last one finished less than this long ago.
+        force (bool): Fetch even if the last fetch is still fresh or a failure is backing off.
+
+    Returns:
+        bool: True if this call fetched, False if it was skipped, failed or another process
+        holds the lock.
+    """
+    paths = _prefetch_paths(directory)
+    if paths is None:
+        return False
+    stamp_file, lock_file, failure_file = paths
+    with file_lock(lock_file, blocking=False) as locked:
+        if not locked:
+            logger.debug(f"[prefetch] fetch already running for {directory}")
+            return False
+        # another process may have finished a fetch while we were waiting to start
+        if not force and not is_due(directory, ttl_minutes):
+            return False
+        try:
+            # tags pointing into the fetched history are followed, as a plain fetch does
+            subprocess.run(
+                [
+                    "git",
+                    "fetch",
+                    "--prune",
+                    "--quiet",
+                    "--no-write-fetch-head",
+                    remote,
+                    f"+refs/heads/*:{PREFETCH_NAMESPACE}/{remote}/*",
+                ],
+                cwd=directory,
+                check=True,
+                stdin=subprocess.DEVNULL,
+            )
+            _promote_prefetched_refs(directory, remote)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"[prefetch] fetch of {remote} failed: {e}")
+            _record_failure(failure_file)
+            return False
+        with open(stamp_file, "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        if os.path.exists(failure_file):
+            os.remove(failure_file)
+    return True
+
+
+def start_background_prefetch(
+    directory: str, ttl_minutes: int = PREFETCH_TTL_MINUTES
+) -> bool:
+    """
+    Start a detached prefetch process if the last fetch is older than the TTL
+    (and the last failed attempt is not backing off).
+
+    The caller never waits on the network; pickers show cached refs with fetch_age_label().
+
+    Returns:
+        bool: True if a background fetch was started.
+    """
+    if not is_due(directory, ttl_minutes):
+        return False
+    subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--directory",
+            os.path.abspath(directory),
+            "--ttl_minutes",
+            str(ttl_minutes),
+        ],
+        cwd=directory,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    return True
+
+
+@click.command()
+@click.option(
+    "--directory", default=".", help="Directory to execute the git command in"
+)
+@click.option("--remote", default="origin", help="Remote to fetch")
+@click.option(
+    "--ttl_minutes",
+    default=PREFETCH_TTL_MINUTES,
+    type=int,
+    help="Skip fetching if the last fetch is younger than this.",
+)
+@click.option("--force", is_flag=True, help="Fetch even if the last fetch is fresh")
+def main(directory, remote, ttl_minutes, force):
+    """Fetch in the background without blocking interactive tools."""
+    fetched = prefetch(directory, remote, ttl_minutes, force)
+    logger.info(f"[prefetch] {'fetched' if fetched else 'skipped'} {directory}")
+
+
+if __name__ == "__main__":
+    main()
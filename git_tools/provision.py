@@ -0,0 +1,290 @@
+import fnmatch
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from git_paths import resolve_git_dirs, tool_cache_dir
+from logger.logger import Logger, LogLevel
+from ref_store import RefStore
+from worktree_add import add_worktree
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+logger = Logger("provision", LogLevel.INFO).logger_jl
+
+# installs are mostly I/O and network bound, but each one also runs a package manager
+DEFAULT_BUILD_JOBS = min(4, os.cpu_count() or 1)
+
+QUEUED = "queued"
+ADDING = "adding worktree"
+WAITING = "waiting to build"
+BUILDING = "building"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class ProvisionResult:
+    branch: str
+    path: str
+    state: str = QUEUED
+    add_seconds: Optional[float] = None
+    build_seconds: Optional[float] = None
+    log_path: str = ""
+    error: str = ""
+
+
+def resolve_branch_names(directory: str, names: List[str], remote: str = "origin") -> List[str]:
+    """
+    Expand names into branch names, in order and without duplicates.
+
+    A name with glob characters (e.g. "feature/*") matches local branches and, for the
+    ones with no local branch yet, remote branches (without the "<remote>/" prefix, so
+    `git worktree add` creates the tracking branch). Other names are used as given.
+    """
+    ref_store = RefStore(directory)
+    local = sorted(ref_store.local_branches())
+    remote_only = [name for name in sorted(ref_store.remote_branches(remote)) if name not in local]
+
+    branches: List[str] = []
+    for name in names:
+        if any(c in name for c in "*?["):
+            matches = fnmatch.filter(local + remote_only, name)
+            if not matches:
+                logger.warning(f"[provision] no branch matches {name}")
+        else:
+            prefix = f"{remote}/"
+            matches = [name[len(prefix):] if name.startswith(prefix) else name]
+        for branch in matches:
+            if branch not in branches:
+                branches.append(branch)
+    return branches
+
+
+def _add_worktree(directory: str, result: ProvisionResult):
+    if os.path.exists(result.path):
+        logger.debug(f"[provision] {result.path} already exists")
+        result.add_seconds = 0.0
+        return
+    start = time.perf_counter()
+    try:
+        add_worktree(directory, result.path, result.branch)
+    except subprocess.CalledProcessError as e:
+        result.state = FAILED
+        output = (e.output or "").strip()
+        result.error = output.splitlines()[-1] if output else (
+            f"git worktree add exited with {e.returncode}"
+        )
+    result.add_seconds = time.perf_counter() - start
+
+
+def _run_build(
+    build_fn: Callable[..., None], path: str, git_dir: str, log_path: str, rebuild: bool
+) -> float:
+    """
+    Run build_fn in a pool worker with its output going to log_path.
+
+    Build functions chdir and print, so each one runs in its own process with
+    stdout/stderr redirected at the file descriptor level (subprocesses included).
+    Pool workers are reused, so the fds and the working directory are restored
+    afterwards; otherwise the next build would log into this branch's file. No
+    editor is opened for the worktrees built in bulk.
+    """
+    start = time.perf_counter()
+    saved_fds = [os.dup(1), os.dup(2)]
+    cwd = os.getcwd()
+    try:
+        with open(log_path, "w") as log:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(log.fileno(), 1)
+            os.dup2(log.fileno(), 2)
+            build_fn(path, git_dir, rebuild=rebuild, open_editor=False)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, saved_fd in zip((1, 2), saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+        os.chdir(cwd)
+    return time.perf_counter() - start
+
+
+class ProgressDisplay:
+    """
+    One line per worktree, redrawn in place on a terminal (plain state changes otherwise).
+    """
+
+    def __init__(self, results: List[ProvisionResult]):
+        self.results = results
+        self.started: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.interactive = sys.stdout.isatty()
+        self.drawn = 0
+        self._stop = threading.Event()
+        self._ticker: Optional[threading.Thread] = None
+
+    def _line(self, result: ProvisionResult) -> str:
+        marker = {DONE: "✔", FAILED: "✘"}.get(result.state, "…")
+        detail = result.state
+        if result.state in (ADDING, BUILDING) and result.branch in self.started:
+            detail += f" {time.perf_counter() - self.started[result.branch]:.0f}s"
+        if result.error:
+            detail += f": {result.error}"
+        return f"{marker} {result.branch:<40} {detail}"
+
+    def _draw(self):
+        if self.drawn:
+            sys.stdout.write(f"\x1b[{self.drawn}F")
+        for result in self.results:
+            sys.stdout.write(f"\x1b[2K{self._line(result)}\n")
+        sys.stdout.flush()
+        self.drawn = len(self.results)
+
+    def update(self, result: ProvisionResult, state: str):
+        with self.lock:
+            result.state = state
+            self.started[result.branch] = time.perf_counter()
+            if self.interactive:
+                self._draw()
+            else:
+                print(self._line(result), flush=True)
+
+    def _tick(self):
+        # keep the elapsed times moving while builds run
+        while not self._stop.wait(1):
+            with self.lock:
+                self._draw()
+
+    def __enter__(self):
+        if self.interactive:
+            with self.lock:
+                self._draw()
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            with self.lock:
+                self._draw()
+
+
+def _poll_builds(
+    pending: Dict["Future", ProvisionResult], display: ProgressDisplay, jobs: int
+) -> bool:
+    """Report builds the pool has started or finished; returns whether any finished."""
+    finished = False
+    # the pool queues one task ahead of its workers, so "running" alone over-reports
+    building = sum(1 for result in pending.values() if result.state == BUILDING)
+    for future, result in list(pending.items()):
+        if future.done():
+            del pending[future]
+            finished = True
+            if result.state == BUILDING:
+                building -= 1
+            try:
+                result.build_seconds = future.result()
+                display.update(result, DONE)
+            except Exception as e:
+                result.error = f"{e} (see {result.log_path})"
+                display.update(result, FAILED)
+    for future, result in pending.items():
+        if building < jobs and future.running() and result.state == WAITING:
+            building += 1
+            display.update(result, BUILDING)
+    return finished
+
+
+def provision_worktrees(
+    directory: str,
+    branches: List[str],
+    worktree_dir: str,
+    build_fn: Callable[..., None],
+    git_dir: str,
+    jobs: int = DEFAULT_BUILD_JOBS,
+    rebuild: bool = False,
+) -> List[ProvisionResult]:
+    """
+    Add a worktree for each branch and run the profile build function in each.
+
+    `git worktree add` takes repository-wide locks (the worktrees admin dir, the new
+    branch ref, the config for tracking), so the adds run one at a time in this
+    process. Each build starts in a process pool as soon as its worktree exists, at
+    most `jobs` at once, while the next worktree is being added.
+
+    Parameters:
+        directory (str): Any directory inside the repository.
+        branches (List[str]): Branch names (see resolve_branch_names).
+        worktree_dir (str): Parent directory of the new worktrees.
+        build_fn (Callable[..., None]): The profile BUILD_FN(path, git_dir, rebuild=...,
+            open_editor=...); it is called with open_editor=False.
+        git_dir (str): The main checkout, passed to build_fn.
+        jobs (int): Maximum concurrent builds.
+        rebuild (bool): Passed to build_fn to ignore the build stamps.
+
+    Returns:
+        List[ProvisionResult]: One result per branch, in the given order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None:
+        raise ValueError(f"{directory} is not inside a git repository")
+    jobs = max(1, jobs)
+    log_dir = os.path.join(tool_cache_dir(git_dirs.common_dir), "provision")
+    os.makedirs(log_dir, exist_ok=True)
+    results = [
+        ProvisionResult(
+            branch=branch,
+            path=os.path.join(worktree_dir, branch),
+            log_path=os.path.join(log_dir, f"{branch.replace('/', '_')}.log"),
+        )
+        for branch in branches
+    ]
+
+    with ProgressDisplay(results) as display, ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = {}
+        for result in results:
+            display.update(result, ADDING)
+            _add_worktree(directory, result)
+            if result.state == FAILED:
+                display.update(result, FAILED)
+                continue
+            display.update(result, WAITING)
+            future = pool.submit(
+                _run_build, build_fn, result.path, git_dir, result.log_path, rebuild
+            )
+            pending[future] = result
+            _poll_builds(pending, display, jobs)
+        while pending:
+            if not _poll_builds(pending, display, jobs):
+                time.sleep(0.1)
+    return results
+
+
+def format_summary(results: List[ProvisionResult]) -> str:
+    """Summary table of a provision run: branch, state, add/build times, path or error."""
+    from tabulate import tabulate
+
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1f}s"
+
+    rows = [
+        [
+            result.branch,
+            result.state,
+            seconds(result.add_seconds),
+            seconds(result.build_seconds),
+            result.error or result.path,
+        ]
+        for result in results
+    ]
+    return tabulate(rows, headers=["branch", "state", "add", "build", "path / error"])
@@ -0,0 +1,155 @@
+import mmap
+import os
+from typing import Dict, Optional
+
+from git_paths import resolve_git_dirs
+
+# refs that live in each worktree's private git dir instead of the common dir
+PER_WORKTREE_PREFIXES = ("refs/bisect/", "refs/worktree/", "refs/rewritten/")
+MAX_SYMREF_DEPTH = 5
+
+
+class RefStore:
+    """
+    Read refs straight from packed-refs and the loose ref files, without running git.
+
+    The store is bound to the worktree containing `directory`: shared refs come from the
+    common dir (via `commondir` for linked worktrees) and HEAD plus per-worktree refs
+    from that worktree's own git dir.
+    """
+
+    def __init__(self, directory: str):
+        git_dirs = resolve_git_dirs(directory)
+        if git_dirs is None:
+            raise ValueError(f"{directory} is not inside a git repository")
+        self.git_dirs = git_dirs
+        self._packed: Optional[Dict[str, str]] = None
+        self._packed_stat = None
+
+    def packed_refs(self) -> Dict[str, str]:
+        """Parse packed-refs through mmap (re-read only when the file changes)."""
+        path = os.path.join(self.git_dirs.common_dir, "packed-refs")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if self._packed is not None and self._packed_stat == stat_key:
+            return self._packed
+
+        refs: Dict[str, str] = {}
+        if stat.st_size:
+            with open(path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                # line by line straight from the mapping: the file is never copied whole
+                for line in iter(mapped.readline, b""):
+                    line = line.rstrip(b"\n")
+                    # skip the "# pack-refs with:" header and "^<peeled sha>" lines
+                    if not line or line[0] in b"#^":
+                        continue
+                    sha, _, refname = line.partition(b" ")
+                    refs[refname.decode("utf-8", errors="surrogateescape")] = sha.decode(
+                        "ascii"
+                    )
+        self._packed = refs
+        self._packed_stat = stat_key
+        return refs
+
+    def _scan_loose(self, base_dir: str, prefix: str, refs: Dict[str, str]):
+        stack = [os.path.join(base_dir, prefix)]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(current)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if entry.name.endswith(".lock"):
+                        continue
+                    refname = os.path.relpath(entry.path, base_dir).replace(os.sep, "/")
+                    value = self._read_ref_file(entry.path)
+                    if value is not None:
+                        refs[refname] = value
+
+    @staticmethod
+    def _read_ref_file(path: str) -> Optional[str]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def refs(self, prefix: str = "refs/") -> Dict[str, str]:
+        """
+        Return refname -> sha for every ref under prefix (loose refs win over packed ones).
+
+        Symbolic refs such as refs/remotes/origin/HEAD are resolved to the sha they point at.
+        """
+        if not prefix.endswith("/"):
+            prefix += "/"
+        raw: Dict[str, str] = {
+            refname: sha
+            for refname, sha in self.packed_refs().items()
+            if refname.startswith(prefix)
+        }
+        base_dir = (
+            self.git_dirs.git_dir
+            if prefix.startswith(PER_WORKTREE_PREFIXES)
+            else self.git_dirs.common_dir
+        )
+        self._scan_loose(base_dir, prefix.rstrip("/"), raw)
+
+        refs = {}
+        for refname, value in raw.items():
+            sha = self._peel_symref(value)
+            if sha is not None:
+                refs[refname] = sha
+        return refs
+
+    def _peel_symref(self, value: str) -> Optional[str]:
+        for _ in range(MAX_SYMREF_DEPTH):
+            if not value.startswith("ref:"):
+                return value
+            value = self.read_ref(value[len("ref:"):].strip(), peel=False)
+            if value is None:
+                return None
+        return None
+
+    def read_ref(self, refname: str, peel: bool = True) -> Optional[str]:
+        """Read a single ref (e.g. "HEAD" or "refs/heads/main")."""
+        per_worktree = refname == "HEAD" or refname.startswith(PER_WORKTREE_PREFIXES)
+        base_dir = self.git_dirs.git_dir if per_worktree else self.git_dirs.common_dir
+        value = self._read_ref_file(os.path.join(base_dir, refname))
+        if value is None:
+            value = self.packed_refs().get(refname)
+        if value is None:
+            return None
+        return self._peel_symref(value) if peel else value
+
+    def head_branch(self) -> Optional[str]:
+        """The branch checked out in this worktree, or None when HEAD is detached."""
+        head = self.read_ref("HEAD", peel=False)
+        if head and head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return None
+
+    def local_branches(self) -> Dict[str, str]:
+        """Branch name -> tip sha for refs/heads."""
+        return {
+            refname[len("refs/heads/"):]: sha
+            for refname, sha in self.refs("refs/heads/").items()
+        }
+
+    def remote_branches(self, remote: str = "origin") -> Dict[str, str]:
+        """Branch name (without <remote>/) -> tip sha for refs/remotes/<remote>, excluding HEAD."""
+        prefix = f"refs/remotes/{remote}/"
+        return {
+            refname[len(prefix):]: sha
+            for refname, sha in self.refs(prefix).items()
+            if refname != f"{prefix}HEAD"
+        }
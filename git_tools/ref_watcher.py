@@ -0,0 +1,236 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from git_paths import GitDirs
+from logger.logger import Logger, LogLevel
+
+logger = Logger("ref_watcher", LogLevel.WARNING).logger_jl
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# git replaces files by renaming "<name>.lock" over them, so watch directories for
+# entries appearing, disappearing or being rewritten in place
+DIR_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+# change kinds reported by RepoWatcher.read()
+REF_CHANGED = "ref"  # (REF_CHANGED, refname)
+PACKED_REFS_CHANGED = "packed-refs"  # (PACKED_REFS_CHANGED, None)
+CONFIG_CHANGED = "config"  # (CONFIG_CHANGED, None)
+WORKTREES_CHANGED = "worktrees"  # (WORKTREES_CHANGED, None): added/removed/locked
+HEAD_CHANGED = "head"  # (HEAD_CHANGED, worktree path)
+INDEX_CHANGED = "index"  # (INDEX_CHANGED, worktree path)
+OVERFLOW = "overflow"  # (OVERFLOW, None): events were lost, re-read everything
+
+
+class UnsupportedPlatform(Exception):
+    """inotify is not available (not Linux, or no libc with inotify)."""
+
+
+class Inotify:
+    """Minimal ctypes binding for inotify_init1/inotify_add_watch/inotify_rm_watch."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise UnsupportedPlatform("inotify needs Linux")
+        libc_name = ctypes.util.find_library("c")
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            self._libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise UnsupportedPlatform(f"no inotify in libc: {e}") from e
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, int, str]]:
+        """Wait up to timeout seconds and return (wd, mask, name) for each queued event."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class RepoWatcher:
+    """
+    Watch a repository's ref store and worktrees and report what changed.
+
+    Watched: packed-refs, config and the main HEAD/index (in the common dir), every
+    directory under refs/ (new ones are picked up as they appear), worktrees/ (from
+    when it is created), and each linked worktree's admin dir for its HEAD, index and
+    lock file.
+    """
+
+    def __init__(self, git_dirs: GitDirs):
+        self.common_dir = os.path.realpath(git_dirs.common_dir)
+        self.refs_dir = os.path.join(self.common_dir, "refs")
+        self.admin_root = os.path.join(self.common_dir, "worktrees")
+        self.main_worktree = git_dirs.worktree if git_dirs.git_dir == git_dirs.common_dir else None
+        self.inotify = Inotify()
+        self.directories: Dict[int, str] = {}
+        self._watch(self.common_dir)
+        self._watch_tree(self.refs_dir)
+        self._watch_worktrees()
+
+    def _watch(self, directory: str) -> bool:
+        try:
+            wd = self.inotify.add_watch(directory, DIR_MASK)
+        except OSError as e:
+            logger.debug(f"[ref_watcher] cannot watch {directory}: {e}")
+            return False
+        self.directories[wd] = directory
+        return True
+
+    def _watch_tree(self, root: str) -> List[str]:
+        """Watch root and its subdirectories; return the ref files found under them."""
+        found = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            if not self._watch(directory):
+                continue
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif not entry.name.endswith(".lock"):
+                    found.append(entry.path)
+        return found
+
+    def _watch_worktrees(self):
+        if not self._watch(self.admin_root):
+            return
+        known = set(self.directories.values())
+        try:
+            entries = list(os.scandir(self.admin_root))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and entry.path not in known:
+                self._watch(entry.path)
+
+    def _worktree_of_admin_dir(self, admin_dir: str) -> Optional[str]:
+        try:
+            with open(os.path.join(admin_dir, "gitdir"), "r", encoding="utf-8") as f:
+                return os.path.dirname(f.read().strip())
+        except OSError:
+            return None
+
+    def _refname(self, path: str) -> str:
+        return os.path.relpath(path, self.common_dir).replace(os.sep, "/")
+
+    def read(self, timeout: Optional[float] = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        Wait up to timeout seconds for changes.
+
+        Returns:
+            List[Tuple[str, Optional[str]]]: Deduplicated (kind, detail) changes, in order.
+        """
+        changes: List[Tuple[str, Optional[str]]] = []
+        for wd, mask, name in self.inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                changes.append((OVERFLOW, None))
+                continue
+            directory = self.directories.get(wd)
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            if directory is None or not name or name.endswith(".lock"):
+                continue
+            path = os.path.join(directory, name)
+
+            if directory == self.common_dir:
+                if name == "packed-refs":
+                    changes.append((PACKED_REFS_CHANGED, None))
+                elif name == "config":
+                    changes.append((CONFIG_CHANGED, None))
+                elif name == "HEAD" and self.main_worktree:
+                    changes.append((HEAD_CHANGED, self.main_worktree))
+                elif name == "index" and self.main_worktree:
+                    changes.append((INDEX_CHANGED, self.main_worktree))
+                elif name == "worktrees" and mask & IN_ISDIR:
+                    # git creates worktrees/ with the first linked worktree (and removes
+                    # it with the last one), so it may not have existed at startup
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_worktrees()
+                    changes.append((WORKTREES_CHANGED, None))
+            elif path.startswith(self.refs_dir + os.sep):
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # refs written before the watch existed are reported from the scan
+                        for ref_path in self._watch_tree(path):
+                            changes.append((REF_CHANGED, self._refname(ref_path)))
+                else:
+                    changes.append((REF_CHANGED, self._refname(path)))
+            elif directory == self.admin_root:
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch(path)
+                changes.append((WORKTREES_CHANGED, None))
+            elif os.path.dirname(directory) == self.admin_root:
+                worktree = self._worktree_of_admin_dir(directory)
+                if name == "HEAD" and worktree:
+                    changes.append((HEAD_CHANGED, worktree))
+                elif name == "index" and worktree:
+                    changes.append((INDEX_CHANGED, worktree))
+                elif name == "locked":
+                    changes.append((WORKTREES_CHANGED, None))
+
+        deduplicated = []
+        for change in changes:
+            if change not in deduplicated:
+                deduplicated.append(change)
+        return deduplicated
+
+    def close(self):
+        self.inotify.close()
@@ -0,0 +1,223 @@
+# /// script
+# requires-python = ">=3.13"
+# dependencies = [
+#     "click",
+#     "loguru",
+# ]
+# ///
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+import click
+
+from build_stamps import BuildStamps
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir
+from git_tool_constants import (GIT_DIR, PROFILE_DEFAULT_DIR, ROOT_DIR, SPARE_LOCK_REASON,
+                                SPARE_WORKTREES, WORKTREE_DIR)
+from logger.logger import Logger, LogLevel
+from ref_store import RefStore
+
+logger = Logger("spare_worktrees", LogLevel.INFO).logger_jl
+
+SPARES_DIR_NAME = ".spares"
+# spares are built on the first of these that exists
+BASE_REFS = [
+    "refs/remotes/origin/HEAD",
+    "refs/remotes/origin/main",
+    "refs/remotes/origin/master",
+    "refs/heads/main",
+    "refs/heads/master",
+]
+
+
+def spare_paths(worktree_dir: str, count: int) -> List[str]:
+    return [os.path.join(worktree_dir, SPARES_DIR_NAME, f"spare-{i}") for i in range(count)]
+
+
+def _state_dir(directory: str) -> str:
+    git_dirs = resolve_git_dirs(directory)
+    if git_dirs is None:
+        raise ValueError(f"{directory} is not inside a git repository")
+    state_dir = os.path.join(tool_cache_dir(git_dirs.common_dir), "spares")
+    os.makedirs(state_dir, exist_ok=True)
+    return state_dir
+
+
+def _marker(state_dir: str, spare: str) -> str:
+    """The spare is ready to claim while this file exists (it holds the base sha)."""
+    return os.path.join(state_dir, f"{os.path.basename(spare)}.ready")
+
+
+def _package_dir(worktree: str, package_subdir: str) -> str:
+    return worktree if package_subdir in ("", ROOT_DIR) else os.path.join(worktree, package_subdir)
+
+
+def _base_sha(directory: str) -> Optional[str]:
+    ref_store = RefStore(directory)
+    for refname in BASE_REFS:
+        sha = ref_store.read_ref(refname)
+        if sha:
+            return sha
+    return None
+
+
+def _git(cwd: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+
+
+def _prepare_spare(directory: str, spare: str, base: str, package_subdir: str, state_dir: str):
+    """Create or update one spare on base (detached) and install its dependencies."""
+    from dependency_store import install_dependencies
+
+    marker = _marker(state_dir, spare)
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            if f.read().strip() == base and os.path.isdir(spare):
+                return
+    except OSError:
+        pass
+
+    if os.path.isdir(spare):
+        process = _git(spare, "checkout", "--detach", "--force", base)
+    else:
+        os.makedirs(os.path.dirname(spare), exist_ok=True)
+        process = _git(directory, "worktree", "add", "--detach", spare, base)
+        if process.returncode == 0:
+            # locked: never pruned, and hidden from the worktree pickers
+            _git(directory, "worktree", "lock", "--reason", SPARE_LOCK_REASON, spare)
+    if process.returncode != 0:
+        logger.warning(f"[spare_worktrees] could not prepare {spare}: {process.stderr.strip()}")
+        return
+    install_dependencies(_package_dir(spare, package_subdir))
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(base)
+    logger.info(f"[spare_worktrees] {spare} ready on {base[:10]}")
+
+
+def refill_pool(directory: str, worktree_dir: str, count: int, package_subdir: str) -> bool:
+    """
+    Bring the pool to `count` spares built on the latest main.
+
+    Returns:
+        bool: False if another refill is already running.
+    """
+    state_dir = _state_dir(directory)
+    with file_lock(os.path.join(state_dir, "refill.lock"), blocking=False) as locked:
+        if not locked:
+            return False
+        base = _base_sha(directory)
+        if base is None:
+            logger.warning("[spare_worktrees] no main branch to build spares on")
+            return True
+        for spare in spare_paths(worktree_dir, count):
+            spare_lock = os.path.join(state_dir, f"{os.path.basename(spare)}.lock")
+            # a spare being claimed is skipped; the next refill picks its slot up again
+            with file_lock(spare_lock, blocking=False) as spare_locked:
+                if spare_locked:
+                    _prepare_spare(directory, spare, base, package_subdir, state_dir)
+    return True
+
+
+def start_background_refill(directory: str, worktree_dir: str, count: int, package_subdir: str):
+    """Refill the pool in a detached process; the caller never waits for checkouts or installs."""
+    if count <= 0:
+        return
+    subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--directory",
+            os.path.abspath(directory),
+            "--worktree_dir",
+            worktree_dir,
+            "--count",
+            str(count),
+            "--package_dir",
+            package_subdir,
+        ],
+        cwd=directory,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def claim_spare(
+    directory: str,
+    worktree_dir: str,
+    count: int,
+    branch_name: str,
+    destination: str,
+    package_subdir: str,
+) -> bool:
+    """
+    Turn a ready spare into the worktree for branch_name at destination.
+
+    The spare is moved (`git worktree move`) and switched to the branch, so its
+    installed node_modules (and their build stamps) carry over; the install that
+    follows only does work if the branch's lockfile differs from main's.
+
+    Returns:
+        bool: False if no spare was ready (or it could not be switched); the caller
+        then adds the worktree the usual way.
+    """
+    state_dir = _state_dir(directory)
+    for spare in spare_paths(worktree_dir, count):
+        marker = _marker(state_dir, spare)
+        spare_lock = os.path.join(state_dir, f"{os.path.basename(spare)}.lock")
+        with file_lock(spare_lock, blocking=False) as locked:
+            if not locked or not os.path.isdir(spare):
+                continue
+            try:
+                with open(marker, "r", encoding="utf-8") as f:
+                    base = f.read().strip()
+            except OSError:
+                # still being prepared
+                continue
+            os.remove(marker)
+            _git(directory, "worktree", "unlock", spare)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            moved = _git(directory, "worktree", "move", spare, destination)
+            process = moved
+            if moved.returncode == 0:
+                process = _git(destination, "switch", branch_name)
+            if process.returncode != 0:
+                # e.g. the branch is checked out elsewhere: put the spare back
+                logger.warning(
+                    f"[spare_worktrees] could not claim {spare} for {branch_name}:"
+                    f" {process.stderr.strip()}"
+                )
+                if moved.returncode == 0:
+                    _git(directory, "worktree", "move", destination, spare)
+                _git(directory, "worktree", "lock", "--reason", SPARE_LOCK_REASON, spare)
+                with open(marker, "w", encoding="utf-8") as f:
+                    f.write(base)
+                return False
+            BuildStamps(directory).move(
+                _package_dir(spare, package_subdir), _package_dir(destination, package_subdir)
+            )
+            logger.info(f"[spare_worktrees] claimed {spare} for {branch_name}")
+            return True
+    logger.info("[spare_worktrees] no spare worktree ready")
+    return False
+
+
+@click.command()
+@click.option("--directory", default=GIT_DIR, help="Directory of the repository")
+@click.option("--worktree_dir", default=WORKTREE_DIR, help="Where the spares (in .spares/) live")
+@click.option("--count", default=SPARE_WORKTREES, type=int, help="Number of spares to keep")
+@click.option(
+    "--package_dir", default=PROFILE_DEFAULT_DIR, help="Package dir to install in each spare"
+)
+def main(directory, worktree_dir, count, package_dir):
+    """Keep a pool of built spare worktrees on the latest main for instant worktree adds."""
+    refilled = refill_pool(directory, worktree_dir, count, package_dir)
+    state = "refilled" if refilled else "refill already running for"
+    logger.info(f"[spare_worktrees] {state} {directory}")
+
+
+if __name__ == "__main__":
+    main()
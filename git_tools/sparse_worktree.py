@@ -0,0 +1,86 @@
+import subprocess
+from typing import List, Optional
+
+from git_tool_constants import ROOT_DIR, SPARSE_SHARED_PATHS
+from logger.logger import Logger, LogLevel
+from worktree_add import add_worktree
+
+logger = Logger("sparse_worktree", LogLevel.INFO).logger_jl
+
+
+def _git(cwd: str, *args: str) -> str:
+    return subprocess.check_output(
+        ["git", *args], cwd=cwd, stderr=subprocess.STDOUT, text=True
+    ).strip()
+
+
+def _normalize(path: str) -> str:
+    # DIR_OPTIONS may quote path components for the shell (playground/joe/"filter-s3")
+    return path.replace('"', "").strip().strip("/")
+
+
+def sparse_paths_for(directory: str, shared_paths: Optional[List[str]] = None) -> Optional[List[str]]:
+    """
+    The cone for a DIR_OPTIONS selection: the package plus the shared paths.
+
+    Files at the top level (root configs, lockfiles) are always part of a cone-mode
+    checkout, so only directories are listed.
+
+    Returns:
+        Optional[List[str]]: None for the root selection, which needs a full checkout.
+    """
+    package = _normalize(directory)
+    if package in ("", ROOT_DIR):
+        return None
+    paths = [package]
+    for path in SPARSE_SHARED_PATHS if shared_paths is None else shared_paths:
+        path = _normalize(path)
+        if path and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def add_sparse_worktree(git_dir: str, worktree: str, branch_name: str, paths: List[str]):
+    """
+    Add a worktree that only materializes paths (cone mode).
+
+    The worktree is created without a checkout, restricted, then checked out, so
+    files outside the cone are never written. The sparse settings live in the worktree's own
+    config; the main checkout stays complete.
+    """
+    logger.info(f"[sparse_worktree] add {worktree} limited to {', '.join(paths)}")
+    add_worktree(git_dir, worktree, branch_name, sparse_paths=paths)
+
+
+def sparse_checkout_list(worktree: str) -> Optional[List[str]]:
+    """The cone of a sparse worktree, or None if it has a full checkout."""
+    try:
+        enabled = _git(worktree, "config", "--get", "core.sparseCheckout")
+    except subprocess.CalledProcessError:
+        return None
+    if enabled != "true":
+        return None
+    return _git(worktree, "sparse-checkout", "list").splitlines()
+
+
+def widen_sparse_worktree(worktree: str, paths: List[str]) -> List[str]:
+    """
+    Add paths missing from a sparse worktree's cone (no-op for full checkouts).
+
+    Returns:
+        List[str]: The paths that were added.
+    """
+    cone = sparse_checkout_list(worktree)
+    if cone is None:
+        return []
+    missing = [
+        path
+        for path in map(_normalize, paths)
+        if path not in ("", ROOT_DIR)
+        # a path inside a directory of the cone is already checked out
+        and not any(path == entry or path.startswith(f"{entry}/") for entry in cone)
+    ]
+    if missing:
+        logger.info(f"[sparse_worktree] widen {worktree} with {', '.join(missing)}")
+        _git(worktree, "sparse-checkout", "add", *missing)
+    return missing
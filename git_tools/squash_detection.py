@@ -0,0 +1,231 @@
+import subprocess
+from typing import Dict, List, Optional, Set
+
+from git_session import get_session
+from logger.logger import Logger, LogLevel
+from patch_id_index import DIFF_TREE_CMD, PatchIdIndex, patch_ids
+
+logger = Logger("squash_detection", LogLevel.WARNING).logger_jl
+
+PATCH_ID_STRATEGY = "patch-id"
+MERGE_TREE_STRATEGY = "merge-tree"
+SQUASH_STRATEGIES = [PATCH_ID_STRATEGY, MERGE_TREE_STRATEGY]
+
+
+class BranchGraph:
+    """The commits reachable from the candidate tips but not from main, walked once."""
+
+    def __init__(self, directory: str, tips: List[str], main_branch: str):
+        self.directory = directory
+        self.main_branch = main_branch
+        self.parents: Dict[str, List[str]] = {}
+        output = subprocess.run(
+            ["git", "log", "--stdin", "--format=%H %P"],
+            cwd=directory,
+            input="\n".join(tips + [f"^{main_branch}"]) + "\n",
+            text=True,
+            capture_output=True,
+            check=True,
+        ).stdout
+        for line in output.splitlines():
+            parts = line.split()
+            if parts:
+                self.parents[parts[0]] = parts[1:]
+
+    def walk(self, tip: str):
+        """Return (non-merge commits unique to tip, best merge base) or None if tip is in main."""
+        if tip not in self.parents:
+            return None
+        commits: Set[str] = set()
+        boundaries: Set[str] = set()
+        seen = {tip}
+        stack = [tip]
+        while stack:
+            sha = stack.pop()
+            parents = self.parents[sha]
+            if len(parents) <= 1:
+                commits.add(sha)
+            for parent in parents:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                if parent in self.parents:
+                    stack.append(parent)
+                else:
+                    boundaries.add(parent)
+        if len(boundaries) <= 1:
+            return commits, next(iter(boundaries), None)
+        # only branches that merged main back in fork from several main commits;
+        # let git pick the best one instead of guessing from commit dates
+        merge_base = subprocess.run(
+            ["git", "merge-base", self.main_branch, tip],
+            cwd=self.directory,
+            text=True,
+            capture_output=True,
+        ).stdout.strip()
+        return commits, merge_base or None
+
+
+def find_squashed_branches(
+    directory: str,
+    branch_tips: Dict[str, str],
+    main_branch: str,
+    strategy: str = PATCH_ID_STRATEGY,
+    graph: Optional[BranchGraph] = None,
+) -> List[str]:
+    """
+    Detect branches whose changes landed on main as a squash or as cherry-picks.
+
+    The candidates are walked once and their patches hashed by one `git patch-id`
+    process, regardless of the number of branches. main's patch ids come from the
+    persistent PatchIdIndex, which only hashes commits added since the last run.
+
+    A branch counts as squashed if the diff from its merge base to its tip is empty or
+    matches a commit on main, or if every commit unique to the branch matches one. Branches that
+    are already reachable from main are left to the merged check.
+
+    Parameters:
+        directory (str): The repository directory.
+        branch_tips (Dict[str, str]): Candidate branch name to tip sha.
+        main_branch (str): The main branch as a full ref name (refs/heads/main) or sha.
+        strategy (str): PATCH_ID_STRATEGY, or MERGE_TREE_STRATEGY to use
+            find_squashed_branches_merge_tree() instead.
+        graph (Optional[BranchGraph]): An already walked graph covering the candidates.
+
+    Returns:
+        List[str]: Names of the squashed branches.
+    """
+    if not branch_tips:
+        return []
+    tips = sorted(set(branch_tips.values()))
+    if graph is None:
+        graph = BranchGraph(directory, tips, main_branch)
+    if strategy == MERGE_TREE_STRATEGY:
+        return find_squashed_branches_merge_tree(directory, branch_tips, main_branch, graph)
+
+    walks = {}
+    for tip in tips:
+        walked = graph.walk(tip)
+        if walked is not None and walked[1] is not None:
+            walks[tip] = walked
+    if not walks:
+        return []
+
+    # one diff per branch: merge base -> tip, as a squash merge would produce
+    squash_patch_ids = patch_ids(
+        directory,
+        DIFF_TREE_CMD,
+        [f"{tip} {merge_base}" for tip, (_, merge_base) in walks.items()],
+    )
+    branch_commits = sorted(set().union(*(commits for commits, _ in walks.values())))
+    commit_patch_ids = patch_ids(directory, DIFF_TREE_CMD, branch_commits)
+    main_patch_ids = PatchIdIndex(directory, main_branch).update()
+    logger.debug(
+        f"[squash_detection] {len(walks)} tips, {len(branch_commits)} commits, "
+        f"{len(main_patch_ids.patch_ids)} main patches"
+    )
+
+    squashed_tips = set()
+    for tip, (commits, _) in walks.items():
+        # an empty diff means main already contains everything the branch changes
+        if tip not in squash_patch_ids or squash_patch_ids[tip] in main_patch_ids:
+            squashed_tips.add(tip)
+            continue
+        commit_ids = [commit_patch_ids.get(commit) for commit in commits]
+        commit_ids = [patch_id for patch_id in commit_ids if patch_id is not None]
+        if commit_ids and all(patch_id in main_patch_ids for patch_id in commit_ids):
+            squashed_tips.add(tip)
+
+    return [name for name, tip in branch_tips.items() if tip in squashed_tips]
+
+
+def _parse_merge_tree_stream(output: str) -> List[tuple]:
+    """Split `git merge-tree --stdin --no-messages` output into (clean, tree) per input line."""
+    results = []
+    fields = output.split("\0")
+    i = 0
+    while i + 1 < len(fields):
+        clean, tree = fields[i] == "1", fields[i + 1]
+        i += 2
+        # conflicted paths follow a dirty merge; an empty field ends the record
+        while i < len(fields) and fields[i] != "":
+            i += 1
+        i += 1
+        results.append((clean, tree))
+    return results
+
+
+def _merge_trees_batched(directory: str, pairs: List[str]) -> Optional[List[tuple]]:
+    # run() multiplexes stdin, stdout and stderr: a batch with many conflict messages
+    # cannot fill the stderr pipe while we wait on stdout
+    process = subprocess.run(
+        ["git", "merge-tree", "--write-tree", "--no-messages", "--name-only", "--stdin"],
+        cwd=directory,
+        input="".join(f"{pair}\n" for pair in pairs),
+        text=True,
+        capture_output=True,
+    )
+    if process.returncode != 0:
+        # git < 2.40 has no --stdin; the caller falls back to one process per branch
+        logger.debug(f"[squash_detection] merge-tree --stdin unavailable: {process.stderr.strip()}")
+        return None
+    return _parse_merge_tree_stream(process.stdout)
+
+
+def _merge_tree_single(directory: str, pair: str) -> tuple:
+    main_sha, tip = pair.split(" ")
+    result = subprocess.run(
+        ["git", "merge-tree", "--write-tree", "--no-messages", main_sha, tip],
+        cwd=directory,
+        text=True,
+        capture_output=True,
+    )
+    tree = result.stdout.split("\n", 1)[0].strip()
+    return result.returncode == 0, tree
+
+
+def find_squashed_branches_merge_tree(
+    directory: str,
+    branch_tips: Dict[str, str],
+    main_branch: str,
+    graph: Optional[BranchGraph] = None,
+) -> List[str]:
+    """
+    Detect squashed branches by checking whether merging them into main changes main's tree.
+
+    Unlike patch-id matching this also catches branches whose commits were squashed
+    together with other changes or edited during the merge, as long as main now
+    contains everything the branch changes. All candidates go through a single
+    long-lived `git merge-tree --write-tree --stdin` process.
+
+    Parameters:
+        directory (str): The repository directory.
+        branch_tips (Dict[str, str]): Candidate branch name to tip sha.
+        main_branch (str): The main branch as a full ref name (refs/heads/main) or sha.
+        graph (Optional[BranchGraph]): An already walked graph of the candidates.
+
+    Returns:
+        List[str]: Names of the squashed branches.
+    """
+    if not branch_tips:
+        return []
+    tips = sorted(set(branch_tips.values()))
+    if graph is None:
+        graph = BranchGraph(directory, tips, main_branch)
+    # tips reachable from main are merged, not squashed
+    tips = [tip for tip in tips if tip in graph.parents]
+    if not tips:
+        return []
+    session = get_session(directory)
+    main_sha = session.resolve(f"{main_branch}^{{commit}}")
+    main_tree = session.resolve(f"{main_branch}^{{tree}}")
+
+    pairs = [f"{main_sha} {tip}" for tip in tips]
+    results = _merge_trees_batched(directory, pairs)
+    if results is None or len(results) != len(pairs):
+        results = [_merge_tree_single(directory, pair) for pair in pairs]
+
+    squashed_tips = {
+        tip for tip, (clean, tree) in zip(tips, results) if clean and tree == main_tree
+    }
+    return [name for name, tip in branch_tips.items() if tip in squashed_tips]
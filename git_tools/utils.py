@@ -1,8 +1,6 @@
 import subprocess
 from typing import List
 
-from InquirerPy import inquirer
-
 from logger.logger import Logger, LogLevel
 
 logger = Logger("utils", LogLevel.WARNING).logger_jl
@@ -37,6 +35,9 @@ def prompt_fzf_directory(dir_choices, root_dir, default_choice="") -> str:
     if len(dir_choices) == 1 and dir_choices[0].name == root_dir:
         return ""
 
+    # InquirerPy is slow to import, so only load it when a prompt is shown
+    from InquirerPy import inquirer
+
     # Use inquirer to let the user select a branch
     directory: str = inquirer.fuzzy(
         message="Select a directory", choices=dir_choices, default=default_choice
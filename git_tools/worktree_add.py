@@ -0,0 +1,78 @@
+import os
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+from logger.logger import Logger, LogLevel
+
+logger = Logger("worktree_add", LogLevel.INFO).logger_jl
+
+# parallel checkout workers (git's checkout.workers); git only uses them for
+# checkouts of at least checkout.thresholdForParallelism (100) files
+CHECKOUT_WORKERS = os.cpu_count() or 1
+
+
+def _timed(timings: Dict[str, float], phase: str, cmd: List[str], cwd: str):
+    start = time.perf_counter()
+    subprocess.check_output(cmd, cwd=cwd, stderr=subprocess.STDOUT, text=True)
+    timings[phase] = time.perf_counter() - start
+
+
+def add_worktree(
+    git_dir: str,
+    worktree: str,
+    branch_name: str,
+    sparse_paths: Optional[List[str]] = None,
+    parallel: bool = True,
+) -> Dict[str, float]:
+    """
+    Add a worktree for branch_name, populating it with parallel checkout workers.
+
+    The worktree is created with --no-checkout (only refs and admin files), then its
+    files are written by `reset --hard` (inside the cone, for a sparse worktree)
+    with checkout.workers sized to the machine, and the post-checkout hook is run as
+    `git worktree add` would. Each phase is timed and logged; parallel=False runs the
+    plain single `git worktree add` for comparison.
+
+    Parameters:
+        git_dir (str): Any directory of the repository.
+        worktree (str): Path of the new worktree.
+        branch_name (str): Branch to check out (a remote-only branch gets a local one).
+        sparse_paths (Optional[List[str]]): Cone-mode paths to limit the checkout to.
+        parallel (bool): Use the --no-checkout + parallel checkout fast path.
+
+    Returns:
+        Dict[str, float]: Seconds per phase.
+
+    Raises:
+        subprocess.CalledProcessError: If a git command fails (output holds its message).
+    """
+    timings: Dict[str, float] = {}
+    if not parallel and sparse_paths is None:
+        _timed(timings, "worktree add", ["git", "worktree", "add", worktree, branch_name], git_dir)
+    else:
+        _timed(
+            timings,
+            "worktree add --no-checkout",
+            ["git", "worktree", "add", "--no-checkout", worktree, branch_name],
+            git_dir,
+        )
+        workers = CHECKOUT_WORKERS if parallel else 1
+        if sparse_paths is not None:
+            # the index is still empty, so this only records the cone
+            cmd = ["git", "sparse-checkout", "set", "--cone", *sparse_paths]
+            _timed(timings, "sparse-checkout set", cmd, worktree)
+        cmd = ["git", "-c", f"checkout.workers={workers}", "reset", "--hard", "--quiet", "HEAD"]
+        _timed(timings, f"checkout ({workers} workers)", cmd, worktree)
+        # --no-checkout skips the post-checkout hook (husky, git lfs); run it the way
+        # `git worktree add` does: null old HEAD, new HEAD, branch checkout flag 1
+        head = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=worktree, text=True
+        ).strip()
+        hook_args = ["0" * len(head), head, "1"]
+        cmd = ["git", "hook", "run", "--ignore-missing", "post-checkout", "--", *hook_args]
+        _timed(timings, "post-checkout hook", cmd, worktree)
+
+    phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items())
+    logger.info(f"[worktree_add] {worktree}: {phases}, total {sum(timings.values()):.2f}s")
+    return timings
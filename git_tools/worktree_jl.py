@@ -1,11 +1,14 @@
 import subprocess
 from dataclasses import dataclass, field
-from typing import List
-
-from InquirerPy.base.control import Choice
+from typing import TYPE_CHECKING, Dict, Iterator, List
 
 from branch_info_jl import BranchInfoJL, get_branch_info
-from utils import run_command
+from daemon_client import query
+from git_tool_constants import SPARE_LOCK_REASON
+from porcelain import iter_worktrees
+
+if TYPE_CHECKING:
+    from InquirerPy.base.control import Choice
 
 
 @dataclass
@@ -33,6 +36,25 @@ class WorkTreeJL:
         self.name = parts[2]
         self.__post_init__()
 
+    @classmethod
+    def from_porcelain(cls, record: Dict[str, str]) -> "WorkTreeJL":
+        """
+        Build a worktree from an iter_worktrees() record.
+
+        Parameters:
+            record (Dict[str, str]): Attributes of one `git worktree list --porcelain` entry.
+
+        Returns:
+            WorkTreeJL: The worktree, named like the `git worktree list` bracket column.
+        """
+        if "branch" in record:
+            name = record["branch"].removeprefix("refs/heads/")
+        elif "bare" in record:
+            name = "(bare)"
+        else:
+            name = "(detached HEAD)"
+        return cls(path=record["worktree"], commit_hash=record.get("HEAD", ""), name=name)
+
     def __post_init__(self):
         self.path = self.path.strip()
         self.short_path = self.path.replace("/Users/joe/Projects/nl-worktrees",
@@ -74,15 +96,22 @@ def format_worktree_names(worktrees: List[WorkTreeJL]):
     worktrees.sort(key=lambda worktree: worktree.age_number)
 
 
+def iter_working_trees(directory) -> Iterator[WorkTreeJL]:
+    """Yield working trees as `git worktree list --porcelain -z` reports them."""
+    # a running daemon already has the list; otherwise stream it from git
+    records = query("worktrees", directory)
+    if records is None:
+        records = iter_worktrees(directory)
+    for record in records:
+        # pooled spares (see spare_worktrees) are not worktrees anyone works in yet
+        if record.get("locked") == SPARE_LOCK_REASON:
+            continue
+        yield WorkTreeJL.from_porcelain(record)
+
+
 def list_working_trees(directory) -> List[WorkTreeJL]:
     """Return a list of working trees."""
-    output = run_command(f'cd {directory} && git worktree list')
-
-    worktrees_jl = []
-    for line in output.splitlines():
-        worktree = WorkTreeJL(path='', commit_hash='', name='')
-        worktree.parse(line)
-        worktrees_jl.append(worktree)
+    worktrees_jl = list(iter_working_trees(directory))
     # Sort worktrees by long_name
     worktrees_jl.sort(key=lambda worktree: worktree.long_name)
 
@@ -107,6 +136,8 @@ def create_choices_for_worktrees(directory):
                 print(f'[worktree_jl] No branch info for {worktree}')
         format_worktree_names(worktrees)
 
+        from InquirerPy.base.control import Choice
+
         # Create choices list
         choices = [
             Choice(value=worktree.path, name=worktree.long_name)
@@ -116,3 +147,22 @@ def create_choices_for_worktrees(directory):
     except subprocess.CalledProcessError:
         print("[worktree_jl] Error: Failed to get git worktrees.")
         return []
+
+
+def iter_choices_for_worktrees(directory) -> Iterator["Choice"]:
+    """
+    Yield a Choice per worktree as soon as git lists it (for streaming pickers).
+
+    Unlike create_choices_for_worktrees the names are not padded or sorted, since
+    that needs every worktree up front.
+    """
+    from InquirerPy.base.control import Choice
+
+    branch_name_to_branch_info = {
+        branch_info_jl.name: branch_info_jl
+        for branch_info_jl in get_branch_info(directory, merged_to_main=False)
+    }
+    for worktree in iter_working_trees(directory):
+        if worktree.name in branch_name_to_branch_info:
+            worktree.update_name(branch_name_to_branch_info[worktree.name])
+        yield Choice(value=worktree.path, name=worktree.long_name)
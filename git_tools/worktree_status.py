@@ -0,0 +1,257 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from daemon_client import query
+from git_paths import file_lock, resolve_git_dirs, tool_cache_dir, write_json_atomic
+from logger.logger import Logger, LogLevel
+from porcelain import iter_refs, iter_worktrees
+from ref_store import RefStore
+
+logger = Logger("worktree_status", LogLevel.WARNING).logger_jl
+
+STATUS_CACHE_VERSION = 2
+# each worker only waits on its own git processes, so a small bound is enough
+MAX_STATUS_WORKERS = min(8, os.cpu_count() or 1)
+
+
+@dataclass
+class WorktreeStatus:
+    path: str
+    branch: str
+    dirty: int
+    ahead: Optional[int]
+    behind: Optional[int]
+    commit_time: int
+    locked: Optional[str] = None
+    prunable: Optional[str] = None
+
+    @property
+    def age_number(self) -> int:
+        """Days since the last commit on HEAD"""
+        return int((time.time() - self.commit_time) // 86400) if self.commit_time else 0
+
+    @property
+    def ahead_behind(self) -> str:
+        if self.ahead is None:
+            return "-"
+        return f"+{self.ahead} -{self.behind}"
+
+    @property
+    def state(self) -> str:
+        states = []
+        if self.locked is not None:
+            states.append(f"locked {self.locked}".strip())
+        if self.prunable is not None:
+            states.append(f"prunable {self.prunable}".strip())
+        return ", ".join(states)
+
+
+def _count_entries(output: bytes) -> int:
+    """Number of changed paths in `git status --porcelain=v2 -z` output."""
+    dirty = 0
+    fields = iter(output.split(b"\0"))
+    for field in fields:
+        if not field or field.startswith(b"#"):
+            continue
+        dirty += 1
+        # renames and copies carry the original path as an extra field
+        if field.startswith(b"2 "):
+            next(fields, None)
+    return dirty
+
+
+def _dirty_count(path: str) -> int:
+    """
+    Changed tracked files, staged or not; computed on every run, never cached.
+
+    Untracked files are not scanned (-uno), which is what keeps this cheap enough
+    to run for every worktree each time.
+    """
+    output = subprocess.check_output(
+        ["git", "status", "--porcelain=v2", "-z", "--untracked-files=no"],
+        cwd=path,
+        stderr=subprocess.DEVNULL,
+    )
+    return _count_entries(output)
+
+
+def _compute_history(path: str, head: str, upstream_sha: Optional[str]) -> dict:
+    """The cacheable part of a worktree's status: ahead/behind its upstream and commit time."""
+    ahead = behind = None
+    if head and upstream_sha:
+        counts = subprocess.check_output(
+            ["git", "rev-list", "--left-right", "--count", f"{head}...{upstream_sha}"],
+            cwd=path,
+            text=True,
+        ).split()
+        ahead, behind = int(counts[0]), int(counts[1])
+    commit_time = 0
+    if head:
+        commit_time = int(
+            subprocess.check_output(
+                ["git", "show", "-s", "--format=%ct", head], cwd=path, text=True
+            ).strip()
+            or 0
+        )
+    return {"ahead": ahead, "behind": behind, "commit_time": commit_time}
+
+
+def _upstream_shas(directory: str) -> Dict[str, Optional[str]]:
+    """refs/heads/<branch> -> sha of its upstream, from one for-each-ref."""
+    ref_store = RefStore(directory)
+    return {
+        refname: ref_store.read_ref(upstream) if upstream else None
+        for refname, upstream in iter_refs(directory, ["refname", "upstream"], ["refs/heads"])
+    }
+
+
+class _StatusCache:
+    """worktree path -> {"key": [HEAD, upstream sha], "status": ...}, next to the branch cache."""
+
+    def __init__(self, directory: str):
+        git_dirs = resolve_git_dirs(directory)
+        cache_dir = tool_cache_dir(git_dirs.common_dir if git_dirs else directory)
+        self.cache_file = os.path.join(cache_dir, "worktree_status.json")
+        self.lock_file = os.path.join(cache_dir, "worktree_status.lock")
+        self.entries: Dict[str, dict] = {}
+
+    def load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("version") == STATUS_CACHE_VERSION:
+            self.entries = stored.get("worktrees", {})
+
+    def get(self, path: str, key: list) -> Optional[dict]:
+        entry = self.entries.get(path)
+        if entry is None or entry.get("key") != key:
+            return None
+        return entry["status"]
+
+    def save(self, entries: Dict[str, dict]):
+        with file_lock(self.lock_file):
+            write_json_atomic(
+                self.cache_file, {"version": STATUS_CACHE_VERSION, "worktrees": entries}
+            )
+
+
+def get_worktree_statuses(directory: str, use_cache: bool = True) -> List[WorktreeStatus]:
+    """
+    Worktree statuses from a running git_tools_daemon, or computed here if there is none.
+
+    See compute_worktree_statuses() for what is collected and how it is cached.
+    """
+    rows = query("status", directory, use_cache=use_cache)
+    if rows is None:
+        return compute_worktree_statuses(directory, use_cache)
+    return [WorktreeStatus(**row) for row in rows]
+
+
+def compute_worktree_statuses(directory: str, use_cache: bool = True) -> List[WorktreeStatus]:
+    """
+    Collect dirty count, ahead/behind, last commit time and lock/prunable state per worktree.
+
+    The dirty count (tracked files only) is read on every call. Ahead/behind and the
+    commit time only change with HEAD or the upstream tip, so they are cached under
+    those and recomputed when either moves. The git processes run concurrently, at
+    most MAX_STATUS_WORKERS at a time.
+
+    Parameters:
+        directory (str): Any directory inside the repository.
+        use_cache (bool): Reuse cached ahead/behind counts whose key still matches.
+
+    Returns:
+        List[WorktreeStatus]: One entry per worktree, in `git worktree list` order.
+    """
+    records = list(iter_worktrees(directory))
+    upstreams = _upstream_shas(directory)
+    cache = _StatusCache(directory)
+    if use_cache:
+        cache.load()
+
+    keys: Dict[str, list] = {}
+    histories: Dict[str, dict] = {}
+    pending = []
+    for record in records:
+        path = record["worktree"]
+        if "bare" in record or "prunable" in record:
+            continue
+        head = record.get("HEAD", "")
+        keys[path] = [head, upstreams.get(record.get("branch"))]
+        history = cache.get(path, keys[path])
+        if history is None:
+            pending.append(record)
+        else:
+            histories[path] = history
+
+    logger.debug(f"[worktree_status] {len(histories)} cached, {len(pending)} to refresh")
+    dirty: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=MAX_STATUS_WORKERS) as executor:
+        dirty_futures = {path: executor.submit(_dirty_count, path) for path in keys}
+        history_futures = {
+            record["worktree"]: executor.submit(
+                _compute_history, record["worktree"], *keys[record["worktree"]]
+            )
+            for record in pending
+        }
+    for path, future in dirty_futures.items():
+        try:
+            dirty[path] = future.result()
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning(f"[worktree_status] cannot read status of {path}: {e}")
+    for path, future in history_futures.items():
+        try:
+            histories[path] = future.result()
+        except (subprocess.CalledProcessError, OSError, ValueError) as e:
+            logger.warning(f"[worktree_status] cannot read history of {path}: {e}")
+    if pending:
+        cache.save(
+            {path: {"key": keys[path], "status": history} for path, history in histories.items()}
+        )
+
+    statuses = []
+    for record in records:
+        path = record["worktree"]
+        if "bare" in record:
+            continue
+        status = histories.get(path, {"ahead": None, "behind": None, "commit_time": 0})
+        branch = record.get("branch", "").removeprefix("refs/heads/") or "(detached HEAD)"
+        statuses.append(
+            WorktreeStatus(
+                path=path,
+                branch=branch,
+                locked=record.get("locked"),
+                prunable=record.get("prunable"),
+                dirty=dirty.get(path, 0),
+                **status,
+            )
+        )
+    return statuses
+
+
+def format_status_table(statuses: List[WorktreeStatus]) -> str:
+    """Render statuses as aligned columns: branch, dirty, ahead/behind, age, state, path."""
+    header = ["branch", "dirty", "ahead/behind", "age", "state", "path"]
+    rows = [
+        [
+            status.branch,
+            str(status.dirty),
+            status.ahead_behind,
+            f"{status.age_number} days old" if status.commit_time else "-",
+            status.state,
+            status.path,
+        ]
+        for status in statuses
+    ]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in [header] + rows
+    )
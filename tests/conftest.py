@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# the git_tools modules import each other as top-level modules (see pyrightconfig.json)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "git_tools"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_git(tmp_path, monkeypatch):
+    """Run git with a fixed identity and without the user's global/system config."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(home / ".config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(home / ".cache"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.setenv("GIT_TOOLS_NO_DAEMON", "1")
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{role}_NAME", "Test User")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "test@example.com")
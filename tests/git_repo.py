@@ -0,0 +1,24 @@
+import subprocess
+from pathlib import Path
+
+
+def git(cwd: Path, *args: str) -> str:
+    return subprocess.check_output(
+        ["git", *args], cwd=cwd, text=True, stderr=subprocess.PIPE
+    ).strip()
+
+
+def init_repo(path: Path) -> Path:
+    """A repository on branch main with one commit."""
+    path.mkdir(parents=True)
+    git(path, "init", "--quiet", "--initial-branch=main")
+    commit(path, "initial")
+    return path
+
+
+def commit(path: Path, message: str, filename: str = "file.txt") -> str:
+    with open(path / filename, "a", encoding="utf-8") as f:
+        f.write(f"{message}\n")
+    git(path, "add", filename)
+    git(path, "commit", "--quiet", "-m", message)
+    return git(path, "rev-parse", "HEAD")
@@ -0,0 +1,74 @@
+import pytest
+
+from branch_cleanup import (MainBranchNotFound, RepoSnapshot, get_merged_branches,
+                            get_squashed_branches)
+from tests.git_repo import commit, git, init_repo
+
+
+@pytest.fixture
+def clone(tmp_path):
+    """A clone whose origin has "feature" squash-merged into main."""
+    seed = init_repo(tmp_path / "seed")
+    git(seed, "switch", "--quiet", "-c", "feature")
+    commit(seed, "feature work", "feature.txt")
+    git(seed, "switch", "--quiet", "main")
+    git(seed, "merge", "--quiet", "--squash", "feature")
+    git(seed, "commit", "--quiet", "-m", "Squashed feature")
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "clone", "--quiet", "--bare", str(seed), str(remote))
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "--quiet", str(remote), str(clone))
+    return clone
+
+
+def test_squashed_remote_branch_is_found(clone):
+    assert get_squashed_branches(str(clone)) == ["feature"]
+
+
+def test_local_tip_wins_over_origin(clone):
+    git(clone, "switch", "--quiet", "feature")
+    local_tip = commit(clone, "more work after the squash", "feature.txt")
+    git(clone, "switch", "--quiet", "main")
+
+    snapshot = RepoSnapshot(str(clone))
+
+    assert snapshot.branch_tips["feature"] == local_tip
+    # the local branch has work that is not on main, even though origin/feature was squashed
+    assert get_squashed_branches(str(clone), snapshot=snapshot) == []
+
+
+def test_main_from_origin_head_without_a_local_main(clone):
+    git(clone, "switch", "--quiet", "-c", "done", "origin/main")
+    git(clone, "branch", "--quiet", "-D", "main")
+
+    snapshot = RepoSnapshot(str(clone))
+
+    assert snapshot.main_branch == "main"
+    assert snapshot.main_ref == "refs/remotes/origin/main"
+    assert get_merged_branches(str(clone), snapshot) == ["done"]
+    assert get_squashed_branches(str(clone), snapshot=snapshot) == ["feature"]
+
+
+def test_unresolvable_main_is_reported(clone):
+    git(clone, "switch", "--quiet", "-c", "work")
+    git(clone, "branch", "--quiet", "-D", "main")
+    git(clone, "symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/gone")
+
+    with pytest.raises(MainBranchNotFound):
+        get_merged_branches(str(clone))
+    with pytest.raises(MainBranchNotFound):
+        get_squashed_branches(str(clone))
+
+
+def test_cherry_picked_rename_is_squashed(tmp_path):
+    repo = init_repo(tmp_path / "repo")
+    commit(repo, "content\n" * 20, "old_name.txt")
+    git(repo, "switch", "--quiet", "-c", "rename")
+    git(repo, "mv", "old_name.txt", "new_name.txt")
+    git(repo, "commit", "--quiet", "-m", "Rename")
+    git(repo, "switch", "--quiet", "main")
+    commit(repo, "unrelated work on main")
+    git(repo, "cherry-pick", "rename")
+
+    # main's patch ids must be hashed without rename detection, like the branch's
+    assert get_squashed_branches(str(repo)) == ["rename"]
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+from branch_delete import (CHECKED_OUT, DELETED, FAILED, MISSING, NOT_MERGED,
+                           delete_refs_transaction, delete_remote_branches,
+                           summarize_branch_results)
+from tests.git_repo import commit, git, init_repo
+
+PROTECTED = "protected"
+
+
+@pytest.fixture
+def clone(tmp_path):
+    """A clone of a local bare remote that has branches one, two and protected."""
+    work = init_repo(tmp_path / "seed")
+    for branch in ("one", "two", PROTECTED):
+        git(work, "branch", branch)
+    remote = tmp_path / "remote.git"
+    git(tmp_path, "clone", "--quiet", "--bare", str(work), str(remote))
+    # the remote refuses to delete "protected"
+    hook = remote / "hooks" / "update"
+    hook.write_text(f'#!/bin/sh\n[ "$1" = refs/heads/{PROTECTED} ] && exit 1\nexit 0\n')
+    os.chmod(hook, 0o755)
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "--quiet", str(remote), str(clone))
+    return clone
+
+
+def remote_heads(clone):
+    output = git(clone, "ls-remote", "--heads", "origin")
+    return {line.split("\t")[1].removeprefix("refs/heads/") for line in output.splitlines()}
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_delete_remote_branches_reports_deleted_and_missing(clone, atomic):
+    results = delete_remote_branches(str(clone), ["one", "two", "gone"], atomic=atomic)
+
+    assert results == {"one": DELETED, "two": DELETED, "gone": MISSING}
+    assert remote_heads(clone) == {"main", PROTECTED}
+
+
+def test_delete_remote_branches_reports_each_rejection(clone):
+    results = delete_remote_branches(str(clone), ["one", PROTECTED])
+
+    assert results == {"one": DELETED, PROTECTED: FAILED}
+    assert remote_heads(clone) == {"main", "two", PROTECTED}
+
+
+def test_atomic_delete_remote_branches_fails_as_a_whole(clone):
+    results = delete_remote_branches(str(clone), ["one", PROTECTED, "gone"], atomic=True)
+
+    assert results == {"one": FAILED, PROTECTED: FAILED, "gone": MISSING}
+    assert remote_heads(clone) == {"main", "one", "two", PROTECTED}
+
+
+def test_unreachable_remote_fails_every_branch(clone, tmp_path):
+    git(clone, "remote", "set-url", "origin", str(tmp_path / "offline.git"))
+
+    results = delete_remote_branches(str(clone), ["one", "two"])
+
+    assert results == {"one": FAILED, "two": FAILED}
+
+
+def test_delete_refs_transaction_deletes_branches_tracking_refs_and_config(clone):
+    for branch in ("one", "two"):
+        git(clone, "branch", "--track", branch, f"origin/{branch}")
+
+    results = delete_refs_transaction(str(clone), ["one", "two", "gone"])
+
+    assert results == {
+        "refs/heads/one": DELETED,
+        "refs/remotes/origin/one": DELETED,
+        "refs/heads/two": DELETED,
+        "refs/remotes/origin/two": DELETED,
+        "refs/heads/gone": MISSING,
+        "refs/remotes/origin/gone": MISSING,
+    }
+    assert git(clone, "branch", "--list", "one", "two") == ""
+    assert git(clone, "for-each-ref", "refs/remotes/origin/one", "refs/remotes/origin/two") == ""
+    # the [branch "one"] section is removed along with the branch
+    config = git(clone, "config", "--list", "--local")
+    assert "branch.one." not in config and "branch.two." not in config
+    assert summarize_branch_results(["one", "two", "gone"], results) == {
+        "one": DELETED,
+        "two": DELETED,
+        "gone": MISSING,
+    }
+
+
+def test_delete_refs_transaction_keeps_checked_out_branches(clone, tmp_path):
+    git(clone, "worktree", "add", "--quiet", "-b", "one", str(tmp_path / "wt-one"), "origin/one")
+
+    results = delete_refs_transaction(str(clone), ["one"])
+
+    assert results == {"refs/heads/one": CHECKED_OUT}
+    assert git(clone, "branch", "--list", "one") != ""
+    # the kept branch keeps its upstream
+    assert git(clone, "rev-parse", "--abbrev-ref", "one@{upstream}") == "origin/one"
+
+
+def test_delete_refs_transaction_keeps_unmerged_branches_unless_forced(clone):
+    git(clone, "switch", "--quiet", "-c", "feature")
+    commit(clone, "unmerged work")
+    git(clone, "switch", "--quiet", "main")
+    git(clone, "branch", "merged")
+
+    git(clone, "update-ref", "refs/remotes/origin/feature", "feature")
+    results = delete_refs_transaction(str(clone), ["feature", "merged"])
+
+    assert results["refs/heads/feature"] == NOT_MERGED
+    assert "refs/remotes/origin/feature" not in results
+    assert git(clone, "rev-parse", "origin/feature") == git(clone, "rev-parse", "feature")
+    assert results["refs/heads/merged"] == DELETED
+    assert summarize_branch_results(["feature"], results) == {"feature": NOT_MERGED}
+
+    results = delete_refs_transaction(str(clone), ["feature"], force=True)
+
+    assert results["refs/heads/feature"] == DELETED
+    assert results["refs/remotes/origin/feature"] == DELETED
+
+
+def test_delete_refs_transaction_reports_each_ref_when_the_transaction_aborts(clone):
+    for branch in ("one", "two"):
+        git(clone, "branch", branch, f"origin/{branch}")
+    # a stale lock on one ref makes the single transaction fail
+    (clone / ".git" / "refs" / "heads" / "two.lock").write_text("")
+
+    results = delete_refs_transaction(str(clone), ["one", "two"])
+
+    assert results["refs/heads/one"] == DELETED
+    assert results["refs/heads/two"] == FAILED
+    assert results["refs/remotes/origin/one"] == DELETED
+    assert results["refs/remotes/origin/two"] == DELETED
+    assert git(clone, "branch", "--list", "two") != ""
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from build_graph import (DONE, FAILED, PENDING, SKIPPED, BuildFailed, BuildStep,
+                         run_build_graph)
+
+
+def recorder():
+    """A list of finished step names and a factory of steps appending to it."""
+    order = []
+    lock = threading.Lock()
+
+    def step(name, after=(), run=None):
+        def record():
+            if run is not None:
+                run()
+            with lock:
+                order.append(name)
+
+        return BuildStep(name, record, list(after))
+
+    return order, step
+
+
+def test_steps_run_after_their_dependencies():
+    order, step = recorder()
+    steps = [
+        step("link", after=["install"]),
+        step("install"),
+        step("codegen", after=["install"]),
+        step("editor", after=["link", "codegen"]),
+    ]
+
+    assert run_build_graph("Test Build", steps) is steps
+
+    assert order[0] == "install" and order[-1] == "editor"
+    assert all(s.state == DONE and s.seconds is not None for s in steps)
+
+
+def test_first_failure_stops_new_steps():
+    order, step = recorder()
+
+    def fail():
+        raise RuntimeError("install exploded")
+
+    failing = step("install", run=fail)
+
+    def outlive_the_failure():
+        # still running when the failure is seen: it finishes, its dependents do not start
+        while failing.state != FAILED:
+            time.sleep(0.01)
+
+    steps = [
+        failing,
+        step("slow", run=outlive_the_failure),
+        step("after slow", after=["slow"]),
+        step("after install", after=["install"]),
+    ]
+
+    with pytest.raises(BuildFailed) as raised:
+        run_build_graph("Test Build", steps)
+
+    assert str(raised.value) == "Test Build: install failed; skipped after slow, after install"
+    assert [s.state for s in steps] == [FAILED, DONE, SKIPPED, SKIPPED]
+    assert failing.error == "install exploded"
+    assert order == ["slow"]
+
+
+@pytest.mark.parametrize(
+    "steps, message",
+    [
+        ([BuildStep("a", print), BuildStep("a", print)], "duplicate"),
+        ([BuildStep("a", print, ["missing"])], "unknown step 'missing'"),
+        (
+            [
+                BuildStep("a", print, ["c"]),
+                BuildStep("b", print, ["a"]),
+                BuildStep("c", print, ["b"]),
+            ],
+            "cycle",
+        ),
+    ],
+)
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        run_build_graph("Test Build", steps)
+    # nothing ran
+    assert all(s.state == PENDING for s in steps)
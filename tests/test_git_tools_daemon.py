@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+import pytest
+
+import git_tools_daemon
+from daemon_client import NO_DAEMON_ENV, query, send_request
+from git_tools_daemon import GitToolsDaemon, _Server
+from tests.git_repo import commit, git, init_repo
+
+
+def wait_for(predicate, timeout=5.0):
+    """Poll predicate until it holds: the inotify watcher applies changes asynchronously."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    """A daemon serving in this process on a private XDG_RUNTIME_DIR socket."""
+    runtime_dir = tmp_path / "runtime"
+    runtime_dir.mkdir(mode=0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(runtime_dir))
+    monkeypatch.setattr(git_tools_daemon, "start_background_prefetch", lambda directory: False)
+    socket_path = git_tools_daemon.daemon_socket_path()
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(socket_path, GitToolsDaemon())
+    finally:
+        os.umask(old_umask)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def branch_names(repo):
+    records = send_request({"op": "branches", "directory": str(repo)})
+    return {record[1] for record in records}
+
+
+def test_daemon_answers_and_follows_ref_changes(daemon, tmp_path):
+    repo = init_repo(tmp_path / "repo")
+    git(repo, "branch", "topic")
+
+    assert send_request({"op": "ping"})["pid"] == os.getpid()
+    names = branch_names(repo)
+    assert any(name.endswith("topic") for name in names)
+    [worktree] = send_request({"op": "worktrees", "directory": str(repo)})
+    assert worktree["branch"] == "refs/heads/main"
+
+    git(repo, "branch", "-D", "topic")
+    git(repo, "switch", "--quiet", "-c", "feature")
+    head = commit(repo, "feature work")
+
+    assert wait_for(lambda: not any(name.endswith("topic") for name in branch_names(repo)))
+    assert wait_for(
+        lambda: send_request({"op": "worktrees", "directory": str(repo)})
+        == [{"worktree": str(repo), "HEAD": head, "branch": "refs/heads/feature"}]
+    )
+
+
+def test_query_falls_back_to_direct_mode(daemon, tmp_path, monkeypatch):
+    repo = init_repo(tmp_path / "repo")
+
+    # GIT_TOOLS_NO_DAEMON (set for every test) keeps queries away from the daemon
+    assert os.environ.get(NO_DAEMON_ENV)
+    assert query("worktrees", str(repo)) is None
+
+    monkeypatch.delenv(NO_DAEMON_ENV)
+    assert query("worktrees", str(repo))[0]["branch"] == "refs/heads/main"
+
+    daemon.shutdown()
+    daemon.server_close()
+    os.unlink(git_tools_daemon.daemon_socket_path())
+    assert query("worktrees", str(repo)) is None
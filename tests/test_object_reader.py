@@ -0,0 +1,110 @@
+import subprocess
+
+import pytest
+
+from object_reader import OBJ_OFS_DELTA, OBJ_REF_DELTA, ObjectReader, UnsupportedRepository
+from tests.git_repo import commit, git, init_repo
+
+
+def cat_file(repo, sha):
+    """(type, content) of an object as git itself reads it."""
+    obj_type = git(repo, "cat-file", "-t", sha)
+    content = subprocess.check_output(["git", "cat-file", obj_type, sha], cwd=repo)
+    return obj_type, content
+
+
+def all_objects(repo):
+    output = git(repo, "cat-file", "--batch-all-objects", "--batch-check=%(objectname)")
+    return output.split()
+
+
+def packed_type(reader, sha):
+    """The raw pack entry type of sha, e.g. OBJ_OFS_DELTA; None if it is not packed."""
+    for pack in reader.packs:
+        offset = pack.find(bytes.fromhex(sha))
+        if offset is not None:
+            return (pack.pack[offset] >> 4) & 7
+    return None
+
+
+def assert_commit_matches(repo, reader, sha):
+    fields = "%x00".join(["%T", "%P", "%an", "%at", "%cn", "%ct", "%cd"])
+    tree, parents, author, author_time, committer, committer_time, tz = git(
+        repo, "log", "-1", "--date=format:%z", f"--format={fields}", sha
+    ).split("\0")
+    info = reader.read_commit(sha)
+    assert info.sha == sha
+    assert info.tree == tree
+    assert info.parents == parents.split()
+    assert (info.author, info.author_time) == (author, int(author_time))
+    assert (info.committer, info.committer_time, info.committer_tz) == (
+        committer,
+        int(committer_time),
+        tz,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A history where one growing file gives the packer plenty of delta candidates."""
+    repo = init_repo(tmp_path / "repo")
+    for i in range(30):
+        commit(repo, f"line {i} " + "x" * 200, "big.txt")
+    git(repo, "tag", "-a", "v1", "-m", "annotated")
+    return repo
+
+
+def test_reads_loose_objects(repo):
+    head = git(repo, "rev-parse", "HEAD")
+    assert (repo / ".git" / "objects" / head[:2] / head[2:]).is_file()
+    reader = ObjectReader(str(repo))
+
+    for sha in all_objects(repo):
+        assert reader.read_object(sha) == cat_file(repo, sha)
+    assert_commit_matches(repo, reader, head)
+    # an annotated tag is peeled to its commit
+    assert reader.read_commit(git(repo, "rev-parse", "v1")).sha == head
+
+
+@pytest.mark.parametrize(
+    "use_offsets, delta_type", [("true", OBJ_OFS_DELTA), ("false", OBJ_REF_DELTA)]
+)
+def test_reads_deltified_packs(repo, use_offsets, delta_type):
+    git(repo, "-c", f"repack.useDeltaBaseOffset={use_offsets}", "repack", "-adf", "--quiet")
+    git(repo, "prune-packed")
+    reader = ObjectReader(str(repo))
+    shas = all_objects(repo)
+
+    assert any(packed_type(reader, sha) == delta_type for sha in shas)
+    for sha in shas:
+        assert reader.read_object(sha) == cat_file(repo, sha)
+    for sha in git(repo, "rev-list", "--all").split():
+        assert_commit_matches(repo, reader, sha)
+
+
+def test_reads_objects_through_alternates(repo, tmp_path):
+    git(repo, "repack", "-ad", "--quiet")
+    shared = tmp_path / "shared"
+    git(tmp_path, "clone", "--quiet", "--shared", str(repo), str(shared))
+    assert (shared / ".git" / "objects" / "info" / "alternates").is_file()
+    # a loose commit in the clone on top of packed objects that only the source has
+    head = commit(shared, "only in the clone")
+    reader = ObjectReader(str(shared))
+
+    for sha in all_objects(shared):
+        assert reader.read_object(sha) == cat_file(shared, sha)
+    assert_commit_matches(shared, reader, head)
+    assert_commit_matches(shared, reader, git(shared, "rev-parse", "HEAD~1"))
+
+
+def test_missing_object_is_none(repo):
+    assert ObjectReader(str(repo)).read_object("0" * 40) is None
+
+
+def test_sha256_repositories_are_unsupported(tmp_path):
+    repo = tmp_path / "sha256"
+    repo.mkdir()
+    git(repo, "init", "--quiet", "--object-format=sha256")
+
+    with pytest.raises(UnsupportedRepository):
+        ObjectReader(str(repo))
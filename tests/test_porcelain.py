@@ -0,0 +1,37 @@
+import subprocess
+import threading
+
+import pytest
+
+from porcelain import _stream_fields
+
+# ~150 KB on stderr, more than a pipe buffer, before any stdout
+NOISY_CMD = [
+    "sh",
+    "-c",
+    "i=0; while [ $i -lt 4000 ]; do echo 'warning: some long diagnostic line' >&2;"
+    " i=$((i+1)); done; printf 'a\\0b\\0'; exit 3",
+]
+
+
+def test_stderr_larger_than_a_pipe_buffer_does_not_block(tmp_path):
+    outcome = {}
+
+    def consume():
+        fields = []
+        try:
+            for field in _stream_fields(str(tmp_path), NOISY_CMD, b"\0"):
+                fields.append(field)
+        except subprocess.CalledProcessError as e:
+            outcome["error"] = e
+        outcome["fields"] = fields
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    if thread.is_alive():
+        pytest.fail("_stream_fields blocked on a full stderr pipe")
+
+    assert outcome["fields"] == [b"a", b"b"]
+    assert outcome["error"].returncode == 3
+    assert outcome["error"].stderr.count(b"\n") == 4000
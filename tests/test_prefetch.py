@@ -0,0 +1,33 @@
+from prefetch import is_backing_off, is_due, last_fetch_time, prefetch, start_background_prefetch
+from tests.git_repo import commit, git, init_repo
+
+
+def test_failed_fetch_backs_off(tmp_path):
+    repo = init_repo(tmp_path / "repo")
+    git(repo, "remote", "add", "origin", str(tmp_path / "missing.git"))
+
+    assert prefetch(str(repo)) is False
+
+    assert last_fetch_time(str(repo)) is None
+    assert is_backing_off(str(repo))
+    assert not is_due(str(repo))
+    # no new background fetch per invocation while offline
+    assert start_background_prefetch(str(repo)) is False
+
+
+def test_successful_fetch_follows_tags_and_clears_the_backoff(tmp_path):
+    upstream = init_repo(tmp_path / "upstream")
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "--quiet", str(upstream), str(clone))
+    commit(upstream, "new work")
+    git(upstream, "tag", "-a", "v2", "-m", "release")
+
+    git(clone, "remote", "set-url", "origin", str(tmp_path / "missing.git"))
+    assert prefetch(str(clone)) is False
+    git(clone, "remote", "set-url", "origin", str(upstream))
+    assert prefetch(str(clone), force=True) is True
+
+    assert last_fetch_time(str(clone)) is not None
+    assert not is_backing_off(str(clone))
+    assert git(clone, "rev-parse", "origin/main") == git(upstream, "rev-parse", "main")
+    assert git(clone, "tag", "--list") == "v2"
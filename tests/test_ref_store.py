@@ -0,0 +1,31 @@
+from ref_store import RefStore
+from tests.git_repo import commit, git, init_repo
+
+
+def for_each_ref(repo, pattern):
+    output = git(repo, "for-each-ref", "--format=%(refname) %(objectname)", pattern)
+    return dict(line.split(" ") for line in output.splitlines())
+
+
+def test_packed_refs_match_for_each_ref(tmp_path):
+    repo = init_repo(tmp_path / "repo")
+    for i in range(5):
+        git(repo, "branch", f"topic/{i}")
+        commit(repo, f"work {i}")
+    # annotated tags get a "^<peeled sha>" line in packed-refs
+    git(repo, "tag", "-a", "v1", "-m", "release")
+    git(repo, "pack-refs", "--all")
+    # a loose ref written after packing shadows its packed value
+    git(repo, "branch", "-f", "topic/0", "HEAD")
+
+    packed = RefStore(str(repo)).packed_refs()
+
+    assert packed == {
+        refname: sha
+        for refname, sha in for_each_ref(repo, "refs").items()
+        if refname != "refs/heads/topic/0"
+    } | {"refs/heads/topic/0": git(repo, "rev-parse", "main~5")}
+    assert RefStore(str(repo)).local_branches() == {
+        refname.removeprefix("refs/heads/"): sha
+        for refname, sha in for_each_ref(repo, "refs/heads").items()
+    }
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+import pytest
+
+from git_paths import resolve_git_dirs
+from ref_watcher import (HEAD_CHANGED, PACKED_REFS_CHANGED, REF_CHANGED, WORKTREES_CHANGED,
+                         RepoWatcher)
+from tests.git_repo import git, init_repo
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux only"
+)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return init_repo(tmp_path / "repo")
+
+
+@pytest.fixture
+def watcher(repo):
+    watcher = RepoWatcher(resolve_git_dirs(str(repo)))
+    yield watcher
+    watcher.close()
+
+
+def changes_until(watcher, expected, timeout=5.0):
+    """Collect changes until expected has been reported (or the timeout passes)."""
+    seen = []
+    deadline = time.monotonic() + timeout
+    while expected not in seen and time.monotonic() < deadline:
+        seen.extend(watcher.read(timeout=0.1))
+    return seen
+
+
+def test_loose_ref_written_through_a_lock_file(repo, watcher):
+    git(repo, "update-ref", "refs/heads/topic", "HEAD")
+
+    changes = changes_until(watcher, (REF_CHANGED, "refs/heads/topic"))
+    assert (REF_CHANGED, "refs/heads/topic") in changes
+    # the .lock file renamed over the ref is never reported itself
+    assert all(not (detail or "").endswith(".lock") for _, detail in changes)
+
+
+def test_ref_in_a_new_directory(repo, watcher):
+    git(repo, "branch", "feature/nested/work")
+
+    assert (REF_CHANGED, "refs/heads/feature/nested/work") in changes_until(
+        watcher, (REF_CHANGED, "refs/heads/feature/nested/work")
+    )
+
+
+def test_deleted_ref(repo, watcher):
+    git(repo, "branch", "topic")
+    changes_until(watcher, (REF_CHANGED, "refs/heads/topic"))
+
+    git(repo, "branch", "-D", "topic")
+
+    assert (REF_CHANGED, "refs/heads/topic") in changes_until(
+        watcher, (REF_CHANGED, "refs/heads/topic")
+    )
+
+
+def test_packed_refs_rewrite(repo, watcher):
+    git(repo, "pack-refs", "--all")
+
+    assert (PACKED_REFS_CHANGED, None) in changes_until(watcher, (PACKED_REFS_CHANGED, None))
+
+
+def test_new_worktree_admin_dir_is_watched(repo, watcher, tmp_path):
+    worktree = tmp_path / "linked"
+    git(repo, "worktree", "add", "--quiet", "-b", "linked", str(worktree))
+
+    assert (WORKTREES_CHANGED, None) in changes_until(watcher, (WORKTREES_CHANGED, None))
+
+    # the new admin dir reports the linked worktree switching branches
+    git(worktree, "switch", "--quiet", "-c", "other")
+    head_changed = (HEAD_CHANGED, os.path.realpath(worktree))
+    changes = [
+        (kind, os.path.realpath(detail) if kind == HEAD_CHANGED else detail)
+        for kind, detail in changes_until(watcher, head_changed)
+    ]
+    assert head_changed in changes
@@ -0,0 +1,46 @@
+import pytest
+
+import squash_detection
+from squash_detection import (MERGE_TREE_STRATEGY, _merge_trees_batched,
+                              find_squashed_branches)
+from tests.git_repo import commit, git, init_repo
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """main has "squashed" squash-merged in; "open" and "conflict" are not on main."""
+    repo = init_repo(tmp_path / "repo")
+    for branch in ("squashed", "open", "conflict"):
+        git(repo, "switch", "--quiet", "-c", branch, "main")
+        commit(repo, f"{branch} work", f"{branch}.txt")
+        if branch == "conflict":
+            # main appends to file.txt too: the merge conflicts
+            commit(repo, f"{branch} edit", "file.txt")
+    git(repo, "switch", "--quiet", "main")
+    git(repo, "merge", "--quiet", "--squash", "squashed")
+    git(repo, "commit", "--quiet", "-m", "Squashed")
+    commit(repo, "main edit", "file.txt")
+    return repo
+
+
+def tips(repo):
+    return {branch: git(repo, "rev-parse", branch) for branch in ("squashed", "open", "conflict")}
+
+
+def test_merge_tree_stdin(repo):
+    main = git(repo, "rev-parse", "main")
+    if _merge_trees_batched(str(repo), [f"{main} {main}"]) is None:
+        pytest.skip("git merge-tree --stdin needs git 2.40")
+
+    assert find_squashed_branches(
+        str(repo), tips(repo), "refs/heads/main", strategy=MERGE_TREE_STRATEGY
+    ) == ["squashed"]
+
+
+def test_merge_tree_one_process_per_branch(repo, monkeypatch):
+    # what older git without merge-tree --stdin runs
+    monkeypatch.setattr(squash_detection, "_merge_trees_batched", lambda directory, pairs: None)
+
+    assert find_squashed_branches(
+        str(repo), tips(repo), "refs/heads/main", strategy=MERGE_TREE_STRATEGY
+    ) == ["squashed"]
@@ -0,0 +1,21 @@
+from worktree_status import compute_worktree_statuses
+from tests.git_repo import commit, git, init_repo
+
+
+def test_dirty_count_follows_edits_while_ahead_behind_is_cached(tmp_path):
+    repo = init_repo(tmp_path / "repo")
+    git(repo, "switch", "--quiet", "-c", "feature", "--track", "main")
+    commit(repo, "feature work")
+
+    [status] = compute_worktree_statuses(str(repo))
+    assert (status.branch, status.dirty, status.ahead, status.behind) == ("feature", 0, 1, 0)
+
+    # editing a tracked file moves neither HEAD nor the upstream: the cached run must see it
+    (repo / "file.txt").write_text("edited\n")
+    (repo / "untracked.txt").write_text("not counted\n")
+    [status] = compute_worktree_statuses(str(repo))
+    assert (status.dirty, status.ahead, status.behind) == (1, 1, 0)
+
+    git(repo, "commit", "--quiet", "-am", "more work")
+    [status] = compute_worktree_statuses(str(repo))
+    assert (status.dirty, status.ahead, status.behind) == (0, 2, 0)